@@ -0,0 +1,333 @@
+import json
+import shutil
+import sys
+from dataclasses import replace
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from src.benchmark import TOLERANCE, best_of, checksum, compare, time_queries, time_startup
+from src.dashboard_manifest import build_manifest, read_manifest, write_manifest
+from src.defaults import BOOTSTRAP_SAMPLES
+from src.forecasting import MIN_HISTORY
+from src.instrumentation import RunMonitor
+from src.pipeline import Pipeline
+from src.rollups import RollupIndex
+from src.stress_genome import GENOME_COLUMNS
+from src.synthetic import generate_raw
+
+import run_aidsp
+
+
+BASE_DIR = Path(__file__).resolve().parent
+
+BENCH_DIR = BASE_DIR / "data" / "bench"
+RESULTS = BASE_DIR / "results" / "benchmark.json"
+BASELINE = BASE_DIR / "results" / "benchmark_baseline.json"
+
+# Stage outputs that must be finite on the synthetic data: NaN or inf
+# here means the benchmark times degenerate input
+FINITE_COLUMNS = {
+    "forecast": ["predicted_risk_score"],
+    "policy": ["predicted_risk_score", "low_intervention", "medium_intervention", "high_intervention"],
+    "horizons": ["predicted_risk_score", "recent_mean"],
+    "genome": GENOME_COLUMNS,
+}
+
+
+# ==================================================
+# 1️ SYNTHETIC INPUTS
+# ==================================================
+def bench_data(rows: int, days: int, seed: int) -> dict:
+    out_dir = BENCH_DIR / f"rows-{rows}-days-{days}-seed-{seed}"
+    print(f" Generating {rows:,} synthetic rows in {out_dir}")
+    return generate_raw(out_dir, rows=rows, days=days, seed=seed)
+
+
+def bench_stages(paths: dict, levels, workers: int, n_boot: int, compact: bool = False):
+    """
+    The pipeline's stage graph reading the synthetic files, with
+    caching and publishing switched off so every stage is timed cold
+    """
+    stages = run_aidsp.build_stages(levels, workers, n_boot=n_boot, compact=compact)
+    return [
+        replace(
+            stage,
+            func=partial(run_aidsp.load_raw, paths=paths) if stage.name == "raw" else stage.func,
+            files=None, sink=None, cache=False
+        )
+        for stage in stages
+    ]
+
+
+# ==================================================
+# 2️ ONE SCALE
+# ==================================================
+def check_finite(pipeline):
+    """
+    Fail on NaN or inf in the outputs the benchmark checksums. Genome
+    values are only checked for states with the history a forecast
+    needs; a state seen on one day has no growth volatility. Likewise
+    a horizon's rolling context needs that many observations.
+    """
+    tables = {name: pipeline.value(name) for name in FINITE_COLUMNS}
+    days = pipeline.value("features")["state_id"].value_counts()
+    genome = tables["genome"]
+    tables["genome"] = genome[genome["state_id"].map(days).fillna(0).to_numpy() >= MIN_HISTORY]
+    horizons = tables["horizons"]
+    tables["horizons"] = horizons[
+        horizons["state_id"].map(days).fillna(0).to_numpy() >= horizons["horizon"].to_numpy()
+    ]
+    tables["backtest"] = pipeline.value("backtest")["summary"]
+    columns = {**FINITE_COLUMNS, "backtest": ["trend_mae", "naive_mae"]}
+
+    bad = []
+    for name, cols in columns.items():
+        df = tables[name]
+        for col in cols:
+            n = int((~np.isfinite(df[col].to_numpy(np.float64))).sum())
+            if n or df.empty:
+                bad.append(f"{name}.{col}: {n} of {len(df)} rows")
+    if bad:
+        raise AssertionError("Non-finite benchmark outputs: " + "; ".join(bad))
+
+
+def run_scale(paths: dict, levels, workers: int, n_boot: int, repeat: int, queries: int,
+              compact: bool = False) -> dict:
+    runs, sums = [], {}
+
+    for _ in range(repeat):
+        monitor = RunMonitor()
+        pipeline = Pipeline(
+            bench_stages(paths, levels, workers, n_boot, compact),
+            cache_dir=BENCH_DIR / "cache",
+            use_cache=False,
+            monitor=monitor
+        )
+        for name in run_aidsp.STAGES:
+            pipeline.value(name)
+
+        geo = pipeline.value("geography")
+        with monitor.stage("dashboard_index") as record:
+            index = record["output"] = RollupIndex({
+                level: geo.decode(rollup)
+                for level, rollup in pipeline.value("rollups").items()
+            })
+
+        with monitor.stage("dashboard_manifest") as record:
+            write_manifest(build_manifest(geo.decode(pipeline.value("rollups")["state"])), BENCH_DIR)
+            record["output"] = read_manifest(BENCH_DIR)
+
+        runs.append({r["stage"]: r for r in monitor.stages if r["kind"] == "compute"})
+        check_finite(pipeline)
+        sums = {name: checksum(pipeline.value(name)) for name in run_aidsp.STAGES}
+
+    stages = best_of(runs)
+    for name, digest in sums.items():
+        stages[name]["checksum"] = digest
+
+    return {"stages": stages, "queries": time_queries(index, n=queries)}
+
+
+def print_scale(scale: str, run: dict):
+    print(f"\n {scale} rows")
+    print(f"   {'stage':<20}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{'rows out':>12}")
+    for name, r in run["stages"].items():
+        print(
+            f"   {name:<20}{r['wall_s']:>9.3f}{r['cpu_s']:>9.3f}"
+            f"{r.get('max_rss_mb') or 0:>9.0f}{r.get('rows_out', 0):>12,}"
+        )
+    for op, latency in run["queries"].items():
+        print(f"   query {op:<16} p50 {latency['p50_ms']:.3f} ms  p99 {latency['p99_ms']:.3f} ms")
+
+
+# ==================================================
+# 3️ COLD START
+# ==================================================
+def startup_commands() -> dict:
+    """
+    Fresh-interpreter commands timed for cold start: importing the
+    pipeline, its --help, and what the dashboard runs before its
+    first paint (its imports and the manifest read; Streamlit itself
+    is not included)
+    """
+    python = sys.executable
+    first_paint = (
+        "import pandas as pd; "
+        "import src.artifact_store, src.compact, src.recommendations, src.rollups; "
+        "from src.dashboard_manifest import read_manifest; "
+        f"pd.Timestamp(read_manifest({str(BENCH_DIR)!r})['first_month'])"
+    )
+    return {
+        "import_pipeline": [python, "-c", "import run_aidsp"],
+        "cli_help": [python, "run_aidsp.py", "--help"],
+        "dashboard_first_paint": [python, "-c", first_paint],
+    }
+
+
+# ==================================================
+# 4️ SUITE
+# ==================================================
+def main(
+    rows=(1_000_000,),
+    days: int = 300,
+    seed: int = 0,
+    levels=("district", "pincode"),
+    workers: int = 0,
+    n_boot: int = BOOTSTRAP_SAMPLES,
+    repeat: int = 1,
+    queries: int = 200,
+    baseline: Path = BASELINE,
+    save_baseline: bool = False,
+    tolerance: float = TOLERANCE,
+    compact: bool = False,
+    startup_repeat: int = 5
+) -> list:
+    """
+    Time every stage and the dashboard lookups at each scale, and the
+    cold start, then flag regressions against the stored baseline
+    """
+    print(" Starting AIDSP benchmark")
+
+    report = RunMonitor().report()
+    report = {
+        "started": report["started"],
+        "environment": report["environment"],
+        "settings": {
+            "days": days, "seed": seed, "levels": list(levels or []),
+            "workers": workers, "n_boot": n_boot, "repeat": repeat,
+            "compact": compact,
+        },
+        "scales": {},
+    }
+
+    for n in rows:
+        paths = bench_data(n, days, seed)
+        run = run_scale(paths, levels, workers, n_boot, repeat, queries, compact)
+        report["scales"][str(n)] = run
+        print_scale(f"{n:,}", run)
+
+    if startup_repeat:
+        report["startup"] = time_startup(startup_commands(), repeat=startup_repeat, cwd=BASE_DIR)
+        print("\n Cold start")
+        for name, timing in report["startup"].items():
+            print(f"   {name:<24} best {timing['best_ms']:.1f} ms  median {timing['median_ms']:.1f} ms")
+
+    RESULTS.parent.mkdir(parents=True, exist_ok=True)
+    with open(RESULTS, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    flags = []
+    baseline = Path(baseline)
+    if baseline.exists():
+        with open(baseline) as f:
+            stored = json.load(f)
+        if stored.get("settings") != report["settings"]:
+            print(f"\n Baseline settings differ: {stored.get('settings')}")
+        flags = compare(report, stored, tolerance)
+
+        print(f"\n {len(flags)} regression(s) against {baseline}")
+        for flag in flags:
+            print(
+                f"   {flag['scale']:>12} {flag['item']:<24} {flag['flag']:<7}"
+                f" {flag['baseline']} -> {flag['current']}"
+            )
+    else:
+        print(f"\n No baseline at {baseline}")
+
+    if save_baseline:
+        shutil.copyfile(RESULTS, baseline)
+        print(f" Baseline saved to {baseline}")
+
+    return flags
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the AIDSP pipeline on synthetic data")
+    parser.add_argument(
+        "--rows",
+        nargs="+",
+        type=int,
+        default=[1_000_000],
+        help="raw rows per scale (all three files together)"
+    )
+    parser.add_argument("--days", type=int, default=300, help="days of activity")
+    parser.add_argument("--seed", type=int, default=0, help="generator seed")
+    parser.add_argument(
+        "--levels",
+        nargs="*",
+        default=["district", "pincode"],
+        choices=["district", "pincode"],
+        help="sub-state levels to forecast (none to skip)"
+    )
+    parser.add_argument("--workers", type=int, default=0, help="process pool size")
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=BOOTSTRAP_SAMPLES,
+        metavar="N",
+        help="residual bootstrap resamples for forecast intervals"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="runs per scale; the fastest time of each stage is kept"
+    )
+    parser.add_argument("--queries", type=int, default=200, help="dashboard lookups timed")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="baseline report")
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store this run as the new baseline"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=TOLERANCE,
+        help="allowed slowdown as a fraction of the baseline time"
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="benchmark the compact memory mode"
+    )
+    parser.add_argument(
+        "--startup-repeat",
+        type=int,
+        default=5,
+        metavar="N",
+        help="fresh-interpreter runs per cold-start timing (0 to skip)"
+    )
+    parser.add_argument(
+        "--generate",
+        type=Path,
+        metavar="OUT_DIR",
+        help="only write synthetic raw files of the first --rows scale"
+    )
+    args = parser.parse_args()
+
+    if args.generate:
+        for path in generate_raw(args.generate, rows=args.rows[0], days=args.days, seed=args.seed).values():
+            print(f" {path}")
+        sys.exit(0)
+
+    flags = main(
+        rows=args.rows,
+        days=args.days,
+        seed=args.seed,
+        levels=args.levels,
+        workers=args.workers,
+        n_boot=args.bootstrap,
+        repeat=args.repeat,
+        queries=args.queries,
+        baseline=args.baseline,
+        save_baseline=args.save_baseline,
+        tolerance=args.tolerance,
+        compact=args.compact,
+        startup_repeat=args.startup_repeat
+    )
+    sys.exit(1 if flags else 0)
@@ -1,3 +1,4 @@
+import sys
 import streamlit as st
 import pandas as pd
 from pathlib import Path
@@ -13,6 +14,21 @@ st.set_page_config(
 BASE_DIR = Path(__file__).resolve().parent.parent
 GRANULAR_FILE = BASE_DIR / "data" / "processed" / "granular_uidai.csv"
 RISK_FILE = BASE_DIR / "results" / "final_policy_output.csv"
+SURGE_ALERTS_FILE = BASE_DIR / "results" / "surge_alerts.csv"
+SURGE_TOPK_FILE = BASE_DIR / "results" / "surge_topk.csv"
+
+sys.path.insert(0, str(BASE_DIR))
+from src.artifact_store import artifact_exists, read_artifact, snapshot_root  # noqa: E402
+from src.compact import compact_frame  # noqa: E402
+from src.dashboard_manifest import read_manifest  # noqa: E402
+from src.recommendations import generate_recommendation, model_confidence  # noqa: E402
+from src.rollups import RollupIndex, MEASURES  # noqa: E402
+
+GRANULAR_COLUMNS = [
+    "state", "district", "pincode", "date",
+    "enrolment", "biometric", "demographic"
+]
+ROLLUP_LEVELS = ["state", "district", "pincode"]
 
 # ==================================================
 # HEADER
@@ -25,18 +41,107 @@ st.markdown("""
 # ==================================================
 # LOAD DATA
 # ==================================================
-if not GRANULAR_FILE.exists() or not RISK_FILE.exists():
+def load_output(name, csv_file, root, columns=None):
+    """
+    Read a pipeline output from the artifact snapshot `root`, else its
+    CSV export
+    """
+    if artifact_exists(name, root):
+        return read_artifact(name, columns=columns, root=root)
+    if csv_file.exists():
+        return pd.read_csv(csv_file, usecols=columns)
+    return None
+
+
+def rollups_from_granular(granular_df):
+    """
+    Monthly rollups built in-app when the pipeline did not emit them
+    """
+    df = granular_df.copy()
+    df["month"] = pd.to_datetime(df["date"], errors="coerce").dt.to_period("M").dt.to_timestamp()
+    for col in MEASURES:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype("int64")
+
+    rollups = {}
+    for i, level in enumerate(ROLLUP_LEVELS):
+        keys = ROLLUP_LEVELS[:i + 1]
+        grouped = df.groupby(keys + ["month"], sort=True)
+        rollup = grouped[MEASURES].sum()
+        rollup["records"] = grouped.size()
+        rollups[level] = rollup.reset_index()
+    return rollups
+
+
+@st.cache_resource(show_spinner="Loading activity rollups…")
+def load_rollup_index(root):
+    """
+    Indexed monthly rollups, loaded once per published snapshot
+    """
+    if all(artifact_exists(f"rollup_{level}", root) for level in ROLLUP_LEVELS):
+        rollups = {
+            level: read_artifact(f"rollup_{level}", root=root) for level in ROLLUP_LEVELS
+        }
+    else:
+        granular_df = load_output("granular_uidai", GRANULAR_FILE, root, GRANULAR_COLUMNS)
+        if granular_df is None:
+            return None
+        rollups = rollups_from_granular(granular_df)
+
+    # Categorical names and narrow counts for the process lifetime
+    return RollupIndex({
+        level: compact_frame(rollup.assign(month=pd.to_datetime(rollup["month"])))
+        for level, rollup in rollups.items()
+    })
+
+
+@st.cache_data
+def load_risk(root):
+    return load_output("final_policy_output", RISK_FILE, root)
+
+
+@st.cache_resource(show_spinner="Loading surge alerts…")
+def load_surges(root):
+    """
+    Surge alerts and the pipeline's top-k pincode lists, keyed by
+    (state, district) so a selection is one dictionary lookup
+    """
+    alerts = load_output("surge_alerts", SURGE_ALERTS_FILE, root)
+    topk = load_output("surge_topk", SURGE_TOPK_FILE, root)
+    if alerts is None or topk is None:
+        return None
+
+    alerts = alerts.assign(date=pd.to_datetime(alerts["date"]))
+    topk = topk[topk["level"] == "district"]
+    return {
+        "alerts": dict(tuple(alerts.groupby(["state", "district"], sort=False))),
+        "topk": dict(tuple(topk.groupby(["kind", "state", "district"], sort=False))),
+    }
+
+
+def stop_without_data():
     st.error(" Required data files not found. Run the pipeline first.")
     st.stop()
 
-granular_df = pd.read_csv(GRANULAR_FILE)
-risk_df = pd.read_csv(RISK_FILE)
-
-granular_df["date"] = pd.to_datetime(granular_df["date"], errors="coerce")
-granular_df["date"] = granular_df["date"].dt.to_period("M").dt.to_timestamp()
 
-for col in ["enrolment", "biometric", "demographic"]:
-    granular_df[col] = pd.to_numeric(granular_df[col], errors="coerce").fillna(0)
+# Every output of this render comes from one published snapshot; the
+# loaders are cached per snapshot, so a new publish is picked up on the
+# next rerun
+snapshot = snapshot_root()
+
+# The control panel comes from the pipeline's tiny manifest, so it is
+# on screen before any bulk data is loaded
+manifest = read_manifest(snapshot) or read_manifest(BASE_DIR / "results")
+if manifest is None:
+    # Outputs from before the manifest: take the controls from the rollups
+    rollup_index = load_rollup_index(snapshot)
+    if rollup_index is None:
+        stop_without_data()
+    state_options = rollup_index.states()
+    min_month, max_month = rollup_index.date_bounds()
+else:
+    state_options = manifest["states"]
+    min_month = pd.Timestamp(manifest["first_month"])
+    max_month = pd.Timestamp(manifest["last_month"])
 
 # ==================================================
 # CONTROL PANEL
@@ -54,12 +159,12 @@ with c1:
 with c2:
     state = st.selectbox(
         "State / UT",
-        sorted(granular_df["state"].unique())
+        state_options
     )
 
 with c3:
-    min_date = granular_df["date"].min().date()
-    max_date = granular_df["date"].max().date()
+    min_date = min_month.date()
+    max_date = max_month.date()
     date_range = st.date_input(
         "Time Period",
         value=(min_date, max_date),
@@ -76,31 +181,15 @@ if isinstance(date_range, tuple):
 else:
     start_date = end_date = pd.to_datetime(date_range)
 
-gdf = granular_df[
-    (granular_df["state"] == state) &
-    (granular_df["date"] >= start_date) &
-    (granular_df["date"] <= end_date)
-]
+rollup_index = load_rollup_index(snapshot)
+risk_df = load_risk(snapshot)
 
-# ==================================================
-# RECOMMENDATION & CONFIDENCE LOGIC
-# ==================================================
-def generate_recommendation(row):
-    risk = row["predicted_risk_score"]
-    if risk < 0.4:
-        return "Low Operational Risk", "Low Intervention", "Normal operational patterns observed"
-    elif risk < 0.7:
-        return "Moderate Operational Risk", "Medium Intervention", "Sustained increase in updates"
-    else:
-        return "High Operational Risk", "High Intervention", "Sharp activity surge detected"
+if rollup_index is None or risk_df is None:
+    stop_without_data()
 
-def model_confidence(rows):
-    if rows > 5000:
-        return "High Confidence"
-    elif rows > 1000:
-        return "Medium Confidence"
-    else:
-        return "Low Confidence"
+# Activity totals for the selected state and period
+state_totals = rollup_index.state_totals(state, start_date, end_date)
+records = state_totals["records"]
 
 # ==================================================
 # 1️ STATE INTELLIGENCE
@@ -112,7 +201,7 @@ if view == "State Intelligence":
 
     if not sr.empty:
         level, action, reason = generate_recommendation(sr.iloc[0])
-        confidence = model_confidence(len(gdf))
+        confidence = model_confidence(records)
 
         # -------------------------------
         # DECISION BANNER
@@ -151,6 +240,12 @@ if view == "State Intelligence":
         m3.metric("Medium Intervention Impact", f"{sr['medium_intervention'].iloc[0]:.3f}")
         m4.metric("High Intervention Impact", f"{sr['high_intervention'].iloc[0]:.3f}")
 
+        if "risk_p10" in sr.columns:
+            st.caption(
+                f"Bootstrap forecast range: p10 {sr['risk_p10'].iloc[0]:.3f} · "
+                f"p50 {sr['risk_p50'].iloc[0]:.3f} · p90 {sr['risk_p90'].iloc[0]:.3f}"
+            )
+
     # -------------------------------
     # WHY THIS RECOMMENDATION?
     # -------------------------------
@@ -160,12 +255,11 @@ if view == "State Intelligence":
         "operational risk for the selected state and time period."
     )
 
-    if gdf.empty:
+    if records == 0:
         st.info("Insufficient activity data available to explain risk drivers.")
     else:
         drivers = (
-            gdf[["enrolment", "biometric", "demographic"]]
-            .sum()
+            pd.Series({col: state_totals[col] for col in MEASURES})
             .rename({
                 "enrolment": "New Enrolments",
                 "biometric": "Biometric Corrections",
@@ -200,10 +294,10 @@ if view == "State Intelligence":
     # ACTIVITY SUMMARY
     # -------------------------------
     st.markdown("###  Aadhaar Activity Summary")
-    st.caption(f"Records analysed: {len(gdf)}")
+    st.caption(f"Records analysed: {records}")
 
-    if not gdf.empty:
-        s = gdf[["enrolment", "biometric", "demographic"]].sum()
+    if records:
+        s = state_totals
         a1, a2, a3 = st.columns(3)
         a1.metric("New Enrolments", int(s["enrolment"]))
         a2.metric("Biometric Corrections", int(s["biometric"]))
@@ -215,19 +309,17 @@ if view == "State Intelligence":
 elif view == "District Drill-down":
     st.subheader("District-level Operational Overview")
 
-    if gdf.empty:
+    if records == 0:
         st.warning("No data available.")
     else:
         district = st.selectbox(
             "District",
-            sorted(gdf["district"].dropna().unique())
+            rollup_index.districts(state, start_date, end_date)
         )
-        ddf = gdf[gdf["district"] == district]
+        totals = rollup_index.district_totals(state, district, start_date, end_date)
 
         st.dataframe(
-            ddf.groupby("district")[["enrolment", "biometric", "demographic"]]
-            .sum()
-            .reset_index(),
+            pd.DataFrame([{"district": district, **{c: totals[c] for c in MEASURES}}]),
             use_container_width=True
         )
 
@@ -237,27 +329,64 @@ elif view == "District Drill-down":
 else:
     st.subheader("PIN-level Operational Concentration")
 
-    if gdf.empty:
+    if records == 0:
         st.warning("No data available.")
     else:
         district = st.selectbox(
             "District",
-            sorted(gdf["district"].dropna().unique())
+            rollup_index.districts(state, start_date, end_date)
         )
-        pdf = gdf[gdf["district"] == district]
+        surges = load_surges(snapshot)
+        full_period = (start_date, end_date) == (min_month, max_month)
 
-        pin = (
-            pdf.groupby("pincode")[["enrolment", "biometric", "demographic"]]
-            .sum()
-            .reset_index()
-        )
-        pin["total_activity"] = pin[["enrolment", "biometric", "demographic"]].sum(axis=1)
+        pin = rollup_index.pincode_table(state, district, start_date, end_date)
 
         st.dataframe(
             pin.sort_values("total_activity", ascending=False),
             use_container_width=True
         )
 
+        if surges is not None and full_period:
+            # The pipeline's bounded top-k list covers the full period only
+            top = surges["topk"].get(("concentration", state, district))
+            if top is not None:
+                st.markdown(f"###  Top {len(top)} PINs by Activity")
+                st.dataframe(
+                    top[["rank", "pincode", "score", "share"]].rename(
+                        columns={"score": "total_activity", "share": "district_share"}
+                    ),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+        if surges is not None:
+            st.markdown("###  Activity Surges")
+            alerts = surges["alerts"].get((state, district))
+            if alerts is not None:
+                # Whole months, as in the rollups
+                alerts = alerts[
+                    (alerts["date"] >= start_date)
+                    & (alerts["date"] < end_date + pd.offsets.MonthBegin(1))
+                ]
+
+            if alerts is None or alerts.empty:
+                st.info("No unusual PIN-level surges in the selected period.")
+            else:
+                st.dataframe(
+                    alerts[["date", "pincode", "activity", "expected", "z_score", "surge_ratio"]]
+                    .iloc[::-1],
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+            anomalous = surges["topk"].get(("anomaly", state, district))
+            if demo_mode and anomalous is not None:
+                st.caption(
+                    "Surges compare each PIN's daily activity with its own recent "
+                    "baseline. Most unusual PINs overall: "
+                    + ", ".join(anomalous["pincode"].astype(str).head(5))
+                )
+
 # ==================================================
 # FOOTER
 # ==================================================
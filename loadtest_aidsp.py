@@ -0,0 +1,182 @@
+import http.client
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+
+from src.risk_service import LEVEL_KEYS, RiskService, make_server
+
+
+# ==================================================
+# 1️ REQUESTS
+# ==================================================
+def fetch(conn, method: str, path: str, body: bytes = None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def sample_queries(keys: dict, n: int, skew: float, seed: int) -> list:
+    """
+    `n` lookups over every level's keys. Popularity follows a Zipf law
+    with exponent `skew` (0 for uniform), as dashboards revisit a few
+    regions far more often than the rest.
+    """
+    pool = [k for level in LEVEL_KEYS for k in keys.get(level, [])]
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(pool))
+    weights = 1.0 / np.arange(1, len(pool) + 1) ** skew
+    picks = order[rng.choice(len(pool), n, p=weights / weights.sum())]
+    return [pool[i] for i in picks]
+
+
+def run_worker(host: str, port: int, calls: list, batch: int) -> dict:
+    """
+    Send `calls` over one keep-alive connection; latency per request
+    """
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    latency, statuses = [], {}
+    try:
+        for call in calls:
+            t = time.perf_counter()
+            if batch:
+                status, _ = fetch(conn, "POST", "/risk/batch", json.dumps({"queries": call}).encode())
+            else:
+                status, _ = fetch(conn, "GET", "/risk?" + urlencode(call))
+            latency.append((time.perf_counter() - t) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        conn.close()
+    return {"latency_ms": latency, "statuses": statuses}
+
+
+# ==================================================
+# 2️ LOAD TEST
+# ==================================================
+def main(
+    url: str = None,
+    requests: int = 2000,
+    concurrency: int = 8,
+    batch: int = 0,
+    skew: float = 1.0,
+    seed: int = 0
+) -> dict:
+    """
+    Drive the risk service with point (or batch) lookups from
+    `concurrency` clients and report latency percentiles and
+    throughput. Without `url`, an in-process server is started on the
+    latest pipeline outputs.
+    """
+    server = None
+    if url is None:
+        server = make_server(RiskService(), port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+    else:
+        parsed = urlparse(url)
+        host, port = parsed.hostname, parsed.port or 80
+
+    try:
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        keys = {}
+        for level in LEVEL_KEYS:
+            status, body = fetch(conn, "GET", f"/keys?level={level}")
+            keys[level] = json.loads(body) if status == 200 else []
+        conn.close()
+
+        lookups = sample_queries(keys, requests * max(batch, 1), skew, seed)
+        calls = [lookups[i:i + batch] for i in range(0, len(lookups), batch)] if batch else lookups
+        shares = [calls[i::concurrency] for i in range(concurrency)]
+
+        print(
+            f" Load test: {len(calls):,} {'batch ' if batch else ''}requests, "
+            f"{concurrency} clients, {len(lookups):,} lookups on http://{host}:{port}"
+        )
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda share: run_worker(host, port, share, batch), shares))
+        elapsed = time.perf_counter() - start
+
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        health = json.loads(fetch(conn, "GET", "/health")[1])
+        conn.close()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    latency = np.concatenate([r["latency_ms"] for r in results])
+    statuses = {}
+    for r in results:
+        for status, n in r["statuses"].items():
+            statuses[status] = statuses.get(status, 0) + n
+
+    report = {
+        "requests": int(len(latency)),
+        "lookups": len(lookups),
+        "concurrency": concurrency,
+        "batch": batch,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latency) / elapsed, 1),
+        "lookups_per_s": round(len(lookups) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latency, 50)), 3),
+        "p99_ms": round(float(np.percentile(latency, 99)), 3),
+        "max_ms": round(float(latency.max()), 3),
+        "statuses": statuses,
+        "cache": health["cache"],
+        "version": health["version"],
+    }
+
+    print(
+        f"   p50 {report['p50_ms']:.3f} ms  p99 {report['p99_ms']:.3f} ms  "
+        f"max {report['max_ms']:.3f} ms"
+    )
+    print(
+        f"   {report['requests_per_s']:,.0f} requests/s  "
+        f"{report['lookups_per_s']:,.0f} lookups/s  statuses {statuses}"
+    )
+    cache = report["cache"]
+    print(f"   cache {cache['hits']:,} hits / {cache['misses']:,} misses ({cache['size']:,} entries)")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load-test the AIDSP risk query service")
+    parser.add_argument(
+        "--url",
+        help="running service (default: start one in-process on the latest outputs)"
+    )
+    parser.add_argument("--requests", type=int, default=2000, help="requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel clients")
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=0,
+        metavar="N",
+        help="send batch requests of N lookups instead of point lookups"
+    )
+    parser.add_argument(
+        "--skew",
+        type=float,
+        default=1.0,
+        help="Zipf exponent of key popularity (0 for uniform)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="sampling seed")
+    args = parser.parse_args()
+
+    report = main(
+        url=args.url,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        batch=args.batch,
+        skew=args.skew,
+        seed=args.seed
+    )
+    sys.exit(0 if set(report["statuses"]) <= {200, 404} else 1)
@@ -1,171 +1,1080 @@
+from contextlib import nullcontext
 from pathlib import Path
-import pandas as pd
 
-from src.data_loader import (
-    load_enrolment_data,
-    load_demographic_data,
-    load_biometric_data
-)
+import src
+from src.dashboard_manifest import build_manifest, write_manifest
+from src.defaults import BOOTSTRAP_SAMPLES, HORIZONS, KEEP_SNAPSHOTS
+from src.lazy import lazy_import
+from src.pipeline import Pipeline, Stage
 
-from src.features import (
-    build_enrolment_features,
-    build_demographic_features,
-    build_biometric_features
-)
+# Stage modules, and pandas behind them, load on first use: `--help`
+# and argument errors return at once, and a run imports only what its
+# stages call
+pd = lazy_import("pandas")
 
-from src.risk_engine import compute_risk_score
-from src.forecasting import forecast_state_risk
-from src.policy_simulator import apply_policy_scenarios
-from src.stress_genome import compute_stress_genome, assign_archetypes
+for module in [
+    "archetypes", "artifact_store", "backtest", "compact", "data_loader", "features",
+    "forecasting", "geography", "granular", "hierarchy", "incremental",
+    "instrumentation", "out_of_core", "parallel", "policy_simulator",
+    "risk_engine", "rollups", "stress_genome", "surge",
+]:
+    lazy_import(f"src.{module}")
 
 
 BASE_DIR = Path(__file__).resolve().parent
 
+STAGES = [
+    "raw", "geography", "sources", "granular", "rollups", "surge", "features", "risk",
+    "forecast", "rolling", "horizons", "backtest", "policy", "scenarios", "levels", "archetypes",
+    "genome"
+]
+
+# Measured steps of the incremental and out-of-core modes that
+# --profile accepts (full runs take the names in STAGES)
+UPDATE_STAGES = ["build_state", "apply_update", "outputs"]
+OUT_OF_CORE_STAGES = ["map_reduce", "outputs"]
+
+# Default policy sweep: intensity x budget (states treated) x rollout
+SCENARIO_GRID = {
+    "intensities": [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9],
+    "budgets": [5, 10, 20, float("inf")],
+    "rollouts": [0.25, 0.5, 0.75, 1.0],
+}
+
+
+# ==================================================
+# 1️ LOAD RAW DATA
+# ==================================================
+RAW_SOURCES = {"enrol": "enrolment", "demo": "demographic", "bio": "biometric"}
+
+
+def load_raw(workers=0, paths=None):
+    # Typed, chunked reads: categorical geography, int32 counts and
+    # dates parsed once at ingest. `paths` overrides the raw file
+    # locations ({source: path}).
+    calls = [
+        {"source": source, "path": (paths or {}).get(source)}
+        for source in RAW_SOURCES.values()
+    ]
+
+    if workers and workers > 1:
+        # One file per process; frames come back memory-mapped
+        frames = src.parallel.map_tasks(
+            src.data_loader.load_raw_typed, calls, min(workers, len(calls))
+        )
+    else:
+        frames = [src.data_loader.load_raw_typed(**call) for call in calls]
+
+    return dict(zip(RAW_SOURCES, frames))
+
+
+def build_geography(raw):
+    # Geography dimension: canonical names -> integer ids.
+    # Everything downstream joins and groups on ids; names are
+    # resolved back only when outputs are written.
+    return src.geography.Geography.from_frames(raw["enrol"], raw["demo"], raw["bio"])
 
-def main():
-    print(" Starting AIDSP Pipeline")
 
-    # ==================================================
-    # 1️ LOAD RAW DATA
-    # ==================================================
-    enrol = load_enrolment_data()
-    demo = load_demographic_data()
-    bio = load_biometric_data()
-
-    # Ensure date is datetime everywhere
-    enrol["date"] = pd.to_datetime(enrol["date"], errors="coerce")
-    demo["date"] = pd.to_datetime(demo["date"], errors="coerce")
-    bio["date"] = pd.to_datetime(bio["date"], errors="coerce")
-
-    # ==================================================
-    # 2️ CREATE GRANULAR DATASET (GUARANTEED)
-    # ==================================================
+def encode_sources(raw, geo, compact=False):
+    sources = {name: geo.encode(df) for name, df in raw.items()}
+
+    if compact:
+        # Day-number dates, smallest integer ids and counts
+        before = src.compact.frame_mb(sources)
+        sources = {name: src.compact.compact_frame(df, days=True) for name, df in sources.items()}
+        print(f" Compact sources: {before} MB → {src.compact.frame_mb(sources)} MB")
+
+    sources["valid_states"] = geo.valid_state_ids()
+    return sources
+
+
+# ==================================================
+# 2️ CREATE GRANULAR DATASET (GUARANTEED)
+# ==================================================
+def granular_stage(sources, geo, compact=False):
     print(" Creating granular UIDAI dataset")
 
-    granular = enrol.merge(
-        demo,
-        on=["state", "district", "pincode", "date"],
-        how="left",
-        suffixes=("", "_demo")
+    # Pre-aggregate each source to one row per key, then hash-join
+    granular, granular_report = src.granular.build_granular(
+        sources["enrol"], sources["demo"], sources["bio"], geo
     )
 
-    granular = granular.merge(
-        bio,
-        on=["state", "district", "pincode", "date"],
-        how="left",
-        suffixes=("", "_bio")
+    for source in ["enrolment", "demographic", "biometric"]:
+        r = granular_report[source]
+        print(
+            f"   {source}: {r['rows_in']} rows → {r['keys']} keys "
+            f"({r['duplicate_keys']} duplicate keys, "
+            f"{r['rows_collapsed']} rows collapsed)"
+        )
+
+    # Clean invalid states
+    granular = granular[granular["state_id"].isin(sources["valid_states"])]
+
+    if compact:
+        granular = src.compact.downcast_ints(granular)
+    return granular
+
+
+# ==================================================
+# 2b MONTHLY ROLLUPS FOR THE DASHBOARD
+# ==================================================
+def rollups_stage(granular):
+    return src.rollups.build_rollups(granular)
+
+
+# ==================================================
+# 2c SURGE ALERTS AND TOP-K PINCODES
+# ==================================================
+def surge_stage(granular, geo):
+    # One pass in date order over online per-pincode statistics
+    return src.surge.detect_surges(granular, geo)
+
+
+# ==================================================
+# 3️ FEATURE ENGINEERING (STATE LEVEL)
+# ==================================================
+def features_stage(sources, compact=False, workers=0):
+    frames = {"enrol_df": sources["enrol"], "demo_df": sources["demo"], "bio_df": sources["bio"]}
+
+    if workers and workers > 1:
+        # Per-state features are independent: shard whole states and
+        # restore the serial (state, date) order
+        parts = src.parallel.map_shards(
+            src.features.build_feature_dataset, frames, "state_id", workers, key="state_id"
+        )
+        features = (
+            pd.concat(parts, ignore_index=True)
+            .sort_values(["state_id", "date"], kind="mergesort")
+            .reset_index(drop=True)
+        )
+    else:
+        features = src.features.build_feature_dataset(**frames, key="state_id")
+
+    # Clean to valid states
+    features = features[features["state_id"].isin(sources["valid_states"])]
+
+    print(f" Valid states after cleaning: {features['state_id'].nunique()}")
+
+    if compact:
+        # Ratios, growth and pressures keep ~7 significant digits
+        features = src.compact.downcast_floats(features)
+    return features
+
+
+# ==================================================
+# 3b RISK SCORE
+# ==================================================
+def risk_stage(features):
+    # Every model downstream reads `risk_score`
+    return src.risk_engine.compute_risk_score(features)
+
+
+# ==================================================
+# 4️ FORECASTING
+# ==================================================
+def forecast_stage(features, n_boot=BOOTSTRAP_SAMPLES, seed=0, workers=0):
+    # Point forecast plus residual-bootstrap p10/p50/p90
+    return src.forecasting.forecast_state_risk(
+        features, key="state_id", n_boot=n_boot, seed=seed, workers=workers
     )
 
-    # Normalize column names (VERY IMPORTANT)
-    granular = granular.rename(columns={
-        "enrolment_count": "enrolment",
-        "biometric_count": "biometric",
-        "demographic_count": "demographic"
-    })
 
-    # If columns already exist, keep them
-    required_cols = [
-        "state", "district", "pincode", "date",
-        "enrolment", "biometric", "demographic"
-    ]
+def rolling_stage(features, windows=HORIZONS):
+    # Rolling mean, volatility and surge ratio per state, one window per horizon
+    return src.features.rolling_window_features(features, key="state_id", windows=windows)
 
-    for col in ["enrolment", "biometric", "demographic"]:
-        if col not in granular.columns:
-            granular[col] = 0
 
-    granular = granular[required_cols]
+def horizons_stage(features, rolling, horizons=HORIZONS):
+    # Capacity-planning forecasts at several horizons
+    return src.forecasting.forecast_horizons(
+        features, key="state_id", horizons=horizons, rolling=rolling
+    )
 
-    # Clean invalid states
-    granular["state"] = granular["state"].astype(str).str.strip()
-    granular = granular[~granular["state"].str.isnumeric()]
-    granular = granular[granular["state"].str.len() > 3]
 
-    processed_dir = BASE_DIR / "data" / "processed"
-    processed_dir.mkdir(parents=True, exist_ok=True)
+def backtest_stage(features):
+    # Rolling-origin errors of the trend forecaster vs. last value
+    return src.backtest.run_backtest(features, key="state_id")
+
 
-    granular_path = processed_dir / "granular_uidai.csv"
-    granular.to_csv(granular_path, index=False)
+# ==================================================
+# 5️ POLICY SIMULATION
+# ==================================================
+def policy_stage(forecast, low_factor, medium_factor, high_factor):
+    return src.policy_simulator.apply_policy_scenarios(
+        forecast,
+        low_factor=low_factor,
+        medium_factor=medium_factor,
+        high_factor=high_factor
+    )
 
-    print(f" Granular UIDAI saved → {granular_path}")
 
-    # ==================================================
-    # 3️ FEATURE ENGINEERING (STATE LEVEL)
-    # ==================================================
-    enrol_f = build_enrolment_features(enrol)
-    demo_f = build_demographic_features(demo)
-    bio_f = build_biometric_features(bio)
+def scenarios_stage(forecast, intensities, budgets, rollouts):
+    return src.policy_simulator.evaluate_scenarios(
+        forecast,
+        src.policy_simulator.scenario_grid(intensities, budgets, rollouts),
+        key="state_id"
+    )
 
-    # ==================================================
-    # 4️ MERGE FEATURES
-    # ==================================================
-    features = enrol_f.merge(demo_f, on=["state", "date"], how="left")
-    features = features.merge(bio_f, on=["state", "date"], how="left")
 
-    features["state"] = features["state"].astype(str).str.strip()
-    features = features[~features["state"].str.isnumeric()]
-    features = features[features["state"].str.len() > 3]
+# ==================================================
+# 5b DISTRICT & PIN FORECASTS AND GENOMES
+# ==================================================
+def levels_stage(sources, levels, low_factor, medium_factor, high_factor, workers=0):
+    if not levels:
+        return {}
 
-    # ==================================================
-    #  AGGREGATE TO STATE–DATE LEVEL
-    # ==================================================
-    numeric_cols = features.select_dtypes(include="number").columns
+    print(f" Forecasting levels: {', '.join(levels)}")
 
-    features = (
-        features
-        .groupby(["state", "date"], as_index=False)[numeric_cols]
-        .sum()
+    valid = sources["valid_states"]
+    return src.hierarchy.forecast_hierarchy(
+        *[sources[n][sources[n]["state_id"].isin(valid)] for n in ("enrol", "demo", "bio")],
+        levels=levels,
+        workers=workers,
+        low_factor=low_factor,
+        medium_factor=medium_factor,
+        high_factor=high_factor
     )
 
-    print(f" Valid states after cleaning: {features['state'].nunique()}")
 
-    features.to_csv(
-        processed_dir / "feature_dataset.csv",
-        index=False
+# ==================================================
+# 5c CLUSTERED DISTRICT & PIN ARCHETYPES
+# ==================================================
+def archetypes_stage(level_outputs, clusters=0):
+    # Mini-batch k-means over the normalized genomes, warm-started from
+    # the centroids saved by the previous run (a declared input of the
+    # stage; they are saved by `write_archetypes`). The rule-based
+    # `archetype` column of each genome output stays as the fallback.
+    if not clusters:
+        return {}
+
+    archetypes = {}
+    for level, (_, genome) in level_outputs.items():
+        if level == "state":
+            continue
+        init = src.archetypes.load_centroids(level, clusters)
+        result = src.archetypes.cluster_archetypes(
+            genome, src.hierarchy.LEVELS[level], clusters, init=init
+        )
+
+        stats = result["stats"]
+        if stats["fallback"]:
+            print(f" Archetypes {level}: {stats['units']} units, rule-based labels kept")
+        else:
+            print(
+                f" Archetypes {level}: {stats['units']} units → {stats['clusters']} clusters "
+                f"({'warm' if stats['warm_start'] else 'cold'} start, "
+                f"{stats['iterations']} batches, inertia {stats['inertia']:.4f})"
+            )
+        archetypes[level] = result
+    return archetypes
+
+
+# ==================================================
+# 6️ STRESS GENOME
+# ==================================================
+def genome_stage(features):
+    genome = src.stress_genome.compute_stress_genome(features, key="state_id")
+    return src.stress_genome.assign_archetypes(genome)
+
+
+# ==================================================
+# PUBLISHING
+# ==================================================
+def publish_output(writer, geo, df, name, csv_dir=None, export_csv=False, **kwargs):
+    # Decoding stays here; serialization runs on the writer's pool
+    csv_path = None
+    if export_csv and csv_dir is not None:
+        csv_dir.mkdir(parents=True, exist_ok=True)
+        csv_path = csv_dir / f"{name}.csv"
+
+    writer.write(geo.decode(df), name, csv_path=csv_path, **kwargs)
+
+
+def _publish(pipeline, df, name, csv_dir=None, **kwargs):
+    publish_output(
+        pipeline.writer, pipeline.value("geography"), df, name, csv_dir,
+        export_csv=pipeline.context["export_csv"], **kwargs
+    )
+
+
+def publish_geography(geo, pipeline):
+    pipeline.writer.write(geo.to_frame(), "geography", partition_by=None)
+
+
+def publish_granular(granular, pipeline):
+    _publish(pipeline, granular, "granular_uidai", BASE_DIR / "data" / "processed")
+    print(" Granular UIDAI saved → granular_uidai artifact")
+
+
+def write_rollups(writer, geo, rollups, append=False):
+    # Appended pieces leave the dashboard manifest to the caller
+    for level, rollup in rollups.items():
+        writer.write(geo.decode(rollup), f"rollup_{level}", append=append)
+    if not append:
+        write_dashboard_manifest(writer, geo, rollups["state"])
+
+
+def write_dashboard_manifest(writer, geo, state_rollup):
+    # States and date bounds for the dashboard's first paint, published
+    # with the snapshot
+    path = write_manifest(build_manifest(geo.decode(state_rollup)), writer.path)
+    writer.record(path.name)
+
+
+def publish_rollups(rollups, pipeline):
+    write_rollups(pipeline.writer, pipeline.value("geography"), rollups)
+
+
+def write_surges(writer, geo, surges, export_csv=False):
+    results_dir = BASE_DIR / "results"
+    publish_output(writer, geo, surges["alerts"], "surge_alerts", results_dir, export_csv)
+    publish_output(
+        writer, geo, surges["topk"], "surge_topk", results_dir, export_csv,
+        partition_by=None
+    )
+    print(f" {len(surges['alerts'])} surge alerts raised")
+
+
+def publish_surges(surges, pipeline):
+    write_surges(
+        pipeline.writer, pipeline.value("geography"), surges,
+        export_csv=pipeline.context["export_csv"]
+    )
+
+
+def publish_features(features, pipeline):
+    # Save date-wise features for trend analysis (REAL DATA)
+    _publish(pipeline, features, "feature_dataset", BASE_DIR / "data" / "processed")
+
+
+def publish_policy(policy_output, pipeline):
+    _publish(pipeline, policy_output, "final_policy_output", BASE_DIR / "results")
+
+
+def publish_rolling(rolling, pipeline):
+    _publish(pipeline, rolling, "rolling_features", BASE_DIR / "results")
+
+
+def publish_horizons(horizons, pipeline):
+    _publish(pipeline, horizons, "forecast_horizons", BASE_DIR / "results")
+
+
+def write_backtest(writer, geo, backtest, export_csv=False):
+    results_dir = BASE_DIR / "results"
+    publish_output(writer, geo, backtest["series"], "backtest_state", results_dir, export_csv)
+    publish_output(
+        writer, geo, backtest["summary"], "backtest_summary", results_dir, export_csv,
+        partition_by=None
+    )
+
+    if backtest["summary"].empty:
+        print(" Backtest: not enough history to score any origin")
+        return
+
+    one_step = backtest["summary"].iloc[0]
+    print(
+        f" Backtest: {int(one_step['origins'])} origins, "
+        f"{int(one_step['horizon'])}-step MAE {one_step['trend_mae']:.4f} "
+        f"(last value {one_step['naive_mae']:.4f})"
     )
 
-    # ==================================================
-    # 5️ RISK SCORING
-    # ==================================================
-    # Save feature dataset WITH risk for trend analysis
-    # Save date-wise risk for trend analysis (REAL DATA)
-    features.to_csv(
-    processed_dir / "feature_dataset.csv",
-    index=False
-)
+
+def publish_backtest(backtest, pipeline):
+    write_backtest(
+        pipeline.writer, pipeline.value("geography"), backtest,
+        export_csv=pipeline.context["export_csv"]
+    )
+
+
+def write_scenarios(writer, geo, cube, export_csv=False, top_n=10):
+    ranked = cube.top(len(cube.scenarios)).reset_index()
+    ranked.insert(0, "rank", range(1, len(ranked) + 1))
+
+    results_dir = BASE_DIR / "results"
+    publish_output(
+        writer, geo, ranked, "policy_scenarios", results_dir, export_csv,
+        partition_by=None
+    )
+    publish_output(
+        writer, geo, cube.frame(ranked["scenario"].head(top_n)),
+        "policy_scenarios_top", results_dir, export_csv
+    )
+    print(f" {len(ranked)} policy scenarios evaluated")
+
+
+def publish_scenarios(cube, pipeline):
+    write_scenarios(
+        pipeline.writer, pipeline.value("geography"), cube,
+        export_csv=pipeline.context["export_csv"],
+        top_n=pipeline.context.get("scenario_top", 10)
+    )
 
 
-    # ==================================================
-    # 6️ FORECASTING
-    # ==================================================
-    forecast = forecast_state_risk(features)
+def publish_levels(level_outputs, pipeline):
+    for level, (output, level_genome) in level_outputs.items():
+        _publish(pipeline, output, f"final_policy_output_{level}", BASE_DIR / "results")
+        _publish(pipeline, level_genome, f"stress_genome_output_{level}", BASE_DIR / "results")
 
-    # ==================================================
-    # 7️ POLICY SIMULATION
-    # ==================================================
-    policy_output = apply_policy_scenarios(forecast)
 
+def write_archetypes(writer, geo, archetypes, export_csv=False):
+    # Also keeps the centroids as the next run's warm start
     results_dir = BASE_DIR / "results"
-    results_dir.mkdir(exist_ok=True)
+    for level, result in archetypes.items():
+        publish_output(
+            writer, geo, result["units"], f"genome_clusters_{level}", results_dir, export_csv
+        )
+        if result["centroids"] is not None:
+            publish_output(
+                writer, geo, result["centroids"], f"archetype_centroids_{level}", results_dir,
+                export_csv, partition_by=None
+            )
+            src.archetypes.save_centroids(level, result["centroids"])
 
-    policy_output.to_csv(
-        results_dir / "final_policy_output.csv",
-        index=False
+
+def publish_archetypes(archetypes, pipeline):
+    write_archetypes(
+        pipeline.writer, pipeline.value("geography"), archetypes,
+        export_csv=pipeline.context["export_csv"]
     )
 
-    # ==================================================
-    # 8️ STRESS GENOME
-    # ==================================================
-    genome = compute_stress_genome(features)
-    genome = assign_archetypes(genome)
 
-    genome.to_csv(
-        results_dir / "stress_genome_output.csv",
-        index=False
+def publish_genome(genome, pipeline):
+    _publish(
+        pipeline, genome, "stress_genome_output", BASE_DIR / "results",
+        partition_by=None
     )
+    print(" Stress Genome saved")
+
+
+def build_stages(
+    levels=("district", "pincode"),
+    workers: int = 0,
+    policy_factors=(0.90, 0.70, 0.50),
+    scenario_grid=None,
+    n_boot: int = BOOTSTRAP_SAMPLES,
+    horizons=HORIZONS,
+    compact: bool = False,
+    clusters: int = 0
+):
+    """
+    Declared stage graph of the AIDSP pipeline
+    """
+    low, medium, high = policy_factors
+
+    return [
+        Stage(
+            "raw", load_raw, options={"workers": workers},
+            files=src.data_loader.raw_paths, cache=False
+        ),
+        Stage("geography", build_geography, ["raw"], sink=publish_geography),
+        Stage("sources", encode_sources, ["raw", "geography"], params={"compact": compact}),
+        Stage(
+            "granular", granular_stage, ["sources", "geography"],
+            params={"compact": compact},
+            sink=publish_granular,
+            sink_deps=["geography"]
+        ),
+        Stage(
+            "rollups", rollups_stage, ["granular"],
+            sink=publish_rollups, sink_deps=["geography"]
+        ),
+        Stage(
+            "surge", surge_stage, ["granular", "geography"],
+            sink=publish_surges, sink_deps=["geography"]
+        ),
+        Stage(
+            "features", features_stage, ["sources"],
+            params={"compact": compact},
+            options={"workers": workers},
+            sink=publish_features,
+            sink_deps=["geography"]
+        ),
+        Stage("risk", risk_stage, ["features"]),
+        Stage(
+            "forecast", forecast_stage, ["risk"],
+            params={"n_boot": n_boot},
+            options={"workers": workers}
+        ),
+        Stage(
+            "rolling", rolling_stage, ["risk"],
+            params={"windows": list(horizons)},
+            sink=publish_rolling,
+            sink_deps=["geography"]
+        ),
+        Stage(
+            "horizons", horizons_stage, ["risk", "rolling"],
+            params={"horizons": list(horizons)},
+            sink=publish_horizons,
+            sink_deps=["geography"]
+        ),
+        Stage(
+            "backtest", backtest_stage, ["risk"],
+            sink=publish_backtest, sink_deps=["geography"]
+        ),
+        Stage(
+            "policy", policy_stage, ["forecast"],
+            params={"low_factor": low, "medium_factor": medium, "high_factor": high},
+            sink=publish_policy,
+            sink_deps=["geography"]
+        ),
+        Stage(
+            "scenarios", scenarios_stage, ["forecast"],
+            params=dict(scenario_grid or SCENARIO_GRID),
+            sink=publish_scenarios,
+            sink_deps=["geography"]
+        ),
+        Stage(
+            "levels", levels_stage, ["sources"],
+            params={
+                "levels": list(levels or []),
+                "low_factor": low, "medium_factor": medium, "high_factor": high
+            },
+            options={"workers": workers},
+            sink=publish_levels,
+            sink_deps=["geography"]
+        ),
+        Stage(
+            "archetypes", archetypes_stage, ["levels"],
+            params={"clusters": clusters},
+            files=src.archetypes.centroid_files if clusters else None,
+            sink=publish_archetypes,
+            sink_deps=["geography"]
+        ),
+        Stage(
+            "genome", genome_stage, ["risk"],
+            sink=publish_genome, sink_deps=["geography"]
+        ),
+    ]
+
+
+def main(
+    export_csv: bool = False,
+    levels=("district", "pincode"),
+    workers: int = 0,
+    stages=None,
+    policy_factors=(0.90, 0.70, 0.50),
+    use_cache: bool = True,
+    scenario_grid=None,
+    scenario_top: int = 10,
+    n_boot: int = BOOTSTRAP_SAMPLES,
+    horizons=HORIZONS,
+    trace_memory: bool = False,
+    profile=(),
+    compact: bool = False,
+    clusters: int = 0,
+    keep_snapshots: int = KEEP_SNAPSHOTS
+):
+    print(" Starting AIDSP Pipeline")
+
+    monitor = run_monitor(trace_memory, profile)
+
+    # Sinks queue their artifacts on a background writer pool; the run
+    # is published as one snapshot only once every stage succeeded
+    with src.artifact_store.SnapshotWriter(keep=keep_snapshots) as writer:
+        pipeline = Pipeline(
+            build_stages(
+                levels, workers, policy_factors, scenario_grid, n_boot, horizons, compact,
+                clusters
+            ),
+            cache_dir=BASE_DIR / "data" / "cache",
+            use_cache=use_cache,
+            context={"export_csv": export_csv, "scenario_top": scenario_top},
+            monitor=monitor,
+            release=compact,
+            writer=writer
+        )
+
+        status = pipeline.run(stages)
+        with monitor.stage("commit", kind="publish"):
+            writer.commit()
+        # Only now do the sinks count as published
+        pipeline.mark_published()
+    print(f" Artifacts published: snapshot {writer.published.name}")
+
+    for name in pipeline.upstream(stages or STAGES):
+        print(f"   {name:<10} {status.get(name, 'skipped')}")
+
+    if compact:
+        print_memory(monitor)
+
+    write_run_report(monitor, "full", status=status, workers=workers, compact=compact)
 
-    print( Stress Genome saved")
     print(" AIDSP Pipeline Completed Successfully")
 
+    return pipeline
+
+
+# ==================================================
+# RUN REPORT
+# ==================================================
+def run_monitor(trace_memory=False, profile=()):
+    return src.instrumentation.RunMonitor(
+        trace_memory=trace_memory,
+        profile=profile,
+        profile_dir=BASE_DIR / "results" / "profiles"
+    )
+
+
+def print_memory(monitor):
+    """
+    Process memory before and after each computed stage
+    """
+    print(f"   {'stage':<10}{'RSS before':>12}{'RSS after':>11}{'output MB':>11}")
+    for r in monitor.stages:
+        if r["kind"] == "compute":
+            print(
+                f"   {r['stage']:<10}{r['rss_before_mb'] or 0:>12.0f}{r['rss_mb'] or 0:>11.0f}"
+                f"{(r.get('bytes_out') or 0) / 2 ** 20:>11.1f}"
+            )
+
+
+def write_run_report(monitor, mode, **meta):
+    """
+    Save the per-stage measurements as results/run_report.json
+    """
+    monitor.meta.update({
+        "mode": mode,
+        "raw_bytes": {
+            path.name: path.stat().st_size for path in src.data_loader.raw_paths() if path.exists()
+        },
+        **meta,
+    })
+    path = monitor.write(BASE_DIR / "results")
+    print(f" Run report: {path}")
+
+    status = meta.get("status") or {}
+    for name in monitor.unprofiled():
+        print(
+            f" Warning: --profile {name}: not computed in this run "
+            f"({status.get(name, 'not needed')}), no profile written"
+        )
+
+
+def update_main(
+    slice_dir: Path,
+    export_csv: bool = False,
+    levels=("district", "pincode"),
+    workers: int = 0,
+    policy_factors=(0.90, 0.70, 0.50),
+    scenario_grid=None,
+    scenario_top: int = 10,
+    n_boot: int = BOOTSTRAP_SAMPLES,
+    horizons=HORIZONS,
+    trace_memory: bool = False,
+    profile=(),
+    clusters: int = 0,
+    keep_snapshots: int = KEEP_SNAPSHOTS
+):
+    """
+    Append-only daily update: absorb new enrolment, demographic and
+    biometric rows from `slice_dir` (same file names as the raw data)
+    and refresh outputs for the series that received data.
+
+    Every slice header is checked before anything changes. The slice
+    is appended to the raw history first and the state, which records
+    the raw file sizes it covers, is saved last in one atomic replace;
+    raw rows left past those sizes by an interrupted update are cut
+    off on the next one. Both are saved before the outputs are
+    published, so a failed publish never leaves the published snapshot
+    ahead of them.
+    """
+    print(" Starting AIDSP incremental update")
+
+    slice_paths = {
+        source: Path(slice_dir) / file_name
+        for source, file_name in src.data_loader.RAW_FILES.items()
+    }
+    for source, path in slice_paths.items():
+        src.data_loader.check_raw_slice(source, path)
+
+    monitor = run_monitor(trace_memory, profile)
+    state_file = BASE_DIR / "data" / "incremental" / "state.pkl"
+    with monitor.stage("load_state", kind="load") as record:
+        state = record["output"] = src.incremental.load_state(state_file)
+
+    if state is not None and "raw_sizes" in state:
+        sizes = src.data_loader.raw_sizes()
+        if any(sizes[s] < size for s, size in state["raw_sizes"].items()):
+            print(" Raw history no longer matches the incremental state; rebuilding it")
+            state = None
+        elif sizes != state["raw_sizes"]:
+            print(" Dropping raw rows of an interrupted update")
+            for source, size in state["raw_sizes"].items():
+                src.data_loader.truncate_raw(source, size)
+
+    if state is None:
+        print(" No incremental state yet; building it from the raw history")
+        raw = load_raw()
+        with monitor.stage("build_state", inputs=raw) as record:
+            state = record["output"] = src.incremental.build_state(
+                raw["enrol"], raw["demo"], raw["bio"],
+                levels=["state"] + list(levels or [])
+            )
+
+    with monitor.stage("slice", kind="load") as record:
+        new_rows = record["output"] = [
+            src.data_loader.load_raw_typed(source, path=path)
+            for source, path in slice_paths.items()
+        ]
+
+    with monitor.stage("apply_update", inputs=new_rows) as record:
+        state, affected = src.incremental.apply_update(state, *new_rows)
+        record["output"] = state
+
+    for level, ids in affected.items():
+        print(f"   {level:<9} {len(ids)} series refreshed")
+
+    # The slice becomes part of the raw history for future full runs
+    state["raw_sizes"] = {
+        source: src.data_loader.append_raw_slice(source, path)
+        for source, path in slice_paths.items()
+    }
+
+    with monitor.stage("save_state", kind="store"):
+        src.incremental.save_state(state, state_file)
+
+    publish_state(
+        state, export_csv, n_boot, monitor, clusters, keep_snapshots,
+        workers=workers, policy_factors=policy_factors, scenario_grid=scenario_grid,
+        scenario_top=scenario_top, horizons=horizons
+    )
+
+    write_run_report(
+        monitor, "update",
+        refreshed={level: len(ids) for level, ids in affected.items()}
+    )
+
+    print(" AIDSP Incremental Update Completed Successfully")
+
+
+def publish_state(
+    state, export_csv=False, n_boot=BOOTSTRAP_SAMPLES, monitor=None, clusters=0,
+    keep_snapshots=KEEP_SNAPSHOTS, workers=0, policy_factors=(0.90, 0.70, 0.50),
+    scenario_grid=None, scenario_top=10, horizons=HORIZONS, writer=None
+):
+    """
+    Write every pipeline output from an incremental state as one
+    snapshot, with the same output options as the full run. With
+    `writer`, the outputs join that writer's snapshot instead, which
+    the caller commits.
+    """
+    monitor = monitor or run_monitor()
+    geo = state["geo"]
+    with monitor.stage("outputs", inputs=state) as record:
+        outputs = record["output"] = src.incremental.state_outputs(
+            state, n_boot=n_boot, policy_factors=policy_factors, workers=workers
+        )
+
+    with monitor.stage("publish", kind="publish"):
+        with nullcontext(writer) if writer else src.artifact_store.SnapshotWriter(
+            keep=keep_snapshots
+        ) as writer:
+            _write_outputs(
+                writer, geo, outputs, export_csv, clusters,
+                scenario_grid=scenario_grid, scenario_top=scenario_top, horizons=horizons
+            )
+
+
+def _write_outputs(
+    writer, geo, outputs, export_csv=False, clusters=0, scenario_grid=None, scenario_top=10,
+    horizons=HORIZONS
+):
+    processed_dir = BASE_DIR / "data" / "processed"
+    results_dir = BASE_DIR / "results"
+
+    writer.write(geo.to_frame(), "geography", partition_by=None)
+    if "granular" in outputs:
+        publish_output(
+            writer, geo, outputs["granular"], "granular_uidai", processed_dir, export_csv
+        )
+        write_rollups(writer, geo, src.rollups.build_rollups(outputs["granular"]))
+    publish_output(writer, geo, outputs["features"], "feature_dataset", processed_dir, export_csv)
+
+    risk = risk_stage(outputs["features"])
+    rolling = rolling_stage(risk, horizons)
+    publish_output(writer, geo, rolling, "rolling_features", results_dir, export_csv)
+    publish_output(
+        writer, geo, horizons_stage(risk, rolling, horizons), "forecast_horizons", results_dir,
+        export_csv
+    )
+    write_backtest(writer, geo, backtest_stage(risk), export_csv)
+
+    write_surges(writer, geo, outputs["surges"], export_csv)
+
+    for level, (policy, genome) in outputs["levels"].items():
+        suffix = "" if level == "state" else f"_{level}"
+        publish_output(
+            writer, geo, policy, f"final_policy_output{suffix}", results_dir, export_csv
+        )
+        publish_output(
+            writer, geo, genome, f"stress_genome_output{suffix}", results_dir, export_csv,
+            partition_by=None if level == "state" else "state"
+        )
+
+    write_archetypes(writer, geo, archetypes_stage(outputs["levels"], clusters), export_csv)
+
+    state_policy = outputs["levels"]["state"][0]
+    write_scenarios(
+        writer, geo, scenarios_stage(state_policy, **dict(scenario_grid or SCENARIO_GRID)),
+        export_csv, top_n=scenario_top
+    )
+
+
+def out_of_core_main(
+    memory_mb: int,
+    shard_by: str = "state",
+    workers: int = 0,
+    export_csv: bool = False,
+    levels=("district", "pincode"),
+    policy_factors=(0.90, 0.70, 0.50),
+    scenario_grid=None,
+    scenario_top: int = 10,
+    n_boot: int = BOOTSTRAP_SAMPLES,
+    horizons=HORIZONS,
+    trace_memory: bool = False,
+    profile=(),
+    clusters: int = 0,
+    keep_snapshots: int = KEEP_SNAPSHOTS
+):
+    """
+    Full rebuild for raw files larger than memory: sharded map-reduce
+    into the incremental state, then the usual outputs. The state is
+    saved first, so later --update runs continue from it.
+    """
+    print(" Starting AIDSP out-of-core build")
+
+    monitor = run_monitor(trace_memory, profile)
+    sizes = src.data_loader.raw_sizes()
+    state_file = BASE_DIR / "data" / "incremental" / "state.pkl"
+    processed_dir = BASE_DIR / "data" / "processed"
+
+    with src.artifact_store.SnapshotWriter(keep=keep_snapshots) as writer:
+        state_rollups = []
+
+        def publish_partition(granular, geo):
+            # Granular rows and rollups are appended one reduce
+            # partition at a time
+            publish_output(
+                writer, geo, granular, "granular_uidai", processed_dir, export_csv, append=True
+            )
+            rollups = src.rollups.build_rollups(granular)
+            write_rollups(writer, geo, rollups, append=True)
+            state_rollups.append(rollups["state"])
+
+        with monitor.stage("map_reduce") as record:
+            state = record["output"] = src.out_of_core.run_out_of_core(
+                memory_mb,
+                shard_by=shard_by,
+                workers=workers,
+                levels=["state"] + list(levels or []),
+                state_dir=state_file.parent / f"{state_file.stem}.parts.{writer.version}",
+                on_partition=publish_partition
+            )
+        state["raw_sizes"] = sizes
+        write_dashboard_manifest(writer, state["geo"], pd.concat(state_rollups, ignore_index=True))
+
+        with monitor.stage("save_state", kind="store"):
+            src.incremental.save_state(state, state_file)
+        publish_state(
+            state, export_csv, n_boot, monitor, clusters, keep_snapshots,
+            workers=workers, policy_factors=policy_factors, scenario_grid=scenario_grid,
+            scenario_top=scenario_top, horizons=horizons, writer=writer
+        )
+
+    write_run_report(
+        monitor, "out-of-core",
+        memory_mb=memory_mb, shard_by=shard_by, workers=workers
+    )
+
+    print(" AIDSP Out-of-Core Build Completed Successfully")
+
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the AIDSP pipeline")
+    parser.add_argument(
+        "--export-csv",
+        action="store_true",
+        help="also write the legacy CSV outputs"
+    )
+    parser.add_argument(
+        "--levels",
+        nargs="*",
+        default=["district", "pincode"],
+        choices=["district", "pincode"],
+        help="sub-state levels to forecast (none to skip)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="process pool size for raw ingestion, state-sharded features and "
+             "level forecasts, out-of-core shards, and forecast bootstrap blocks"
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=STAGES,
+        help="run only these stages (plus whatever they need)"
+    )
+    parser.add_argument(
+        "--policy-factors",
+        nargs=3,
+        type=float,
+        default=[0.90, 0.70, 0.50],
+        metavar=("LOW", "MEDIUM", "HIGH"),
+        help="risk multipliers for the three intervention scenarios"
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=BOOTSTRAP_SAMPLES,
+        metavar="N",
+        help="residual bootstrap resamples for forecast intervals (0 to skip)"
+    )
+    parser.add_argument(
+        "--horizons",
+        nargs="+",
+        type=int,
+        default=list(HORIZONS),
+        help="forecast horizons in days for the horizon table"
+    )
+    parser.add_argument(
+        "--archetype-clusters",
+        type=int,
+        default=0,
+        metavar="K",
+        help="cluster district and pincode genomes into K archetypes with "
+             "mini-batch k-means (0 keeps only the rule-based archetypes)"
+    )
+    parser.add_argument(
+        "--scenario-intensities",
+        nargs="+",
+        type=float,
+        default=SCENARIO_GRID["intensities"],
+        help="intervention intensities (fraction of risk removed) to sweep"
+    )
+    parser.add_argument(
+        "--scenario-budgets",
+        nargs="+",
+        type=float,
+        default=SCENARIO_GRID["budgets"],
+        help="budget caps in full-intensity state interventions ('inf' for none)"
+    )
+    parser.add_argument(
+        "--scenario-rollouts",
+        nargs="+",
+        type=float,
+        default=SCENARIO_GRID["rollouts"],
+        help="rollout phases as the fraction of the effect realised"
+    )
+    parser.add_argument(
+        "--scenario-top",
+        type=int,
+        default=10,
+        help="scenarios whose per-state results are published"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="recompute every stage instead of reusing cached outputs"
+    )
+    parser.add_argument(
+        "--update",
+        type=Path,
+        metavar="SLICE_DIR",
+        help="absorb a new slice of raw files incrementally"
+    )
+    parser.add_argument(
+        "--out-of-core",
+        type=int,
+        metavar="MEMORY_MB",
+        help="sharded map-reduce build within about this much memory"
+    )
+    parser.add_argument(
+        "--shard-by",
+        choices=["state", "date"],
+        default="state",
+        help="out-of-core shard layout"
+    )
+    parser.add_argument(
+        "--keep-snapshots",
+        type=int,
+        default=KEEP_SNAPSHOTS,
+        metavar="N",
+        help="published artifact snapshots to retain (older ones are deleted)"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="+",
+        default=[],
+        metavar="STAGE",
+        help="run these stages under cProfile (dumps in results/profiles/); a stage "
+             "served from cache is not profiled"
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="memory-budget mode: compact dtypes and free stage values early"
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="record each stage's peak allocations with tracemalloc (slower)"
+    )
+    args = parser.parse_args()
+
+    if args.bootstrap < 0:
+        parser.error("--bootstrap must be 0 or more")
+    if args.update and args.out_of_core:
+        parser.error("--update and --out-of-core are separate modes")
+    if args.update or args.out_of_core:
+        # Options of the cached stage graph only
+        for flag, given in [
+            ("--stages", args.stages), ("--no-cache", args.no_cache), ("--compact", args.compact)
+        ]:
+            if given:
+                parser.error(f"{flag} applies to full runs, not --update or --out-of-core")
+
+    profilable = (
+        OUT_OF_CORE_STAGES if args.out_of_core else UPDATE_STAGES if args.update else STAGES
+    )
+    unknown = [name for name in args.profile if name not in profilable]
+    if unknown:
+        parser.error(
+            f"--profile: unknown stage(s) {', '.join(unknown)} "
+            f"(choose from {', '.join(profilable)})"
+        )
+
+    report = {"trace_memory": args.trace_memory, "profile": args.profile}
+    # Output options shared by every mode
+    options = {
+        "export_csv": args.export_csv,
+        "levels": args.levels,
+        "workers": args.workers,
+        "policy_factors": args.policy_factors,
+        "scenario_grid": {
+            "intensities": args.scenario_intensities,
+            "budgets": args.scenario_budgets,
+            "rollouts": args.scenario_rollouts,
+        },
+        "scenario_top": args.scenario_top,
+        "n_boot": args.bootstrap,
+        "horizons": args.horizons,
+        "clusters": args.archetype_clusters,
+        "keep_snapshots": args.keep_snapshots,
+    }
+
+    if args.out_of_core:
+        out_of_core_main(args.out_of_core, shard_by=args.shard_by, **options, **report)
+    elif args.update:
+        update_main(args.update, **options, **report)
+    else:
+        main(
+            stages=args.stages,
+            use_cache=not args.no_cache,
+            compact=args.compact,
+            **options,
+            **report
+        )
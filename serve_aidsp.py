@@ -0,0 +1,60 @@
+from src.risk_service import CACHE_SIZE, RiskService, make_server
+
+
+def main(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    watch: float = 10.0,
+    cache_size: int = CACHE_SIZE,
+    verbose: bool = False
+):
+    """
+    Serve risk, intervention and recommendation lookups from the latest
+    pipeline outputs until interrupted
+    """
+    service = RiskService(cache_size=cache_size)
+    health = service.health()
+    print(f" Risk service: snapshot {health['version']} ({health['rows']})")
+
+    if watch:
+        service.watch(watch)
+
+    server = make_server(service, host, port, verbose=verbose)
+    print(f" Serving on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON risk query service")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to bind")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument(
+        "--watch",
+        type=float,
+        default=10.0,
+        metavar="SECONDS",
+        help="check for new pipeline outputs this often and hot-swap them (0 to disable)"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=CACHE_SIZE,
+        help="responses kept in the LRU cache"
+    )
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    main(
+        host=args.host,
+        port=args.port,
+        watch=args.watch,
+        cache_size=args.cache_size,
+        verbose=args.verbose
+    )
@@ -0,0 +1,285 @@
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.stress_genome import GENOME_COLUMNS, assign_archetypes
+
+# Base project path
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+CENTROID_DIR = BASE_DIR / "data" / "archetypes"
+
+BATCH_SIZE = 2048
+MAX_ITER = 200
+# Stop once the smoothed batch inertia has not improved for PATIENCE
+# batches, or the centroids move less than TOL (mean squared shift)
+TOL = 1e-8
+PATIENCE = 10
+# Rows per block when every unit is assigned (bounds the distance matrix)
+ASSIGN_CHUNK = 65_536
+# Centroid dimensions at least this many standard deviations from the
+# level mean name the cluster's profile
+PROFILE_Z = 0.5
+# A level is clustered only with at least this many units per cluster;
+# smaller levels keep the rule-based archetypes
+MIN_UNITS_PER_CLUSTER = 5
+
+
+# ==================================================
+# MINI-BATCH K-MEANS
+# ==================================================
+def _sq_distances(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    d = (
+        (x * x).sum(axis=1)[:, None]
+        - 2.0 * x @ centroids.T
+        + (centroids * centroids).sum(axis=1)[None, :]
+    )
+    return np.maximum(d, 0.0)
+
+
+def assign_clusters(x: np.ndarray, centroids: np.ndarray, chunk: int = ASSIGN_CHUNK):
+    """
+    Nearest centroid and squared distance for every row, in blocks of
+    `chunk` rows
+    """
+    labels = np.empty(len(x), dtype=np.int32)
+    dist = np.empty(len(x))
+    for lo in range(0, len(x), chunk):
+        d = _sq_distances(x[lo:lo + chunk], centroids)
+        labels[lo:lo + chunk] = d.argmin(axis=1)
+        dist[lo:lo + chunk] = d[np.arange(len(d)), labels[lo:lo + chunk]]
+    return labels, dist
+
+
+def kmeans_plus_plus(x: np.ndarray, k: int, rng) -> np.ndarray:
+    """
+    k-means++ seeding: each next centroid drawn in proportion to the
+    squared distance to the nearest one chosen so far
+    """
+    centroids = np.empty((k, x.shape[1]))
+    centroids[0] = x[rng.integers(len(x))]
+    closest = _sq_distances(x, centroids[:1])[:, 0]
+    for j in range(1, k):
+        total = closest.sum()
+        pick = rng.choice(len(x), p=closest / total) if total > 0 else rng.integers(len(x))
+        centroids[j] = x[pick]
+        closest = np.minimum(closest, _sq_distances(x, centroids[j:j + 1])[:, 0])
+    return centroids
+
+
+def minibatch_kmeans(
+    x: np.ndarray,
+    k: int,
+    init: np.ndarray = None,
+    batch_size: int = BATCH_SIZE,
+    max_iter: int = MAX_ITER,
+    tol: float = TOL,
+    seed: int = 0
+) -> dict:
+    """
+    Mini-batch k-means (Sculley, 2010). Each batch moves every centroid
+    to the running mean of the samples assigned to it so far, which is
+    the per-sample update with learning rate 1 / count done for the
+    whole batch at once. Memory is O(batch_size * k) plus the data.
+    `init` warm-starts from earlier centroids, weighted as one batch of
+    evidence each so they move only as far as the new data asks;
+    otherwise k-means++ seeds from a sample.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.ascontiguousarray(x, dtype=np.float64)
+
+    if init is not None:
+        centroids = np.array(init, dtype=np.float64)
+    else:
+        sample = x[rng.choice(len(x), min(len(x), max(3 * batch_size, 10 * k)), replace=False)]
+        centroids = kmeans_plus_plus(sample, k, rng)
+
+    size = min(batch_size, len(x))
+    counts = np.full(k, size / k if init is not None else 0.0)
+    smoothed, best, stale, iterations = None, np.inf, 0, 0
+    for iterations in range(1, max_iter + 1):
+        batch = x[rng.integers(0, len(x), size)]
+        d = _sq_distances(batch, centroids)
+        labels = d.argmin(axis=1)
+
+        # Exponentially weighted inertia per sample, as a convergence signal
+        inertia = d[np.arange(size), labels].mean()
+        smoothed = inertia if smoothed is None else 0.9 * smoothed + 0.1 * inertia
+        if smoothed < best:
+            best, stale = smoothed, 0
+        else:
+            stale += 1
+
+        m = np.bincount(labels, minlength=k).astype(np.float64)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, batch)
+
+        hit = m > 0
+        updated = centroids.copy()
+        updated[hit] = (counts[hit, None] * centroids[hit] + sums[hit]) / (counts[hit] + m[hit])[:, None]
+        counts += m
+
+        shift = ((updated - centroids) ** 2).sum(axis=1).mean()
+        centroids = updated
+        if shift < tol or stale >= PATIENCE:
+            break
+
+    labels, dist = assign_clusters(x, centroids)
+
+    # Re-seed empty clusters at the worst-served units
+    empty = np.flatnonzero(np.bincount(labels, minlength=k) == 0)
+    if len(empty):
+        worst = np.argsort(-dist, kind="mergesort")[:len(empty)]
+        centroids[empty[:len(worst)]] = x[worst]
+        labels, dist = assign_clusters(x, centroids)
+
+    return {
+        "centroids": centroids,
+        "labels": labels,
+        "distance": np.sqrt(dist),
+        "inertia": float(dist.sum()),
+        "iterations": iterations,
+    }
+
+
+# ==================================================
+# WARM START
+# ==================================================
+def load_centroids(level: str, k: int, directory: Path = None):
+    """
+    Centroids saved by the previous run of `level`, if they match `k`
+    and the genome columns
+    """
+    path = Path(directory or CENTROID_DIR) / f"{level}.json"
+    if not path.exists():
+        return None
+    with open(path) as f:
+        saved = json.load(f)
+    if saved.get("columns") != GENOME_COLUMNS or len(saved.get("centroids", [])) != k:
+        return None
+    return np.asarray(saved["centroids"], dtype=np.float64)
+
+
+def centroid_files(directory: Path = None) -> list:
+    """
+    Saved centroid tables, the warm-start inputs of the next run
+    """
+    return sorted(Path(directory or CENTROID_DIR).glob("*.json"))
+
+
+def save_centroids(level: str, centroids: pd.DataFrame, directory: Path = None) -> Path:
+    """
+    Keep a level's centroid table for the next run's warm start
+    """
+    directory = Path(directory or CENTROID_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{level}.json"
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump({
+            "columns": GENOME_COLUMNS,
+            "centroids": centroids[GENOME_COLUMNS].to_numpy().tolist(),
+            "created": datetime.now(timezone.utc).isoformat(),
+        }, f, indent=2)
+    tmp.replace(path)
+    return path
+
+
+# ==================================================
+# GENOME ARCHETYPES
+# ==================================================
+def describe_centroids(centroids: np.ndarray, x: np.ndarray) -> list:
+    """
+    Short profile of each centroid: its (at most two) most distinctive
+    genome dimensions against the level, e.g. "high age_pressure,
+    low growth_volatility"
+    """
+    spread = x.std(axis=0)
+    z = (centroids - x.mean(axis=0)) / np.where(spread > 0, spread, 1.0)
+
+    profiles = []
+    for row in z:
+        top = [j for j in np.argsort(-np.abs(row), kind="mergesort")[:2] if abs(row[j]) >= PROFILE_Z]
+        profiles.append(
+            ", ".join(f"{'high' if row[j] > 0 else 'low'} {GENOME_COLUMNS[j]}" for j in top)
+            or "typical"
+        )
+    return profiles
+
+
+def cluster_archetypes(
+    genome_df: pd.DataFrame,
+    key: str,
+    k: int,
+    init: np.ndarray = None,
+    seed: int = 0
+) -> dict:
+    """
+    Cluster normalized genome vectors into `k` archetypes.
+
+    Returns the per-unit table (key, cluster, archetype, profile,
+    distance), the centroid table and run stats. Each cluster carries
+    the rule-based archetype of its centroid and a profile of what sets
+    it apart within the level. Missing genome values are
+    filled with the column median for the distance only. Levels with
+    fewer than MIN_UNITS_PER_CLUSTER * k units fall back to the rule
+    labels with cluster -1.
+    """
+    values = genome_df[GENOME_COLUMNS].to_numpy(np.float64)
+    units = len(values)
+
+    if k < 1 or units < MIN_UNITS_PER_CLUSTER * k:
+        rules = assign_archetypes(genome_df)
+        return {
+            "units": pd.DataFrame({
+                key: genome_df[key].to_numpy(),
+                "cluster": np.full(units, -1, dtype=np.int32),
+                "archetype": rules["archetype"].to_numpy(),
+                "profile": np.full(units, None, dtype=object),
+                "distance": np.full(units, np.nan),
+            }),
+            "centroids": None,
+            "stats": {"units": units, "clusters": 0, "fallback": True},
+        }
+
+    finite = np.isfinite(values)
+    medians = np.array([
+        np.median(col[ok]) if ok.any() else 0.0 for col, ok in zip(values.T, finite.T)
+    ])
+    x = np.where(finite, values, medians)
+
+    if init is not None and init.shape != (k, len(GENOME_COLUMNS)):
+        init = None
+    fit = minibatch_kmeans(x, k, init=init, seed=seed)
+    centroids = fit["centroids"]
+
+    profile = pd.DataFrame(centroids, columns=GENOME_COLUMNS)
+    names = assign_archetypes(profile)["archetype"].to_numpy()
+    profiles = np.array(describe_centroids(centroids, x), dtype=object)
+
+    centroid_table = profile.assign(
+        cluster=np.arange(k, dtype=np.int32),
+        archetype=names,
+        profile=profiles,
+        units=np.bincount(fit["labels"], minlength=k),
+    )[["cluster", "archetype", "profile", "units"] + GENOME_COLUMNS]
+
+    return {
+        "units": pd.DataFrame({
+            key: genome_df[key].to_numpy(),
+            "cluster": fit["labels"],
+            "archetype": names[fit["labels"]],
+            "profile": profiles[fit["labels"]],
+            "distance": fit["distance"],
+        }),
+        "centroids": centroid_table,
+        "stats": {
+            "units": units, "clusters": k, "fallback": False,
+            "warm_start": init is not None, "iterations": fit["iterations"],
+            "inertia": round(fit["inertia"], 6),
+            "imputed_units": int((~finite.all(axis=1)).sum()),
+        },
+    }
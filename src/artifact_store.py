@@ -0,0 +1,433 @@
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from src.defaults import KEEP_SNAPSHOTS
+
+# Base project path
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+ARTIFACT_ROOT = BASE_DIR / "data" / "artifacts"
+
+MANIFEST_FILE = "manifest.json"
+
+# Versioned snapshots live under SNAPSHOT_DIR; CURRENT_FILE names the
+# one readers see and is replaced atomically on publish
+SNAPSHOT_DIR = "snapshots"
+CURRENT_FILE = "CURRENT"
+SNAPSHOT_INDEX = "snapshot.json"
+WRITER_WORKERS = 2
+# Staging directories of crashed runs are removed after this long
+STALE_STAGING_S = 24 * 3600
+
+try:
+    import pyarrow  # noqa: F401
+    DEFAULT_FORMAT = "parquet"
+except ImportError:
+    # Without pyarrow, fall back to compressed CSV partitions
+    DEFAULT_FORMAT = "csv"
+
+EXTENSIONS = {
+    "parquet": ".parquet",
+    "csv": ".csv.gz",
+}
+
+
+def _write_part(df: pd.DataFrame, path: Path, fmt: str):
+    if fmt == "parquet":
+        df.to_parquet(path, index=False, compression="zstd")
+    else:
+        df.to_csv(path, index=False, compression="gzip")
+
+
+def _read_part(path: Path, fmt: str, columns, date_columns) -> pd.DataFrame:
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+
+    parse = [c for c in date_columns if columns is None or c in columns]
+    return pd.read_csv(path, usecols=columns, parse_dates=parse)
+
+
+def current_snapshot(root: Path = None):
+    """
+    Directory of the published snapshot, or None before the first one
+    """
+    root = Path(root or ARTIFACT_ROOT)
+    pointer = root / CURRENT_FILE
+    if not pointer.exists():
+        return None
+    target = root / SNAPSHOT_DIR / pointer.read_text().strip()
+    return target if target.is_dir() else None
+
+
+def snapshot_root(root: Path = None) -> Path:
+    """
+    Where readers find artifacts: the current snapshot, or `root`
+    itself for stores written before snapshots (and for a snapshot
+    directory passed in directly, which pins it)
+    """
+    return current_snapshot(root) or Path(root or ARTIFACT_ROOT)
+
+
+def artifact_dir(name: str, root: Path = None) -> Path:
+    """
+    Directory holding one named artifact
+    """
+    return snapshot_root(root) / name
+
+
+def _write_csv(df: pd.DataFrame, path: Path):
+    # Readers of the CSV exports never see a partial file
+    tmp = path.with_name(f".{path.name}.tmp")
+    df.to_csv(tmp, index=False)
+    tmp.replace(path)
+
+
+def write_artifact(
+    df: pd.DataFrame,
+    name: str,
+    partition_by: str = "state",
+    root: Path = None,
+    fmt: str = None,
+    csv_path: Path = None,
+    append: bool = False
+) -> dict:
+    """
+    Write a frame as compressed columnar partitions plus a manifest.
+    Optionally also export a plain CSV copy to `csv_path`. With
+    `append`, `df` is added as further partitions of the artifact (and
+    rows of the CSV) when it exists, so a large table can be written
+    in pieces.
+    """
+    fmt = fmt or DEFAULT_FORMAT
+    target = Path(root or ARTIFACT_ROOT) / name
+
+    previous = None
+    if append and (target / MANIFEST_FILE).exists():
+        with open(target / MANIFEST_FILE) as f:
+            previous = json.load(f)
+        fmt = previous["format"]
+    else:
+        if target.exists():
+            shutil.rmtree(target)
+        target.mkdir(parents=True)
+
+    if partition_by is None:
+        groups = [(None, df)]
+    else:
+        groups = df.groupby(partition_by, observed=True, sort=True)
+
+    partitions = [] if previous is None else previous["partitions"]
+    for i, (key, part) in enumerate(groups, start=len(partitions)):
+        file_name = f"part-{i:05d}{EXTENSIONS[fmt]}"
+        _write_part(part, target / file_name, fmt)
+        partitions.append({
+            "key": None if key is None else str(key),
+            "file": file_name,
+            "rows": int(len(part))
+        })
+
+    manifest = {
+        "name": name,
+        "format": fmt,
+        "partition_by": partition_by,
+        "columns": list(df.columns),
+        "dtypes": {c: str(t) for c, t in df.dtypes.items()},
+        "date_columns": [
+            c for c in df.columns
+            if pd.api.types.is_datetime64_any_dtype(df[c])
+        ],
+        "rows": int(len(df)) + (0 if previous is None else previous["rows"]),
+        "partitions": partitions,
+        "created": datetime.now(timezone.utc).isoformat()
+    }
+
+    with open(target / MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if csv_path is not None:
+        if previous is None:
+            _write_csv(df, csv_path)
+        else:
+            df.to_csv(csv_path, mode="a", header=False, index=False)
+
+    return manifest
+
+
+def read_manifest(name: str, root: Path = None) -> dict:
+    """
+    Load the manifest of a stored artifact
+    """
+    with open(artifact_dir(name, root) / MANIFEST_FILE) as f:
+        return json.load(f)
+
+
+def artifact_exists(name: str, root: Path = None) -> bool:
+    return (artifact_dir(name, root) / MANIFEST_FILE).exists()
+
+
+def read_artifact(
+    name: str,
+    columns=None,
+    partitions=None,
+    root: Path = None
+) -> pd.DataFrame:
+    """
+    Read selected columns and partitions (e.g. states) of an artifact
+    """
+    # Resolve the snapshot once, so a publish mid-read cannot mix versions
+    root = snapshot_root(root)
+    manifest = read_manifest(name, root)
+    target = artifact_dir(name, root)
+
+    if columns is not None:
+        columns = [c for c in manifest["columns"] if c in set(columns)]
+
+    parts = manifest["partitions"]
+    if partitions is not None:
+        wanted = {str(p) for p in partitions}
+        parts = [p for p in parts if p["key"] in wanted]
+
+    frames = [
+        _read_part(
+            target / p["file"],
+            manifest["format"],
+            columns,
+            manifest["date_columns"]
+        )
+        for p in parts
+    ]
+
+    if not frames:
+        return pd.DataFrame(columns=columns or manifest["columns"])
+
+    return pd.concat(frames, ignore_index=True)
+
+
+# ==================================================
+# SNAPSHOT PUBLISHING
+# ==================================================
+def _link_or_copy(src: str, dst: str):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class SnapshotWriter:
+    """
+    Stage one run's artifacts in a new snapshot and publish them
+    together.
+
+    `write` hands serialization to a pool of background threads and
+    returns at once, so the pipeline keeps computing while earlier
+    artifacts are written; at most `max_pending` frames wait at a time.
+    Artifacts of the current snapshot are carried over (as hard links)
+    only when the caller claims them with `carry`, e.g. the outputs of
+    stages that are up to date; everything else the run did not write
+    is dropped. `commit` waits for the writes, carries over the claimed
+    artifacts, renames the staging directory into snapshots/<version>
+    and swaps CURRENT, then keeps the newest `keep` snapshots. CSV
+    exports are renamed into place only after the swap. As a context
+    manager it commits on success and discards the staging directory
+    on error.
+    """
+
+    def __init__(
+        self,
+        root: Path = None,
+        workers: int = WRITER_WORKERS,
+        keep: int = KEEP_SNAPSHOTS,
+        max_pending: int = None
+    ):
+        self.root = Path(root or ARTIFACT_ROOT)
+        self.keep = max(keep, 1)
+        self.max_pending = max_pending or 2 * workers
+        self.version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        self.path = self.root / SNAPSHOT_DIR / f".{self.version}.tmp"
+        self.path.mkdir(parents=True)
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(workers, 1), thread_name_prefix="artifact-writer"
+        )
+        self._pending = []
+        self._exports = []
+        self.written = []
+        self.carried = set()
+        self.published = None
+
+    def _write(self, df, name, csv_path, kwargs):
+        manifest = write_artifact(df, name, root=self.path, **kwargs)
+        if csv_path is not None:
+            csv_path = Path(csv_path)
+            tmp = csv_path.with_name(f".{csv_path.name}.{self.version}.tmp")
+            if kwargs.get("append") and (tmp, csv_path) in self._exports:
+                df.to_csv(tmp, mode="a", header=False, index=False)
+            else:
+                df.to_csv(tmp, index=False)
+                self._exports.append((tmp, csv_path))
+        return manifest
+
+    def write(self, df: pd.DataFrame, name: str, csv_path: Path = None, **kwargs):
+        """
+        Queue `write_artifact(df, name, ...)` into this snapshot. The
+        frame must not be modified afterwards. Pieces written with
+        `append=True` land in the order they were queued.
+        """
+        if kwargs.get("append"):
+            for queued, future in self._pending:
+                if queued == name:
+                    future.result()
+        while len(self._pending) >= self.max_pending:
+            self._pending.pop(0)[1].result()
+        future = self._pool.submit(self._write, df, name, csv_path, kwargs)
+        self._pending.append((name, future))
+        if name not in self.written:
+            self.written.append(name)
+        return future
+
+    def record(self, name: str):
+        """
+        Count a file the caller wrote into `path` itself as written
+        """
+        self.written.append(name)
+
+    def _previous(self, name: str):
+        # `name` in the current snapshot (or a pre-snapshot store), or None
+        path = snapshot_root(self.root) / name
+        if path.is_dir():
+            return path if (path / MANIFEST_FILE).exists() else None
+        return path if path.is_file() and name != SNAPSHOT_INDEX else None
+
+    def is_published(self, name: str) -> bool:
+        """
+        Whether `name` is in the current snapshot, so `carry` can keep it
+        """
+        return self._previous(name) is not None
+
+    def carry(self, names):
+        """
+        Keep these artifacts of the current snapshot in the new one
+        unless this run rewrites them; names not published are ignored
+        """
+        self.carried.update(names)
+
+    def wait(self):
+        """
+        Block until every queued write is done; re-raises a failed one
+        """
+        for _, future in self._pending:
+            future.result()
+        self._pending = []
+
+    def commit(self) -> Path:
+        """
+        Publish the snapshot (once); returns its directory
+        """
+        if self.published is not None:
+            return self.published
+        self.wait()
+        self._pool.shutdown()
+
+        previous = current_snapshot(self.root)
+        carried = [
+            entry for entry in map(self._previous, sorted(self.carried - set(self.written)))
+            if entry is not None
+        ]
+        if previous is not None and not any(self.path.iterdir()) and {
+            p.name for p in carried
+        } == {p.name for p in previous.iterdir() if p.name != SNAPSHOT_INDEX}:
+            # Nothing new and nothing dropped: the current snapshot stays
+            shutil.rmtree(self.path)
+            self.published = previous
+            return previous
+
+        for entry in carried:
+            if entry.is_dir():
+                shutil.copytree(entry, self.path / entry.name, copy_function=_link_or_copy)
+            else:
+                _link_or_copy(entry, self.path / entry.name)
+
+        with open(self.path / SNAPSHOT_INDEX, "w") as f:
+            json.dump({
+                "version": self.version,
+                "previous": None if previous is None else previous.name,
+                "written": sorted(self.written),
+                "artifacts": sorted(
+                    p.name for p in self.path.iterdir() if (p / MANIFEST_FILE).exists()
+                ),
+                "created": datetime.now(timezone.utc).isoformat(),
+            }, f, indent=2)
+
+        target = self.root / SNAPSHOT_DIR / self.version
+        self.path.rename(target)
+        self.path = target
+
+        pointer = self.root / f".{CURRENT_FILE}.{self.version}.tmp"
+        with open(pointer, "w") as f:
+            f.write(self.version)
+            f.flush()
+            os.fsync(f.fileno())
+        pointer.replace(self.root / CURRENT_FILE)
+
+        for tmp, path in self._exports:
+            tmp.replace(path)
+
+        prune_snapshots(self.root, self.keep)
+        self.published = target
+        return target
+
+    def abort(self):
+        for _, future in self._pending:
+            future.cancel()
+        self._pool.shutdown(wait=True)
+        for tmp, _ in self._exports:
+            tmp.unlink(missing_ok=True)
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+def prune_snapshots(root: Path = None, keep: int = KEEP_SNAPSHOTS) -> list:
+    """
+    Retention: delete all but the newest `keep` snapshots (never the
+    current one) and staging directories left by crashed runs. Older
+    snapshots stay readable until then, so a reader that resolved one
+    just before a publish can finish.
+    """
+    root = Path(root or ARTIFACT_ROOT)
+    base = root / SNAPSHOT_DIR
+    if not base.exists():
+        return []
+
+    current = current_snapshot(root)
+    versions = sorted(
+        (p for p in base.iterdir() if p.is_dir() and not p.name.startswith(".")),
+        key=lambda p: p.name,
+        reverse=True
+    )
+
+    removed = []
+    for path in versions[max(keep, 1):]:
+        if path != current:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path.name)
+
+    for path in base.glob(".*.tmp"):
+        if time.time() - path.stat().st_mtime > STALE_STAGING_S:
+            shutil.rmtree(path, ignore_errors=True)
+    return removed
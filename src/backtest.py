@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+from src.forecasting import MIN_HISTORY
+
+# Steps ahead scored at every origin
+HORIZONS = (1, 7, 14, 30)
+
+
+# ==================================================
+# VECTORIZED FORECAST METHODS
+# ==================================================
+def trend_predictions(y, pos, horizons) -> np.ndarray:
+    """
+    Expanding-window OLS trend (the `forecast_state_risk` model) fitted
+    at every origin at once from running sums of y and x * y.
+    Row j is an origin using its series' rows up to and including j;
+    `pos` is j's position in its series.
+    """
+    first = pos == 0
+    group = np.cumsum(first) - 1
+    sum_y = np.cumsum(y)
+    sum_xy = np.cumsum(pos * y)
+
+    # Running sums restart at each series
+    base = np.flatnonzero(first)
+    sum_y = sum_y - (sum_y[base] - y[base])[group]
+    sum_xy = sum_xy - (sum_xy[base] - pos[base] * y[base])[group]
+
+    n = pos + 1
+    x_mean = (n - 1) / 2
+    sxx = n * (n ** 2 - 1) / 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(sxx > 0, (sum_xy - x_mean * sum_y) / sxx, 0.0)
+    intercept = sum_y / n - slope * x_mean
+
+    steps = np.asarray(horizons, dtype=np.float64)
+    return intercept[:, None] + slope[:, None] * (pos[:, None] + steps)
+
+
+def naive_predictions(y, pos, horizons) -> np.ndarray:
+    """
+    Last observed value carried forward (reference method)
+    """
+    return np.repeat(y[:, None], len(horizons), axis=1)
+
+
+METHODS = {
+    "trend": trend_predictions,
+    "naive": naive_predictions,
+}
+
+
+# ==================================================
+# ROLLING-ORIGIN BACKTEST
+# ==================================================
+def rolling_origin_errors(
+    features_df: pd.DataFrame,
+    key: str = 'state',
+    value: str = 'risk_score',
+    horizons=HORIZONS,
+    methods=("trend", "naive"),
+    min_history: int = MIN_HISTORY
+) -> pd.DataFrame:
+    """
+    Forecast errors of each method at every origin of every series for
+    each horizon. An origin needs `min_history` observed rows and a
+    target `horizon` rows later in the same series.
+    """
+    df = features_df.sort_values([key, 'date'])
+
+    y = df[value].to_numpy(np.float64)
+    pos = df.groupby(key, sort=False).cumcount().to_numpy(np.int64)
+    size = df.groupby(key, sort=False)[value].transform('size').to_numpy(np.int64)
+
+    steps = np.asarray(horizons, dtype=np.int64)
+    target = np.arange(len(df))[:, None] + steps
+    valid = (pos[:, None] + 1 >= min_history) & (pos[:, None] + steps < size[:, None])
+
+    origin, h = np.nonzero(valid)
+    actual = y[target[origin, h]]
+
+    errors = pd.DataFrame({
+        key: df[key].to_numpy()[origin],
+        'origin': df['date'].to_numpy()[origin],
+        'horizon': steps[h],
+        'actual': actual,
+    })
+    for method in methods:
+        predicted = METHODS[method](y, pos.astype(np.float64), steps)[origin, h]
+        errors[f'{method}_error'] = predicted - actual
+
+    return errors
+
+
+def _metrics(errors: pd.DataFrame, by, methods) -> pd.DataFrame:
+    frame = errors[by].copy()
+    for method in methods:
+        e = errors[f'{method}_error']
+        frame[f'{method}_abs'] = e.abs()
+        frame[f'{method}_sq'] = e ** 2
+        frame[f'{method}_bias'] = e
+
+    grouped = frame.groupby(by, sort=True, observed=True)
+    means = grouped.mean()
+
+    metrics = pd.DataFrame({'origins': grouped.size()})
+    for method in methods:
+        metrics[f'{method}_mae'] = means[f'{method}_abs']
+        metrics[f'{method}_rmse'] = np.sqrt(means[f'{method}_sq'])
+        metrics[f'{method}_bias'] = means[f'{method}_bias']
+
+    # Skill over carrying the last value forward (> 0 is better)
+    if 'naive' in methods:
+        for method in methods:
+            if method != 'naive':
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    metrics[f'{method}_skill'] = 1 - metrics[f'{method}_mae'] / metrics['naive_mae']
+
+    return metrics.reset_index()
+
+
+def run_backtest(
+    features_df: pd.DataFrame,
+    key: str = 'state',
+    value: str = 'risk_score',
+    horizons=HORIZONS,
+    methods=("trend", "naive")
+) -> dict:
+    """
+    Rolling-origin backtest. Returns per-origin errors, per-series
+    metrics by horizon, and overall metrics by horizon.
+    """
+    errors = rolling_origin_errors(
+        features_df, key=key, value=value, horizons=horizons, methods=methods
+    )
+    return {
+        "errors": errors,
+        "series": _metrics(errors, [key, 'horizon'], methods),
+        "summary": _metrics(errors, ['horizon'], methods),
+    }
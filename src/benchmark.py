@@ -0,0 +1,199 @@
+import hashlib
+import subprocess
+import time
+
+import numpy as np
+import pandas as pd
+
+# A stage is flagged when it is this much slower than the baseline...
+TOLERANCE = 0.25
+# ...and slower by at least this many seconds (timer noise)
+NOISE_FLOOR_S = 0.05
+QUERY_NOISE_FLOOR_MS = 0.5
+STARTUP_NOISE_FLOOR_MS = 20.0
+
+QUERY_OPS = ["state_totals", "districts", "district_totals", "pincode_table"]
+
+
+# ==================================================
+# OUTPUT CHECKSUMS
+# ==================================================
+def _update(h, value, depth: int = 0):
+    if isinstance(value, pd.DataFrame):
+        h.update(",".join(map(str, value.columns)).encode())
+        floats = value.select_dtypes("float").columns
+        if len(floats):
+            value = value.copy()
+            value[floats] = value[floats].round(9)
+        h.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        _update(h, value.to_frame(), depth)
+    elif isinstance(value, pd.Index):
+        _update(h, value.to_frame(index=False), depth)
+    elif isinstance(value, np.ndarray):
+        h.update(np.round(value, 9).tobytes() if value.dtype.kind == "f" else value.tobytes())
+    elif depth >= 3:
+        return
+    elif isinstance(value, dict):
+        for k in sorted(value, key=str):
+            h.update(str(k).encode())
+            _update(h, value[k], depth + 1)
+    elif isinstance(value, (list, tuple)):
+        for part in value:
+            _update(h, part, depth + 1)
+    elif hasattr(value, "__dict__"):
+        _update(h, vars(value), depth + 1)
+    else:
+        h.update(repr(value).encode())
+
+
+def checksum(value) -> str:
+    """
+    Content hash of a stage value (floats rounded to 9 decimals), to
+    tell a speed-up that changed results from one that did not
+    """
+    h = hashlib.blake2b(digest_size=8)
+    _update(h, value)
+    return h.hexdigest()
+
+
+# ==================================================
+# DASHBOARD QUERIES
+# ==================================================
+def time_queries(index, n: int = 200, seed: int = 0) -> dict:
+    """
+    Latency of the dashboard's rollup lookups (see `RollupIndex`) for
+    `n` random selections over the full range and the last quarter
+    """
+    rng = np.random.default_rng(seed)
+    states = index.states()
+    first, last = index.date_bounds()
+    windows = [(first, last), (max(first, last - pd.DateOffset(months=2)), last)]
+
+    selections = []
+    for _ in range(n):
+        state = states[rng.integers(len(states))]
+        start, end = windows[rng.integers(len(windows))]
+        districts = index.districts(state, first, last)
+        district = districts[rng.integers(len(districts))] if districts else None
+        selections.append((state, district, start, end))
+
+    calls = {
+        "state_totals": lambda s, d, a, b: index.state_totals(s, a, b),
+        "districts": lambda s, d, a, b: index.districts(s, a, b),
+        "district_totals": lambda s, d, a, b: index.district_totals(s, d, a, b),
+        "pincode_table": lambda s, d, a, b: index.pincode_table(s, d, a, b),
+    }
+
+    latency = {}
+    for op in QUERY_OPS:
+        ms = []
+        for selection in selections:
+            t = time.perf_counter()
+            calls[op](*selection)
+            ms.append((time.perf_counter() - t) * 1000)
+        ms = np.asarray(ms)
+        latency[op] = {
+            "p50_ms": round(float(np.percentile(ms, 50)), 4),
+            "p99_ms": round(float(np.percentile(ms, 99)), 4),
+            "mean_ms": round(float(ms.mean()), 4),
+        }
+    return latency
+
+
+# ==================================================
+# COLD START
+# ==================================================
+def time_startup(commands: dict, repeat: int = 5, cwd=None) -> dict:
+    """
+    Wall time of each command in a fresh interpreter: one untimed run
+    (bytecode, page cache), then the best and median of `repeat`
+    """
+    timings = {}
+    for name, command in commands.items():
+        subprocess.run(command, cwd=cwd, check=True, capture_output=True)
+        ms = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            subprocess.run(command, cwd=cwd, check=True, capture_output=True)
+            ms.append((time.perf_counter() - t) * 1000)
+        timings[name] = {
+            "best_ms": round(min(ms), 1),
+            "median_ms": round(float(np.median(ms)), 1),
+        }
+    return timings
+
+
+# ==================================================
+# RESULTS
+# ==================================================
+def best_of(runs: list) -> dict:
+    """
+    Per-stage timings over repeated runs: fastest wall and CPU time,
+    largest peak memory
+    """
+    stages = {}
+    for run in runs:
+        for name, record in run.items():
+            best = stages.setdefault(name, dict(record))
+            for metric in ["wall_s", "cpu_s"]:
+                best[metric] = min(best[metric], record[metric])
+            if record.get("max_rss_mb") is not None:
+                best["max_rss_mb"] = max(best["max_rss_mb"], record["max_rss_mb"])
+    return stages
+
+
+def compare(current: dict, baseline: dict, tolerance: float = TOLERANCE,
+            floor_s: float = NOISE_FLOOR_S) -> list:
+    """
+    Flags for every stage and query at a scale present in both runs,
+    and for the cold-start timings: "slower" beyond `tolerance` (and
+    `floor_s`), or "output" when the stage's result checksum changed
+    """
+    flags = []
+    for name, timing in current.get("startup", {}).items():
+        old = baseline.get("startup", {}).get(name)
+        if (
+            old
+            and timing["best_ms"] > old["best_ms"] * (1 + tolerance)
+            and timing["best_ms"] - old["best_ms"] > STARTUP_NOISE_FLOOR_MS
+        ):
+            flags.append({
+                "scale": "startup", "item": name, "flag": "slower",
+                "baseline": old["best_ms"], "current": timing["best_ms"],
+            })
+
+    for scale, run in current["scales"].items():
+        base = baseline.get("scales", {}).get(scale)
+        if base is None:
+            continue
+
+        for name, record in run["stages"].items():
+            old = base["stages"].get(name)
+            if old is None:
+                continue
+            delta = record["wall_s"] - old["wall_s"]
+            if delta > floor_s and record["wall_s"] > old["wall_s"] * (1 + tolerance):
+                flags.append({
+                    "scale": scale, "item": name, "flag": "slower",
+                    "baseline": old["wall_s"], "current": record["wall_s"],
+                })
+            if old.get("checksum") and record.get("checksum") != old["checksum"]:
+                flags.append({
+                    "scale": scale, "item": name, "flag": "output",
+                    "baseline": old["checksum"], "current": record.get("checksum"),
+                })
+
+        for op, latency in run.get("queries", {}).items():
+            old = base.get("queries", {}).get(op)
+            if (
+                old
+                and latency["p50_ms"] > old["p50_ms"] * (1 + tolerance)
+                and latency["p50_ms"] - old["p50_ms"] > QUERY_NOISE_FLOOR_MS
+            ):
+                flags.append({
+                    "scale": scale, "item": f"query:{op}", "flag": "slower",
+                    "baseline": old["p50_ms"], "current": latency["p50_ms"],
+                })
+
+    return flags
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from src.instrumentation import MB, measure
+
+# Signed so differences of counts stay safe
+INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+# A float column becomes float32 only if no value moves by more than this
+FLOAT32_RTOL = 1e-6
+
+# Text columns with at most this share of distinct values become categorical
+CATEGORY_RATIO = 0.5
+
+
+def frame_mb(value) -> float:
+    return round(measure(value)["bytes"] / MB, 1)
+
+
+# ==================================================
+# COLUMN DOWNCASTS
+# ==================================================
+def downcast_ints(df: pd.DataFrame, columns=None) -> pd.DataFrame:
+    """
+    Smallest signed integer type holding each column's values
+    """
+    columns = columns if columns is not None else df.select_dtypes("integer").columns
+    out = {}
+    for col in columns:
+        values = df[col].to_numpy()
+        if not len(values):
+            continue
+        lo, hi = values.min(), values.max()
+        for dtype in INT_TYPES:
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                if dtype != values.dtype:
+                    out[col] = values.astype(dtype)
+                break
+    return df.assign(**out) if out else df
+
+
+def downcast_floats(df: pd.DataFrame, columns=None, rtol: float = FLOAT32_RTOL) -> pd.DataFrame:
+    """
+    float32 for float64 columns whose values survive the round trip
+    within `rtol` (NaN and inf included)
+    """
+    columns = columns if columns is not None else df.select_dtypes("float64").columns
+    out = {}
+    for col in columns:
+        values = df[col].to_numpy()
+        with np.errstate(over="ignore"):
+            narrow = values.astype(np.float32)
+        if np.allclose(narrow, values, rtol=rtol, atol=0, equal_nan=True) and \
+                np.array_equal(np.isinf(narrow), np.isinf(values)):
+            out[col] = narrow
+    return df.assign(**out) if out else df
+
+
+def categorize(df: pd.DataFrame, columns=None, max_ratio: float = CATEGORY_RATIO) -> pd.DataFrame:
+    """
+    Categorical dtype for repetitive text columns
+    """
+    columns = columns if columns is not None else df.select_dtypes(["object", "string"]).columns
+    out = {
+        col: df[col].astype("category")
+        for col in columns
+        if len(df) and df[col].nunique() <= max_ratio * len(df)
+    }
+    return df.assign(**out) if out else df
+
+
+def day_numbers(df: pd.DataFrame, column: str = "date") -> pd.DataFrame:
+    """
+    Integer day numbers (days since 1970-01-01, int32) instead of
+    datetimes. Rows without a date are dropped; they never reach an
+    output. The feature and granular builders accept either form.
+    """
+    dates = df[column].to_numpy("datetime64[D]")
+    valid = ~np.isnat(dates)
+    if not valid.all():
+        df = df[valid]
+        dates = dates[valid]
+    return df.assign(**{column: dates.astype(np.int32)})
+
+
+def compact_frame(df: pd.DataFrame, days: bool = False) -> pd.DataFrame:
+    """
+    All of the above: downcast integers and floats, categorize text
+    and, with `days`, store dates as day numbers
+    """
+    if days and "date" in df.columns:
+        df = day_numbers(df)
+    ints = [c for c in df.select_dtypes("integer").columns if c != "date"]
+    return categorize(downcast_floats(downcast_ints(df, ints)))
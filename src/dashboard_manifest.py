@@ -0,0 +1,41 @@
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Written next to the results; the dashboard reads it before any data
+MANIFEST_FILE = "dashboard_manifest.json"
+
+
+def build_manifest(state_rollup) -> dict:
+    """
+    What the dashboard's control panel needs, from the decoded state
+    rollup: state list and first / last month
+    """
+    months = state_rollup["month"]
+    return {
+        "states": sorted(str(s) for s in state_rollup["state"].unique()),
+        "first_month": str(months.min().date()),
+        "last_month": str(months.max().date()),
+        "created": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_manifest(manifest: dict, results_dir: Path) -> Path:
+    path = Path(results_dir) / MANIFEST_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    tmp.replace(path)
+    return path
+
+
+def read_manifest(results_dir: Path):
+    """
+    The stored manifest, or None when the pipeline has not written one
+    """
+    path = Path(results_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
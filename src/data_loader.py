@@ -1,11 +1,165 @@
 import pandas as pd
+from pandas.api.types import union_categoricals
 from pathlib import Path
 
+from src.artifact_store import artifact_exists, read_artifact
+
 # Base project path
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 DATA_PROCESSED = BASE_DIR / "data" / "processed"
 
+# ==================================================
+# RAW SOURCE SCHEMA
+# ==================================================
+RAW_FILES = {
+    "enrolment": "enrolment_clean.csv",
+    "demographic": "demographic_clean.csv",
+    "biometric": "biometric_clean.csv",
+}
+
+KEY_COLUMNS = ["state", "district", "pincode", "date"]
+
+COUNT_COLUMNS = {
+    "enrolment": ["age_0_5", "age_5_17", "age_18_greater"],
+    "demographic": ["demo_age_5_17", "demo_age_17_"],
+    "biometric": ["bio_age_5_17", "bio_age_17_"],
+}
+
+# Raw feeds carry ISO dates; a fixed format avoids per-row inference
+DATE_FORMAT = "%Y-%m-%d"
+
+CHUNK_SIZE = 500_000
+
+
+def raw_paths() -> list:
+    """
+    Paths of the three raw activity files
+    """
+    return [DATA_PROCESSED / name for name in RAW_FILES.values()]
+
+
+def raw_schema(source: str) -> dict:
+    """
+    Declared read dtypes for a raw activity source
+    """
+    schema = {
+        "state": "category",
+        "district": "category",
+        "pincode": "int32",
+    }
+    for col in COUNT_COLUMNS[source]:
+        schema[col] = "int32"
+    return schema
+
+
+def parse_dates(values: pd.Series, date_format: str = DATE_FORMAT) -> pd.Series:
+    """
+    Parse a date column with a fixed format, falling back to inference
+    """
+    try:
+        return pd.to_datetime(values, format=date_format)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values, errors="coerce")
+
+
+def iter_raw_chunks(
+    source: str,
+    chunksize: int = CHUNK_SIZE,
+    date_format: str = DATE_FORMAT,
+    path: Path = None
+):
+    """
+    Stream a raw activity file in typed chunks
+    """
+    path = path or DATA_PROCESSED / RAW_FILES[source]
+    schema = raw_schema(source)
+
+    reader = pd.read_csv(
+        path,
+        usecols=list(schema) + ["date"],
+        dtype=schema,
+        chunksize=chunksize
+    )
+
+    for chunk in reader:
+        chunk["date"] = parse_dates(chunk["date"], date_format)
+        yield chunk
+
+
+def load_raw_typed(
+    source: str,
+    chunksize: int = CHUNK_SIZE,
+    date_format: str = DATE_FORMAT,
+    path: Path = None
+) -> pd.DataFrame:
+    """
+    Load a full raw activity file using the declared schema
+    """
+    chunks = list(iter_raw_chunks(source, chunksize, date_format, path))
+
+    if not chunks:
+        return pd.DataFrame(columns=list(raw_schema(source)) + ["date"])
+
+    # Align chunk-local categories so concatenation stays categorical
+    for col in ["state", "district"]:
+        categories = union_categoricals(
+            [c[col] for c in chunks], sort_categories=True
+        ).categories
+        for c in chunks:
+            c[col] = c[col].cat.set_categories(categories)
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def check_raw_slice(source: str, slice_path: Path, path: Path = None):
+    """
+    Raise ValueError unless a slice file has the raw file's header
+    """
+    path = path or DATA_PROCESSED / RAW_FILES[source]
+
+    with open(slice_path) as src, open(path) as dst:
+        if src.readline() != dst.readline():
+            raise ValueError(f"{slice_path} header does not match {path}")
+
+
+def raw_sizes() -> dict:
+    """
+    Byte size of every raw activity file
+    """
+    return {source: (DATA_PROCESSED / name).stat().st_size for source, name in RAW_FILES.items()}
+
+
+def truncate_raw(source: str, size: int, path: Path = None):
+    """
+    Cut a raw activity file back to `size` bytes, dropping rows an
+    interrupted append left behind
+    """
+    path = path or DATA_PROCESSED / RAW_FILES[source]
+    with open(path, "rb+") as f:
+        f.truncate(size)
+
+
+def append_raw_slice(source: str, slice_path: Path, path: Path = None) -> int:
+    """
+    Append the rows of a slice file to a raw activity file.
+    Both files must share the same header. Returns the new size.
+    """
+    path = path or DATA_PROCESSED / RAW_FILES[source]
+    check_raw_slice(source, slice_path, path)
+
+    with open(slice_path) as src, open(path, "rb+") as dst:
+        src.readline()
+        dst.seek(0, 2)
+        # Keep one row per line if the raw file lacks a trailing newline
+        if dst.tell() > 0:
+            dst.seek(-1, 2)
+            if dst.read(1) != b"\n":
+                dst.write(b"\n")
+        for block in iter(lambda: src.read(1 << 20), ""):
+            dst.write(block.encode())
+        return dst.tell()
+
 
 def load_enrolment_data():
     """
@@ -34,10 +188,17 @@ def load_biometric_data():
     return df
 
 
-def load_feature_dataset():
+def load_feature_dataset(columns=None, states=None):
     """
-    Load final engineered feature dataset
+    Load final engineered feature dataset, optionally only
+    selected columns and states
     """
+    if artifact_exists("feature_dataset"):
+        return read_artifact("feature_dataset", columns=columns, partitions=states)
+
     path = DATA_PROCESSED / "feature_dataset.csv"
-    df = pd.read_csv(path, parse_dates=["date"])
+    parse = ["date"] if columns is None or "date" in columns else None
+    df = pd.read_csv(path, usecols=columns, parse_dates=parse)
+    if states is not None:
+        df = df[df["state"].isin(states)].reset_index(drop=True)
     return df
@@ -0,0 +1,11 @@
+# Defaults shared by the stages and the command line. This module has
+# no imports, so the CLI can read them without loading pandas.
+
+# Residual bootstrap resamples behind the forecast intervals
+BOOTSTRAP_SAMPLES = 2000
+
+# Forecast horizons (days) of the horizon table
+HORIZONS = (7, 14, 30)
+
+# Published artifact snapshots kept by the retention policy
+KEEP_SNAPSHOTS = 3
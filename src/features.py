@@ -1,9 +1,13 @@
+import numpy as np
 import pandas as pd
 
+from src.granular import pack_keys, unpack_keys
 
-def build_enrolment_features(enrol_df: pd.DataFrame) -> pd.DataFrame:
+
+def build_enrolment_features(enrol_df: pd.DataFrame, key: str = 'state') -> pd.DataFrame:
     """
-    Create enrolment-based features and aggregate to state-date level
+    Create enrolment-based features and aggregate to state-date level.
+    `key` is the state grouping column (name or encoded `state_id`).
     """
 
     # Total enrolment
@@ -14,10 +18,10 @@ def build_enrolment_features(enrol_df: pd.DataFrame) -> pd.DataFrame:
     )
 
     # Monthly growth (state-wise)
-    enrol_df = enrol_df.sort_values(['state', 'date'])
+    enrol_df = enrol_df.sort_values([key, 'date'])
     enrol_df['monthly_growth'] = (
         enrol_df
-        .groupby('state')['total_enrolment']
+        .groupby(key, observed=True)['total_enrolment']
         .pct_change()
     )
 
@@ -29,7 +33,7 @@ def build_enrolment_features(enrol_df: pd.DataFrame) -> pd.DataFrame:
     # Aggregate to state + date
     enrol_state = (
         enrol_df
-        .groupby(['state', 'date'], as_index=False)
+        .groupby([key, 'date'], as_index=False, observed=True)
         .agg({
             'total_enrolment': 'sum',
             'monthly_growth': 'mean',
@@ -42,7 +46,7 @@ def build_enrolment_features(enrol_df: pd.DataFrame) -> pd.DataFrame:
     return enrol_state
 
 
-def build_demographic_features(demo_df: pd.DataFrame) -> pd.DataFrame:
+def build_demographic_features(demo_df: pd.DataFrame, key: str = 'state') -> pd.DataFrame:
     """
     Aggregate demographic update pressure to state-date level
     """
@@ -54,7 +58,7 @@ def build_demographic_features(demo_df: pd.DataFrame) -> pd.DataFrame:
 
     demo_state = (
         demo_df
-        .groupby(['state', 'date'], as_index=False)
+        .groupby([key, 'date'], as_index=False, observed=True)
         .agg({
             'demo_update_pressure': 'sum'
         })
@@ -63,7 +67,7 @@ def build_demographic_features(demo_df: pd.DataFrame) -> pd.DataFrame:
     return demo_state
 
 
-def build_biometric_features(bio_df: pd.DataFrame) -> pd.DataFrame:
+def build_biometric_features(bio_df: pd.DataFrame, key: str = 'state') -> pd.DataFrame:
     """
     Aggregate biometric update pressure to state-date level
     """
@@ -75,10 +79,221 @@ def build_biometric_features(bio_df: pd.DataFrame) -> pd.DataFrame:
 
     bio_state = (
         bio_df
-        .groupby(['state', 'date'], as_index=False)
+        .groupby([key, 'date'], as_index=False, observed=True)
         .agg({
             'biometric_update_pressure': 'sum'
         })
     )
 
     return bio_state
+
+
+# ==================================================
+# FUSED FEATURE ENGINE
+# ==================================================
+AGE_COLUMNS = ['age_0_5', 'age_5_17', 'age_18_greater']
+PRESSURE_COLUMNS = {
+    'demo_update_pressure': ['demo_age_5_17', 'demo_age_17_'],
+    'biometric_update_pressure': ['bio_age_5_17', 'bio_age_17_'],
+}
+FEATURE_COLUMNS = [
+    'total_enrolment', 'monthly_growth', 'child_ratio', 'youth_ratio',
+    'adult_ratio', 'demo_update_pressure', 'biometric_update_pressure'
+]
+
+
+def _row_sum(df: pd.DataFrame, columns) -> np.ndarray:
+    total = np.zeros(len(df), dtype=np.int64)
+    for col in columns:
+        total += df[col].to_numpy(np.int64)
+    return total
+
+
+def _key_days(df: pd.DataFrame, key: str, labels=None):
+    """
+    Integer key and day arrays plus the mask of groupable rows.
+    Non-integer keys are coded by their position in `labels`.
+    """
+    if labels is None:
+        keys = df[key].to_numpy(np.int64)
+    else:
+        keys = labels.get_indexer(df[key]).astype(np.int64)
+    dates = df['date'].to_numpy('datetime64[D]')
+    return keys, dates, ~np.isnat(dates)
+
+
+def build_feature_dataset(
+    enrol_df: pd.DataFrame,
+    demo_df: pd.DataFrame,
+    bio_df: pd.DataFrame,
+    key: str = 'state'
+) -> pd.DataFrame:
+    """
+    Build all activity features at key-date level in one grouped pass
+    over the three sources, reading their columns without copying or
+    mutating the frames. `key` is any geography column (an encoded id
+    such as `state_id` is cheapest). Dates may be datetimes or integer
+    day numbers (see `src.compact`); the output always has datetimes.
+
+    Same values as running the three per-source builders, merging and
+    summing: growth is the row-level change within each key (rows in
+    stable date order), ratios and growth are averaged per key-date,
+    and key-dates without demographic or biometric rows get 0.
+    """
+    labels = None
+    if not pd.api.types.is_integer_dtype(enrol_df[key].dtype):
+        labels = pd.Index(
+            pd.concat([df[key].drop_duplicates() for df in (enrol_df, demo_df, bio_df)])
+            .dropna().astype(str).unique()
+        ).sort_values()
+
+    e_key, e_day, e_valid = _key_days(enrol_df, key, labels)
+    e_valid &= e_key >= 0
+    total = _row_sum(enrol_df, AGE_COLUMNS)
+
+    # Previous row of the same key in stable (key, date) order
+    rows = np.flatnonzero(e_valid)
+    e_packed = pack_keys(e_key[rows], e_day[rows])
+    order = np.argsort(e_packed, kind='stable')
+    e_packed, order = e_packed[order], rows[order]
+    sorted_total = total[order].astype(np.float64)
+    same_key = np.r_[False, e_key[order][1:] == e_key[order][:-1]]
+    prev = np.where(same_key, np.r_[np.nan, sorted_total[:-1]], np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = sorted_total / prev - 1
+        ratios = [
+            enrol_df[col].to_numpy(np.float64)[order] / sorted_total
+            for col in AGE_COLUMNS
+        ]
+
+    packed = [e_packed]
+    n_enrol = len(order)
+    pressures = {}
+    for name, df in [('demo_update_pressure', demo_df), ('biometric_update_pressure', bio_df)]:
+        k, d, valid = _key_days(df, key, labels)
+        valid &= k >= 0
+        packed.append(pack_keys(k[valid], d[valid]))
+        pressures[name] = _row_sum(df, PRESSURE_COLUMNS[name])[valid]
+
+    # One hash grouping over every row of the three sources on packed
+    # (key, day) codes; groups are then numbered in key-date order
+    codes, groups = pd.factorize(np.concatenate(packed))
+    by_key_date = np.argsort(groups)
+    rank = np.empty_like(by_key_date)
+    rank[by_key_date] = np.arange(len(groups))
+    inverse = rank[codes]
+    groups = groups[by_key_date]
+    n_groups = len(groups)
+    group_keys, group_days = unpack_keys(groups)
+
+    def grouped(values, rows=slice(0, n_enrol)):
+        return np.bincount(inverse[rows], weights=values, minlength=n_groups)
+
+    has_enrol = grouped(np.ones(n_enrol)) > 0
+    growth_n = grouped(~np.isnan(growth))
+    ratio_n = grouped(~np.isnan(ratios[0]))
+
+    def grouped_mean(values, count):
+        return grouped(np.where(np.isnan(values), 0.0, values)) / count
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns = {
+            'total_enrolment': grouped(sorted_total),
+            'monthly_growth': grouped_mean(growth, growth_n),
+            'child_ratio': grouped_mean(ratios[0], ratio_n),
+            'youth_ratio': grouped_mean(ratios[1], ratio_n),
+            'adult_ratio': grouped_mean(ratios[2], ratio_n),
+        }
+
+    offset = n_enrol
+    for name, values in pressures.items():
+        rows = slice(offset, offset + len(values))
+        columns[name] = grouped(values.astype(np.float64), rows)
+        offset += len(values)
+
+    group_keys = group_keys[has_enrol]
+    date_dtype = enrol_df['date'].dtype
+    if not pd.api.types.is_datetime64_any_dtype(date_dtype):
+        date_dtype = 'datetime64[s]'
+    features = pd.DataFrame({
+        key: (
+            group_keys.astype(enrol_df[key].dtype) if labels is None
+            else labels.take(group_keys).to_numpy()
+        ),
+        'date': group_days[has_enrol].astype(date_dtype),
+    })
+    for name in FEATURE_COLUMNS:
+        features[name] = columns[name][has_enrol]
+
+    # Mean of no values: like the summed merge, missing becomes 0
+    value_cols = FEATURE_COLUMNS[1:]
+    features[value_cols] = features[value_cols].fillna(0)
+    features['total_enrolment'] = features['total_enrolment'].astype(np.int64)
+
+    return features
+
+
+# ==================================================
+# ROLLING WINDOW FEATURES
+# ==================================================
+ROLLING_WINDOWS = (7, 14, 30)
+ROLLING_COLUMNS = ('total_enrolment', 'risk_score')
+
+
+def rolling_window_features(
+    features_df: pd.DataFrame,
+    key: str = 'state',
+    columns=ROLLING_COLUMNS,
+    windows=ROLLING_WINDOWS
+) -> pd.DataFrame:
+    """
+    Trailing rolling mean, volatility (sample std) and surge ratio
+    (value / rolling mean) over the last `w` rows of each series.
+    Every window is a difference of two running sums that restart at
+    each series, so the cost is O(rows) per window regardless of its
+    length. Rows with less than `w` history, and windows holding a NaN
+    or inf value, get NaN, like `rolling(w)` on the finite values.
+    """
+    df = features_df.sort_values([key, 'date']).reset_index(drop=True)
+    series = df.groupby(key, sort=False, observed=True)
+    pos = series.cumcount().to_numpy()
+    group = series.ngroup().to_numpy()
+    row = np.arange(len(df))
+
+    # Series start per row, used to center values before squaring
+    start = np.flatnonzero(pos == 0)[np.cumsum(pos == 0) - 1]
+
+    def running(x):
+        # Cumulative sum within each series
+        return pd.Series(x).groupby(group, sort=False).cumsum().to_numpy()
+
+    out = df[[key, 'date']].copy()
+    for col in columns:
+        values = df[col].to_numpy(np.float64)
+        finite = np.isfinite(values)
+        base = np.where(finite[start], values[start], 0.0)
+        centered = np.where(finite, values - base, 0.0)
+
+        sums = running(centered)
+        squares = running(centered ** 2)
+        bad = running((~finite).astype(np.int64))
+
+        for w in windows:
+            full = pos >= w - 1
+            earlier = pos >= w
+            back = np.maximum(row - w, 0)
+
+            window_sum = sums - np.where(earlier, sums[back], 0.0)
+            window_sq = squares - np.where(earlier, squares[back], 0.0)
+            clean = full & (bad - np.where(earlier, bad[back], 0) == 0)
+
+            mean = window_sum / w
+            with np.errstate(divide='ignore', invalid='ignore'):
+                var = np.maximum(window_sq - window_sum * mean, 0) / (w - 1)
+                rolling_mean = np.where(clean, mean + base, np.nan)
+                out[f'{col}_mean_{w}'] = rolling_mean
+                out[f'{col}_vol_{w}'] = np.where(clean, np.sqrt(var), np.nan)
+                out[f'{col}_surge_{w}'] = values / rolling_mean
+
+    return out
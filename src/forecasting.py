@@ -1,53 +1,265 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
 
+from src.defaults import BOOTSTRAP_SAMPLES, HORIZONS
+from src.features import rolling_window_features
+
+# Minimum history required to fit a trend
+MIN_HISTORY = 6
+
+# Residual bootstrap quantiles (sample count: src.defaults)
+QUANTILES = (0.10, 0.50, 0.90)
+
+# Resampled residuals held in memory per block (replicates x rows)
+BOOTSTRAP_BLOCK = 1 << 22
 
-def forecast_state_risk(features_df: pd.DataFrame) -> pd.DataFrame:
+
+def fit_linear_trends(
+    df: pd.DataFrame,
+    key: str = 'state',
+    value: str = 'risk_score'
+) -> pd.DataFrame:
     """
-    Forecast next-period Aadhaar risk score for each state
-    using explainable linear regression
+    Ordinary least squares fit of `value` on a per-series time index
+    (0, 1, ..., n-1) for every series at once, using grouped sums.
+    Expects `df` sorted by key and date.
+    """
+    x = df.groupby(key, sort=False).cumcount().to_numpy(np.float64)
+    y = df[value].to_numpy(np.float64)
+
+    sums = (
+        pd.DataFrame({key: df[key].to_numpy(), 'y': y, 'xy': x * y})
+        .groupby(key, sort=True, observed=True)
+        .agg(n=('y', 'size'), sum_y=('y', 'sum'), sum_xy=('xy', 'sum'))
+    )
+
+    n = sums['n'].to_numpy(np.float64)
+    x_mean = (n - 1) / 2
+    # Centered moments of 0..n-1 have closed forms
+    sxx = n * (n ** 2 - 1) / 12
+    sxy = sums['sum_xy'].to_numpy() - x_mean * sums['sum_y'].to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(sxx > 0, sxy / sxx, 0.0)
+    intercept = sums['sum_y'].to_numpy() / n - slope * x_mean
+
+    return pd.DataFrame({
+        'n': sums['n'].to_numpy(),
+        'slope': slope,
+        'intercept': intercept
+    }, index=sums.index)
+
+
+# ==================================================
+# RESIDUAL BOOTSTRAP
+# ==================================================
+def _bootstrap_block(resid, xc, n, lead, point, n_boot, quantiles, seed):
+    """
+    Quantiles of bootstrapped next-step predictions for one block of
+    series laid out back to back in `resid` / `xc`.
+
+    Refitting OLS on fitted + resampled residuals only shifts the fit
+    by closed-form sums of the draws, so every replicate of every
+    series is a pair of segment sums instead of a model fit.
     """
+    rng = np.random.default_rng(seed)
+
+    starts = np.r_[0, np.cumsum(n)[:-1]]
+    row_start = np.repeat(starts, n)
+    row_n = np.repeat(n, n)
+
+    pick = row_start + (rng.random((n_boot, len(resid))) * row_n).astype(np.int64)
+    draws = resid[pick]
+
+    sxx = n * (n ** 2 - 1) / 12
+    mean_shift = np.add.reduceat(draws, starts, axis=1) / n
+    slope_shift = np.add.reduceat(draws * xc, starts, axis=1) / sxx
+
+    # Next-step noise is one more resampled residual
+    noise = resid[starts + (rng.random((n_boot, len(n))) * n).astype(np.int64)]
+
+    samples = point + mean_shift + slope_shift * lead + noise
+    return np.quantile(samples, quantiles, axis=0)
+
+
+def bootstrap_intervals(
+    features_df: pd.DataFrame,
+    key: str = 'state',
+    value: str = 'risk_score',
+    n_boot: int = BOOTSTRAP_SAMPLES,
+    quantiles=QUANTILES,
+    seed: int = 0,
+    workers: int = 0
+) -> pd.DataFrame:
+    """
+    Prediction intervals for the next-period trend forecast from a
+    residual bootstrap, batched across all series.
+    Returns `key` plus one `risk_p<q>` column per quantile. Results
+    depend only on the data and seed, not on `workers`. With no
+    resamples (`n_boot` 0) the interval columns are NaN.
+    """
+    if n_boot < 0:
+        raise ValueError(f"n_boot must be 0 or more, got {n_boot}")
+
+    df = features_df.sort_values([key, 'date'])
 
-    df = features_df.copy()
-    df = df.sort_values(['state', 'date'])
+    trends = fit_linear_trends(df, key=key, value=value)
+    trends = trends[trends['n'] >= MIN_HISTORY]
+    df = df[df[key].isin(trends.index)]
 
-    # Create time index per state
-    df['time_index'] = (
-        df
-        .groupby('state')
-        .cumcount()
+    intervals = pd.DataFrame({key: trends.index.to_numpy()})
+    if n_boot == 0:
+        for q in quantiles:
+            intervals[f'risk_p{round(q * 100)}'] = np.nan
+        return intervals
+
+    n = trends['n'].to_numpy(np.int64)
+    slope = trends['slope'].to_numpy()
+    intercept = trends['intercept'].to_numpy()
+
+    x = df.groupby(key, sort=False).cumcount().to_numpy(np.float64)
+    row_slope = np.repeat(slope, n)
+    resid = df[value].to_numpy(np.float64) - (np.repeat(intercept, n) + row_slope * x)
+    xc = x - np.repeat((n - 1) / 2, n)
+
+    lead = (n + 1) / 2
+    point = intercept + slope * n
+
+    # Blocks of whole series, about BOOTSTRAP_BLOCK draws each
+    first_row = np.cumsum(n) - n
+    block = first_row // max(BOOTSTRAP_BLOCK // n_boot, 1)
+    cuts = np.r_[np.flatnonzero(np.diff(block, prepend=-1)), len(n)]
+
+    seeds = np.random.SeedSequence(seed).spawn(len(cuts) - 1)
+    tasks = []
+    for lo, hi, block_seed in zip(cuts[:-1], cuts[1:], seeds):
+        r0, r1 = first_row[lo], first_row[hi - 1] + n[hi - 1]
+        tasks.append((
+            resid[r0:r1], xc[r0:r1], n[lo:hi], lead[lo:hi], point[lo:hi],
+            n_boot, list(quantiles), block_seed
+        ))
+
+    if workers and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            blocks = list(pool.map(_bootstrap_block, *zip(*tasks)))
+    else:
+        blocks = [_bootstrap_block(*task) for task in tasks]
+
+    values = (
+        np.concatenate(blocks, axis=1) if blocks
+        else np.empty((len(quantiles), 0))
     )
 
-    predictions = []
+    for q, column in zip(quantiles, values):
+        intervals[f'risk_p{round(q * 100)}'] = column
 
-    for state, state_df in df.groupby('state'):
-        # Require minimum history
-        if len(state_df) < 6:
-            continue
+    return intervals
 
-        X = state_df[['time_index']]
-        y = state_df['risk_score']
 
-        model = LinearRegression()
-        model.fit(X, y)
+def forecast_state_risk(
+    features_df: pd.DataFrame,
+    key: str = 'state',
+    n_boot: int = 0,
+    seed: int = 0,
+    workers: int = 0
+) -> pd.DataFrame:
+    """
+    Forecast next-period Aadhaar risk score for each state
+    using explainable linear regression.
+    `key` is the state grouping column (name or encoded `state_id`).
+    With `n_boot` > 0, bootstrap p10/p50/p90 columns are added.
+    """
 
-        # Predict next time step
-        next_time = state_df['time_index'].max() + 1
-        predicted_risk = model.predict(
-    pd.DataFrame({'time_index': [next_time]})
-)[0]
+    df = features_df.sort_values([key, 'date'])
 
+    trends = fit_linear_trends(df, key=key)
 
-        predictions.append({
-            'state': state,
-            'predicted_risk_score': predicted_risk
-        })
+    # Require minimum history
+    trends = trends[trends['n'] >= MIN_HISTORY]
 
-    forecast_df = pd.DataFrame(predictions)
+    # Predict next time step
+    forecast_df = pd.DataFrame({
+        key: trends.index.to_numpy(),
+        'predicted_risk_score': (
+            trends['intercept'] + trends['slope'] * trends['n']
+        ).to_numpy()
+    })
 
     forecast_df = forecast_df.sort_values(
         'predicted_risk_score',
         ascending=False
     )
 
+    if n_boot:
+        intervals = bootstrap_intervals(
+            features_df, key=key, n_boot=n_boot, seed=seed, workers=workers
+        )
+        forecast_df = forecast_df.merge(intervals, on=key, how='left')
+
     return forecast_df
+
+
+# ==================================================
+# MULTI-HORIZON FORECASTS
+# ==================================================
+
+
+def forecast_horizons(
+    features_df: pd.DataFrame,
+    key: str = 'state',
+    horizons=HORIZONS,
+    rolling: pd.DataFrame = None
+) -> pd.DataFrame:
+    """
+    Trend forecasts `h` days ahead for every series and horizon, with
+    the rolling mean, volatility and surge ratio of risk over the last
+    `h` observations as context, read from the last row of each series
+    in `rolling` (`rolling_window_features` output with every horizon
+    as a window; computed here when not given). The trend is fitted on
+    the observation index, so `h` days are converted to steps with the
+    series' mean date spacing (feature dates have gaps).
+    Returns one row per (key, horizon).
+    """
+    df = features_df.sort_values([key, 'date'])
+
+    trends = fit_linear_trends(df, key=key)
+    trends = trends[trends['n'] >= MIN_HISTORY]
+    df = df[df[key].isin(trends.index)]
+
+    series = df.groupby(key, sort=True, observed=True)
+    first = series['date'].min().reindex(trends.index)
+    last = series.tail(1).set_index(key).reindex(trends.index)
+
+    days = np.asarray(horizons, dtype=np.int64)
+    n = trends['n'].to_numpy(np.float64)[:, None]
+    span = ((last['date'] - first).dt.total_seconds() / 86400).to_numpy()[:, None]
+    steps = days * (n - 1) / np.where(span > 0, span, n - 1)
+
+    # The one-step forecast is x = n, so s steps ahead is x = n - 1 + s
+    predicted = (
+        trends['intercept'].to_numpy()[:, None]
+        + trends['slope'].to_numpy()[:, None] * (n - 1 + steps)
+    )
+
+    table = pd.DataFrame({
+        key: np.repeat(trends.index.to_numpy(), len(days)),
+        'horizon': np.tile(days, len(trends)),
+        'predicted_risk_score': predicted.ravel(),
+        'last_date': np.repeat(last['date'].to_numpy(), len(days)),
+    })
+    table['forecast_date'] = table['last_date'] + pd.to_timedelta(table['horizon'], unit='D')
+
+    # Rolling windows ending at each series' last row
+    if rolling is None:
+        rolling = rolling_window_features(df, key=key, columns=['risk_score'], windows=days)
+    recent = rolling.groupby(key, sort=False, observed=True).tail(1).set_index(key)
+    recent = recent.reindex(trends.index)
+    for name, stat in [('recent_mean', 'mean'), ('recent_volatility', 'vol'),
+                       ('surge_ratio', 'surge')]:
+        table[name] = np.column_stack([
+            recent[f'risk_score_{stat}_{h}'].to_numpy(np.float64) for h in days
+        ]).ravel()
+
+    return table
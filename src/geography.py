@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+
+GEO_COLUMNS = ["state", "district", "pincode"]
+ID_COLUMNS = ["state_id", "district_id", "pincode_id"]
+
+# Pincodes are six digits, so (district_id, pincode) packs into one int64
+PINCODE_SPAN = 1_000_000
+
+
+def canonical_name(values: pd.Series) -> pd.Series:
+    """
+    Normalize spelling variants of a geography name
+    ("Andaman & Nicobar Islands" -> "Andaman and Nicobar Islands")
+    """
+    return (
+        values
+        .astype(str)
+        .str.replace("&", " and ", regex=False)
+        .str.split()
+        .str.join(" ")
+    )
+
+
+def _codes_to_ids(values: pd.Series, lookup: pd.Index) -> np.ndarray:
+    """
+    Map raw labels onto dictionary positions via their unique values only
+    """
+    cat = values.astype("category")
+    keys = canonical_name(pd.Series(cat.cat.categories)).str.casefold()
+    category_ids = lookup.get_indexer(keys)
+    codes = cat.cat.codes.to_numpy()
+    return np.where(codes >= 0, category_ids[codes], -1)
+
+
+def _take(values, ids: np.ndarray):
+    """
+    values[ids], missing (None, or <NA> for integers) where an id is -1
+    (unknown) instead of wrapping around to the last value
+    """
+    unknown = ids < 0
+    taken = np.asarray(values)[np.where(unknown, 0, ids)]
+    if not unknown.any():
+        return taken
+    if np.issubdtype(taken.dtype, np.integer):
+        taken = pd.array(taken, dtype="Int64")
+        taken[unknown] = pd.NA
+        return taken
+    taken = taken.astype(object)
+    taken[unknown] = None
+    return taken
+
+
+def _parent(parents: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """
+    Parent id of every id; unknown (-1) stays unknown
+    """
+    return np.where(ids < 0, -1, parents[np.maximum(ids, 0)]).astype(parents.dtype)
+
+
+class Geography:
+    """
+    Dictionary-encoded state / district / pincode dimension.
+    Ids are dense, stable for a given table, and ordered by name.
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        table = table.sort_values(ID_COLUMNS).reset_index(drop=True)
+        self.table = table
+
+        states = table.drop_duplicates("state_id")
+        self.state_names = pd.Index(states["state"])
+        self._state_keys = pd.Index(states["state"].str.casefold())
+
+        districts = table.drop_duplicates("district_id")
+        self.district_names = pd.Index(districts["district"])
+        self.district_state = districts["state_id"].to_numpy()
+        self._district_label_keys = pd.Index(
+            districts["district"].str.casefold().unique()
+        )
+        label_ids = self._district_label_keys.get_indexer(
+            districts["district"].str.casefold()
+        )
+        self._district_pairs = pd.Index(
+            districts["state_id"].to_numpy(np.int64) * len(self._district_label_keys)
+            + label_ids
+        )
+
+        self.pincodes = table["pincode"].to_numpy()
+        self.pincode_district = table["district_id"].to_numpy()
+        self._pincode_pairs = pd.Index(
+            table["district_id"].to_numpy(np.int64) * PINCODE_SPAN
+            + table["pincode"].to_numpy(np.int64)
+        )
+
+    @classmethod
+    def from_frames(cls, *frames: pd.DataFrame) -> "Geography":
+        """
+        Build the dimension from the distinct geography of raw frames
+        """
+        uniq = pd.concat(
+            [f[GEO_COLUMNS].astype({"state": str, "district": str}).drop_duplicates()
+             for f in frames],
+            ignore_index=True
+        )
+
+        uniq["state"] = canonical_name(uniq["state"])
+        uniq["district"] = canonical_name(uniq["district"])
+        uniq["pincode"] = uniq["pincode"].astype(np.int64)
+
+        # One display spelling per case-insensitive name
+        for col in ["state", "district"]:
+            key = uniq[col].str.casefold()
+            uniq[col] = uniq.groupby(key)[col].transform("max")
+
+        uniq = uniq.drop_duplicates().sort_values(GEO_COLUMNS)
+
+        uniq["state_id"] = pd.factorize(uniq["state"], sort=True)[0]
+        uniq["district_id"] = (
+            uniq.groupby(["state_id", "district"], sort=True).ngroup()
+        )
+        uniq["pincode_id"] = np.arange(len(uniq))
+
+        return cls(uniq[ID_COLUMNS + GEO_COLUMNS].astype({
+            "state_id": np.int16,
+            "district_id": np.int32,
+            "pincode_id": np.int32,
+        }))
+
+    @classmethod
+    def from_frame(cls, table: pd.DataFrame) -> "Geography":
+        return cls(table)
+
+    def to_frame(self) -> pd.DataFrame:
+        return self.table.copy()
+
+    def extend(self, *frames: pd.DataFrame):
+        """
+        Dimension covering this one plus the geography of new frames.
+        Returns it with old -> new id maps per id column. Ids stay
+        name-ordered, so the maps are monotonic.
+        """
+        new = Geography.from_frames(self.table, *frames)
+
+        ids = new.encode(self.table[GEO_COLUMNS])
+        remap = {}
+        for col in ID_COLUMNS:
+            first = ~self.table[col].duplicated().to_numpy()
+            remap[col] = ids[col].to_numpy()[first]
+
+        return new, remap
+
+    # ==================================================
+    # ENCODE / DECODE
+    # ==================================================
+    def encode(self, df: pd.DataFrame, drop_names: bool = True) -> pd.DataFrame:
+        """
+        Replace geography names with integer ids.
+        Unknown geography is encoded as -1.
+        """
+        out = df.copy() if not drop_names else df.drop(
+            columns=[c for c in GEO_COLUMNS if c in df.columns]
+        )
+
+        state_id = _codes_to_ids(df["state"], self._state_keys)
+        out.insert(0, "state_id", state_id.astype(np.int16))
+
+        if "district" in df.columns:
+            label_id = _codes_to_ids(df["district"], self._district_label_keys)
+            pair = state_id.astype(np.int64) * len(self._district_label_keys) + label_id
+            district_id = self._district_pairs.get_indexer(pair)
+            district_id[(state_id < 0) | (label_id < 0)] = -1
+            out.insert(1, "district_id", district_id.astype(np.int32))
+
+            if "pincode" in df.columns:
+                pair = (
+                    district_id.astype(np.int64) * PINCODE_SPAN
+                    + df["pincode"].to_numpy(np.int64)
+                )
+                pincode_id = self._pincode_pairs.get_indexer(pair)
+                pincode_id[district_id < 0] = -1
+                out.insert(2, "pincode_id", pincode_id.astype(np.int32))
+
+        return out
+
+    def decode(self, df: pd.DataFrame, drop_ids: bool = True) -> pd.DataFrame:
+        """
+        Resolve integer ids back to canonical names for output.
+        Unknown geography (-1) decodes to missing names.
+        """
+        out = df.copy()
+
+        if "pincode_id" in out.columns:
+            ids = out["pincode_id"].to_numpy(np.int64)
+            if "district_id" not in out.columns:
+                out.insert(0, "district_id", _parent(self.pincode_district, ids))
+            out.insert(out.columns.get_loc("pincode_id"), "pincode", _take(self.pincodes, ids))
+
+        if "district_id" in out.columns:
+            ids = out["district_id"].to_numpy(np.int64)
+            if "state_id" not in out.columns:
+                out.insert(0, "state_id", _parent(self.district_state, ids))
+            out.insert(out.columns.get_loc("district_id"), "district", _take(self.district_names, ids))
+
+        if "state_id" in out.columns:
+            ids = out["state_id"].to_numpy(np.int64)
+            out.insert(out.columns.get_loc("state_id"), "state", _take(self.state_names, ids))
+
+        if drop_ids:
+            out = out.drop(columns=[c for c in ID_COLUMNS if c in out.columns])
+
+        return out
+
+    # ==================================================
+    # VALIDATION
+    # ==================================================
+    def valid_state_ids(self) -> np.ndarray:
+        """
+        State ids whose names pass the pipeline's cleaning rules
+        """
+        names = pd.Series(self.state_names)
+        valid = ~names.str.isnumeric() & (names.str.len() > 3)
+        return np.flatnonzero(valid.to_numpy())
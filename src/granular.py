@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from src.data_loader import COUNT_COLUMNS
+
+# Legacy single-column totals take precedence over the age buckets
+TOTAL_COLUMNS = {
+    "enrolment": "enrolment_count",
+    "demographic": "demographic_count",
+    "biometric": "biometric_count",
+}
+
+# (pincode_id, day) packs into one int64 join key
+DAY_OFFSET = 2 ** 31
+DAY_MASK = 2 ** 32 - 1
+
+
+def pack_keys(pincode_id, dates) -> np.ndarray:
+    """
+    Pack encoded pincode and date into a single int64 key
+    """
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    return (np.asarray(pincode_id, dtype=np.int64) << 32) | (days + DAY_OFFSET)
+
+
+def unpack_keys(keys: np.ndarray):
+    """
+    Inverse of `pack_keys`: (pincode_id, datetime64[D] dates)
+    """
+    pincode_id = (keys >> 32).astype(np.int32)
+    days = (keys & DAY_MASK) - DAY_OFFSET
+    return pincode_id, days.astype("datetime64[D]")
+
+
+def reduce_source(df: pd.DataFrame, source: str):
+    """
+    Collapse one encoded source to a single total per
+    (pincode, date) key. Returns the totals and collapse stats.
+    """
+    total_col = TOTAL_COLUMNS[source]
+    if total_col in df.columns:
+        values = df[total_col].fillna(0).to_numpy(np.int64)
+    else:
+        values = df[COUNT_COLUMNS[source]].sum(axis=1).to_numpy(np.int64)
+
+    valid = (df["pincode_id"].to_numpy() >= 0) & df["date"].notna().to_numpy()
+    keys = pack_keys(df["pincode_id"].to_numpy()[valid], df["date"].to_numpy()[valid])
+
+    grouped = pd.Series(values[valid]).groupby(keys, sort=True).agg(["sum", "size"])
+
+    stats = {
+        "rows_in": int(len(df)),
+        "rows_dropped": int((~valid).sum()),
+        "keys": int(len(grouped)),
+        "duplicate_keys": int((grouped["size"] > 1).sum()),
+        "rows_collapsed": int(valid.sum() - len(grouped)),
+    }
+
+    return grouped["sum"], stats
+
+
+def join_totals(enrol_tot: pd.Series, demo_tot: pd.Series, bio_tot: pd.Series, geo):
+    """
+    Hash-join reduced demographic and biometric totals onto the
+    enrolment keys. Returns the granular table and unmatched counts.
+    """
+    keys = enrol_tot.index
+
+    columns = {"enrolment": enrol_tot.to_numpy()}
+    unmatched = {}
+    for name, totals in [("demographic", demo_tot), ("biometric", bio_tot)]:
+        pos = totals.index.get_indexer(keys)
+        matched = pos >= 0
+        columns[name] = np.where(matched, totals.to_numpy()[pos], 0)
+        unmatched[name] = int(len(totals) - matched.sum())
+
+    pincode_id, dates = unpack_keys(keys.to_numpy())
+    district_id = geo.pincode_district[pincode_id]
+
+    granular = pd.DataFrame({
+        "state_id": geo.district_state[district_id],
+        "district_id": district_id,
+        "pincode_id": pincode_id,
+        "date": pd.to_datetime(dates),
+        "enrolment": columns["enrolment"],
+        "biometric": columns["biometric"],
+        "demographic": columns["demographic"],
+    })
+
+    return granular, unmatched
+
+
+def build_granular(
+    enrol: pd.DataFrame,
+    demo: pd.DataFrame,
+    bio: pd.DataFrame,
+    geo
+):
+    """
+    Build the (state, district, pincode, date) granular table from
+    geography-encoded sources. Each source is first reduced to one row
+    per key, then demographic and biometric totals are hash-joined onto
+    the enrolment keys, so memory stays close to the output size.
+    """
+    report = {}
+
+    enrol_tot, report["enrolment"] = reduce_source(enrol, "enrolment")
+    demo_tot, report["demographic"] = reduce_source(demo, "demographic")
+    bio_tot, report["biometric"] = reduce_source(bio, "biometric")
+
+    granular, unmatched = join_totals(enrol_tot, demo_tot, bio_tot, geo)
+
+    for name, count in unmatched.items():
+        report[name]["unmatched_keys"] = count
+    report["rows_out"] = int(len(granular))
+
+    return granular, report
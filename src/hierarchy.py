@@ -0,0 +1,103 @@
+import pandas as pd
+
+from src.features import build_feature_dataset
+from src.forecasting import forecast_state_risk
+from src.parallel import map_shards
+from src.policy_simulator import apply_policy_scenarios
+from src.risk_engine import compute_risk_score
+from src.stress_genome import (
+    compute_stress_genome,
+    normalize_genome,
+    assign_archetypes
+)
+
+# Geography level -> encoded id column
+LEVELS = {
+    "state": "state_id",
+    "district": "district_id",
+    "pincode": "pincode_id",
+}
+
+
+def forecast_level(
+    enrol, demo, bio, level: str, low_factor=0.90, medium_factor=0.70, high_factor=0.50
+):
+    """
+    Features, risk score, forecast, policy scenarios (with the given
+    intervention factors) and the un-normalized stress genome for one
+    level
+    """
+    key = LEVELS[level]
+
+    features = build_feature_dataset(enrol, demo, bio, key=key)
+    features = compute_risk_score(features)
+
+    forecast = forecast_state_risk(features, key=key)
+    genome = compute_stress_genome(features, key=key, normalize=False)
+
+    policy = apply_policy_scenarios(
+        forecast, low_factor=low_factor, medium_factor=medium_factor, high_factor=high_factor
+    )
+    return policy, genome
+
+
+def _forecast_shard(enrol, demo, bio, levels, **factors):
+    return {level: forecast_level(enrol, demo, bio, level, **factors) for level in levels}
+
+
+def forecast_hierarchy(
+    enrol: pd.DataFrame,
+    demo: pd.DataFrame,
+    bio: pd.DataFrame,
+    levels=("district", "pincode"),
+    workers: int = 0,
+    low_factor: float = 0.90,
+    medium_factor: float = 0.70,
+    high_factor: float = 0.50
+) -> dict:
+    """
+    Forecast risk, policy scenarios and the stress genome for every
+    series at each requested geography level. Inputs must be
+    geography-encoded. Returns {level: (policy_output, genome)}.
+
+    Each level is one batched fit over all of its series. With
+    `workers > 1`, whole states are sharded across a process pool that
+    reads the frames through memory-mapped files (see `src.parallel`);
+    districts and pincodes never span states, so results are identical.
+    Genome normalization runs after the shards are combined. The
+    factors are the intervention multipliers of the policy scenarios
+    (see `src.policy_simulator.apply_policy_scenarios`).
+    """
+    levels = list(levels)
+    factors = {"low_factor": low_factor, "medium_factor": medium_factor, "high_factor": high_factor}
+
+    if workers and workers > 1:
+        parts = map_shards(
+            _forecast_shard,
+            {"enrol": enrol, "demo": demo, "bio": bio},
+            "state_id",
+            workers,
+            levels=levels,
+            **factors
+        )
+    else:
+        parts = [_forecast_shard(enrol, demo, bio, levels, **factors)]
+
+    outputs = {}
+    for level in levels:
+        key = LEVELS[level]
+        out = pd.concat([p[level][0] for p in parts], ignore_index=True)
+        # Deterministic order regardless of sharding
+        out = out.sort_values(key).sort_values(
+            "predicted_risk_score", ascending=False, kind="mergesort"
+        )
+
+        genome = pd.concat([p[level][1] for p in parts], ignore_index=True)
+        genome = assign_archetypes(normalize_genome(genome.sort_values(key)))
+
+        outputs[level] = (
+            out.reset_index(drop=True),
+            genome.reset_index(drop=True)
+        )
+
+    return outputs
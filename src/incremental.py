@@ -0,0 +1,474 @@
+import pickle
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.forecasting import BOOTSTRAP_SAMPLES, bootstrap_intervals, forecast_state_risk
+from src.geography import Geography
+from src.granular import join_totals, pack_keys, reduce_source, unpack_keys
+from src.hierarchy import LEVELS
+from src.policy_simulator import apply_policy_scenarios
+from src.risk_engine import compute_risk_score
+from src.stress_genome import (
+    compute_stress_genome,
+    normalize_genome,
+    assign_archetypes
+)
+from src.surge import SurgeDetector, stream_surges, surge_tables
+
+# Base project path
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+STATE_FILE = BASE_DIR / "data" / "incremental" / "state.pkl"
+
+AGE_COLUMNS = ["age_0_5", "age_5_17", "age_18_greater"]
+
+PRESSURES = {
+    "demo": ("demo_update_pressure", ["demo_age_5_17", "demo_age_17_"]),
+    "bio": ("biometric_update_pressure", ["bio_age_5_17", "bio_age_17_"]),
+}
+
+
+# ==================================================
+# ADDITIVE FEATURE ACCUMULATORS
+# ==================================================
+def enrolment_accumulators(enrol: pd.DataFrame, key: str, tails: pd.DataFrame):
+    """
+    Per key-date sums and counts behind the enrolment features.
+
+    `monthly_growth` is a row-level pct_change within each key, so the
+    first new row of a key continues from the stored last row (`tails`).
+    Returns the accumulators and the updated tails.
+    """
+    df = enrol[[key, 'date']].copy()
+    df['total'] = enrol[AGE_COLUMNS].sum(axis=1).astype(np.int64)
+    for col in AGE_COLUMNS:
+        df[col] = enrol[col]
+
+    # Same row order as build_enrolment_features (stable within a date)
+    df = df.sort_values([key, 'date'], kind='mergesort')
+
+    prev = df.groupby(key, sort=False)['total'].shift(1)
+    first = prev.isna()
+    prev[first] = tails['last_total'].reindex(df.loc[first, key].to_numpy()).to_numpy()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = df['total'] / prev - 1
+        ratios = {
+            col: df[col] / df['total']
+            for col in AGE_COLUMNS
+        }
+
+    acc = pd.DataFrame({
+        key: df[key],
+        'date': df['date'],
+        'total_enrolment': df['total'],
+        'growth_sum': growth.fillna(0),
+        'growth_n': growth.notna().astype(np.int64),
+        'child_sum': ratios['age_0_5'].fillna(0),
+        'youth_sum': ratios['age_5_17'].fillna(0),
+        'adult_sum': ratios['age_18_greater'].fillna(0),
+        'ratio_n': ratios['age_0_5'].notna().astype(np.int64),
+    })
+    acc = acc.groupby([key, 'date'], as_index=False, sort=True).sum()
+
+    last = df.groupby(key, sort=True).tail(1).set_index(key)
+    new_tails = pd.DataFrame({
+        'last_total': last['total'],
+        'last_date': last['date']
+    })
+    tails = pd.concat([tails[~tails.index.isin(new_tails.index)], new_tails]).sort_index()
+
+    return acc, tails
+
+
+def pressure_accumulators(df: pd.DataFrame, key: str, name: str) -> pd.DataFrame:
+    column, parts = PRESSURES[name]
+    acc = df[[key, 'date']].copy()
+    acc[column] = df[parts].sum(axis=1).astype(np.int64)
+    return acc.groupby([key, 'date'], as_index=False, sort=True).sum()
+
+
+def merge_accumulators(old: pd.DataFrame, new: pd.DataFrame, key: str) -> pd.DataFrame:
+    """
+    Add new key-date sums into stored ones, touching only affected keys
+    """
+    if not len(old):
+        return new.reset_index(drop=True)
+
+    touched = old[key].isin(new[key].unique())
+    merged = (
+        pd.concat([old[touched], new], ignore_index=True)
+        .groupby([key, 'date'], as_index=False, sort=True)
+        .sum()
+    )
+    return (
+        pd.concat([old[~touched], merged], ignore_index=True)
+        .sort_values([key, 'date'], kind='mergesort')
+        .reset_index(drop=True)
+    )
+
+
+def finalize_features(level_state: dict, key: str, keys=None) -> pd.DataFrame:
+    """
+    Turn accumulators into the feature_dataset columns
+    (optionally only for the given keys)
+    """
+    frames = {}
+    for name in ['enrol', 'demo', 'bio']:
+        acc = level_state[name]
+        frames[name] = acc if keys is None else acc[acc[key].isin(keys)]
+
+    e = frames['enrol']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features = pd.DataFrame({
+            key: e[key].to_numpy(),
+            'date': e['date'].to_numpy(),
+            'total_enrolment': e['total_enrolment'].to_numpy(),
+            'monthly_growth': (e['growth_sum'] / e['growth_n']).to_numpy(),
+            'child_ratio': (e['child_sum'] / e['ratio_n']).to_numpy(),
+            'youth_ratio': (e['youth_sum'] / e['ratio_n']).to_numpy(),
+            'adult_ratio': (e['adult_sum'] / e['ratio_n']).to_numpy(),
+        })
+
+    for name in ['demo', 'bio']:
+        features = features.merge(frames[name], on=[key, 'date'], how='left')
+
+    # Same zero-filling as the grouped sum in build_feature_dataset
+    value_cols = features.columns.drop([key, 'date', 'total_enrolment'])
+    features[value_cols] = features[value_cols].fillna(0).astype(np.float64)
+
+    return features
+
+
+# ==================================================
+# STATE
+# ==================================================
+def empty_state(levels=("state", "district", "pincode")) -> dict:
+    state = {"geo": None, "totals": {}, "levels": {}, "surge": None}
+
+    for level in levels:
+        key = LEVELS[level]
+        state["levels"][level] = {
+            "enrol": pd.DataFrame(columns=[key, 'date']),
+            "demo": pd.DataFrame(columns=[key, 'date']),
+            "bio": pd.DataFrame(columns=[key, 'date']),
+            "tails": pd.DataFrame({
+                'last_total': pd.Series(dtype=np.float64),
+                'last_date': pd.Series(dtype='datetime64[us]')
+            }),
+            "forecast": pd.DataFrame(columns=[key, 'predicted_risk_score']),
+            "genome": pd.DataFrame(columns=[key]),
+        }
+
+    return state
+
+
+def _remap_state(state: dict, remap: dict):
+    """
+    Move every stored id onto an extended geography
+    """
+    for name, totals in state["totals"].items():
+        pincode_id, dates = unpack_keys(totals.index.to_numpy())
+        totals.index = pack_keys(remap["pincode_id"][pincode_id], dates)
+
+    for level, ls in state["levels"].items():
+        key = LEVELS[level]
+        ids = remap[key]
+        for name in ["enrol", "demo", "bio", "forecast", "genome"]:
+            if len(ls[name]):
+                ls[name][key] = ids[ls[name][key].to_numpy(np.int64)]
+        ls["tails"].index = ids[ls["tails"].index.to_numpy(np.int64)]
+
+    surge = state.get("surge")
+    if surge is not None:
+        geo = state["geo"]
+        surge["detector"].extend(geo.pincode_district, geo.district_state, remap)
+        alerts = surge["alerts"]
+        alerts["pincode_id"] = remap["pincode_id"][alerts["pincode_id"].to_numpy(np.int64)]
+
+
+def _add_totals(old, new):
+    if old is None:
+        return new
+    return pd.concat([old, new]).groupby(level=0, sort=True).sum()
+
+
+def _series_outputs(features: pd.DataFrame, key: str):
+    features = compute_risk_score(features)
+    forecast = forecast_state_risk(features, key=key)
+    genome = compute_stress_genome(features, key=key, normalize=False)
+    return forecast, genome
+
+
+def _splice(stored: pd.DataFrame, fresh: pd.DataFrame, key: str, keys) -> pd.DataFrame:
+    kept = stored[~stored[key].isin(keys)]
+    parts = [df for df in (kept, fresh) if len(df)]
+    if not parts:
+        return fresh
+    return pd.concat(parts, ignore_index=True).sort_values(key).reset_index(drop=True)
+
+
+def rebuild_surges(state: dict):
+    """
+    Stream the whole stored granular history through a new surge
+    detector
+    """
+    geo = state["geo"]
+    granular, _ = join_totals(
+        state["totals"]["enrolment"],
+        state["totals"]["demographic"],
+        state["totals"]["biometric"],
+        geo
+    )
+    detector = SurgeDetector(geo.pincode_district, geo.district_state)
+    state["surge"] = {"detector": detector, "alerts": stream_surges(detector, granular)}
+
+
+def update_surges(state: dict, slice_totals: dict):
+    """
+    Fold the granular rows a slice added into the stored surge
+    detector. Rows dated on or before the detector's last day change
+    days it has already scored, so those slices (and states without a
+    detector) replay the whole history instead.
+    """
+    surge = state.get("surge")
+    last_date = None if surge is None else surge["detector"].last_date
+    dates = np.concatenate([
+        unpack_keys(totals.index.to_numpy())[1] for totals in slice_totals.values()
+    ])
+    if surge is None or (last_date is not None and len(dates) and dates.min() <= last_date):
+        rebuild_surges(state)
+        return
+
+    # Slice keys are new, so their demographic / biometric totals may
+    # only come from rows stored ahead of the enrolment history
+    new_keys = slice_totals["enrolment"].index
+    granular, _ = join_totals(
+        state["totals"]["enrolment"].reindex(new_keys),
+        state["totals"]["demographic"],
+        state["totals"]["biometric"],
+        state["geo"]
+    )
+    alerts = stream_surges(surge["detector"], granular)
+    if len(alerts):
+        surge["alerts"] = pd.concat([surge["alerts"], alerts], ignore_index=True)
+
+
+def refresh_level(ls: dict, key: str, keys=None):
+    """
+    Recompute forecast and raw genome of one level from its
+    accumulators, for the given keys (default: all)
+    """
+    if keys is None:
+        keys = ls["enrol"][key].unique()
+
+    forecast, genome = _series_outputs(finalize_features(ls, key, keys), key)
+    ls["forecast"] = _splice(ls["forecast"], forecast, key, keys)
+    ls["genome"] = _splice(ls["genome"], genome, key, keys)
+
+
+def apply_update(state: dict, enrol: pd.DataFrame, demo: pd.DataFrame, bio: pd.DataFrame):
+    """
+    Absorb a slice of raw (un-encoded) rows into the stored state.
+    Only series that received rows have their features, forecast and
+    genome recomputed. Returns the state and the affected ids per level.
+
+    Enrolment rows must not predate the stored last date of their
+    series; appending to the latest date is allowed.
+    """
+    # Geography: extend with any new names, keeping ids name-ordered
+    if state["geo"] is None:
+        state["geo"] = Geography.from_frames(enrol, demo, bio)
+    else:
+        state["geo"], remap = state["geo"].extend(enrol, demo, bio)
+        _remap_state(state, remap)
+
+    geo = state["geo"]
+    enrol, demo, bio = geo.encode(enrol), geo.encode(demo), geo.encode(bio)
+
+    # Granular: add reduced (pincode, date) totals
+    slice_totals = {}
+    for name, df in [("enrolment", enrol), ("demographic", demo), ("biometric", bio)]:
+        slice_totals[name], _ = reduce_source(df, name)
+        state["totals"][name] = _add_totals(state["totals"].get(name), slice_totals[name])
+    update_surges(state, slice_totals)
+
+    affected = {}
+    for level, ls in state["levels"].items():
+        key = LEVELS[level]
+
+        last_date = ls["tails"]['last_date'].reindex(enrol[key].to_numpy())
+        late = enrol['date'].to_numpy() < last_date.to_numpy()
+        if late.any():
+            raise ValueError(
+                f"{int(late.sum())} enrolment rows predate stored {level} history; "
+                "run a full rebuild instead"
+            )
+
+        enrol_acc, ls["tails"] = enrolment_accumulators(enrol, key, ls["tails"])
+        ls["enrol"] = merge_accumulators(ls["enrol"], enrol_acc, key)
+        ls["demo"] = merge_accumulators(ls["demo"], pressure_accumulators(demo, key, "demo"), key)
+        ls["bio"] = merge_accumulators(ls["bio"], pressure_accumulators(bio, key, "bio"), key)
+
+        keys = np.unique(np.concatenate([df[key].to_numpy() for df in (enrol, demo, bio)]))
+        affected[level] = keys
+
+        refresh_level(ls, key, keys)
+
+    return state, affected
+
+
+def build_state(enrol, demo, bio, levels=("state", "district", "pincode")) -> dict:
+    """
+    Initial state: the full history absorbed as one update
+    """
+    state, _ = apply_update(empty_state(levels), enrol, demo, bio)
+    return state
+
+
+# ==================================================
+# OUTPUTS
+# ==================================================
+def _valid(df: pd.DataFrame, key: str, geo, valid_states) -> pd.DataFrame:
+    ids = df[key].to_numpy(np.int64)
+    if key == "pincode_id":
+        ids = geo.pincode_district[ids]
+    if key in ("district_id", "pincode_id"):
+        ids = geo.district_state[ids]
+    return df[np.isin(ids, valid_states)]
+
+
+def state_outputs(
+    state: dict,
+    n_boot: int = BOOTSTRAP_SAMPLES,
+    policy_factors=(0.90, 0.70, 0.50),
+    workers: int = 0
+) -> dict:
+    """
+    Encoded pipeline outputs from the stored state, filtered to valid
+    states: granular (unless the state is partitioned), feature_dataset,
+    surge alerts and top-k tables from the stored detector, and per
+    level the policy output
+    and normalized genome with archetypes. The state policy output also
+    gets bootstrap intervals, recomputed over all states. Every level's
+    policy scenarios use `policy_factors` (low, medium, high).
+    """
+    geo = state["geo"]
+    valid_states = geo.valid_state_ids()
+    low, medium, high = policy_factors
+
+    outputs = {
+        "features": _valid(
+            finalize_features(state["levels"]["state"], "state_id"),
+            "state_id", geo, valid_states
+        ).reset_index(drop=True),
+        "surges": surge_tables(
+            state["surge"]["alerts"], state["surge"]["detector"], geo, valid_states
+        ),
+        "levels": {},
+    }
+    # A partitioned state's granular rows were published per partition
+    if "partitions" not in state:
+        granular, _ = join_totals(
+            state["totals"]["enrolment"],
+            state["totals"]["demographic"],
+            state["totals"]["biometric"],
+            geo
+        )
+        outputs["granular"] = granular[granular["state_id"].isin(valid_states)]
+
+    for level, ls in state["levels"].items():
+        key = LEVELS[level]
+
+        forecast = _valid(ls["forecast"], key, geo, valid_states)
+        if level == "state" and n_boot:
+            intervals = bootstrap_intervals(
+                compute_risk_score(outputs["features"]), key=key, n_boot=n_boot,
+                workers=workers
+            )
+            forecast = forecast.merge(intervals, on=key, how="left")
+        policy = apply_policy_scenarios(
+            forecast.sort_values(key).sort_values(
+                "predicted_risk_score", ascending=False, kind="mergesort"
+            ),
+            low_factor=low, medium_factor=medium, high_factor=high
+        ).reset_index(drop=True)
+
+        genome = _valid(ls["genome"], key, geo, valid_states).sort_values(key)
+        genome = assign_archetypes(normalize_genome(genome)).reset_index(drop=True)
+
+        outputs["levels"][level] = (policy, genome)
+
+    return outputs
+
+
+def save_partition(part: dict, path: Path) -> str:
+    """
+    Store the totals and accumulators of one partition of a state;
+    returns the file name the state records
+    """
+    with open(path, "wb") as f:
+        pickle.dump(part, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return Path(path).name
+
+
+def merge_partitions(state: dict, directory: Path) -> dict:
+    """
+    Load a partitioned state's totals and per-level accumulators from
+    `directory` into the state itself. Partitions hold contiguous
+    state id ranges in order, so concatenation keeps the sort order.
+    """
+    totals = {}
+    frames = {level: {} for level in state["levels"]}
+    for name in state.pop("partitions")["files"]:
+        with open(Path(directory) / name, "rb") as f:
+            part = pickle.load(f)
+        for source, series in part["totals"].items():
+            totals.setdefault(source, []).append(series)
+        for level, ls in part["levels"].items():
+            for acc, df in ls.items():
+                frames[level].setdefault(acc, []).append(df)
+
+    for source, parts in totals.items():
+        state["totals"][source] = pd.concat(parts).sort_index()
+    for level, named in frames.items():
+        for acc, parts in named.items():
+            parts = [df for df in parts if len(df)] or parts[:1]
+            state["levels"][level][acc] = pd.concat(parts, ignore_index=True)
+    return state
+
+
+def load_state(path: Path = None):
+    """
+    The stored state, with the partitions of an out-of-core build
+    merged in, or None
+    """
+    path = Path(path or STATE_FILE)
+    if not path.exists():
+        return None
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if "partitions" in state:
+        merge_partitions(state, path.parent / state["partitions"]["dir"])
+    return state
+
+
+def save_state(state: dict, path: Path = None):
+    """
+    Replace the stored state atomically, then remove partition
+    directories it no longer refers to
+    """
+    path = Path(path or STATE_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp.replace(path)
+
+    current = state.get("partitions", {}).get("dir")
+    for stale in path.parent.glob(f"{path.stem}.parts.*"):
+        if stale.name != current:
+            shutil.rmtree(stale, ignore_errors=True)
@@ -0,0 +1,199 @@
+import cProfile
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 2 ** 20
+
+
+# ==================================================
+# SIZE OF STAGE VALUES
+# ==================================================
+def measure(value, depth: int = 0) -> dict:
+    """
+    Rows and in-memory bytes of a stage value: frames, series and
+    arrays, summed through dicts, lists and plain objects
+    """
+    if isinstance(value, pd.DataFrame):
+        return {"rows": len(value), "bytes": int(value.memory_usage(deep=True).sum())}
+    if isinstance(value, (pd.Series, pd.Index)):
+        return {"rows": len(value), "bytes": int(value.memory_usage(deep=True))}
+    if isinstance(value, np.ndarray):
+        return {"rows": len(value) if value.ndim else 1, "bytes": int(value.nbytes)}
+
+    if depth >= 3:
+        return {"rows": 0, "bytes": 0}
+
+    if isinstance(value, dict):
+        parts = value.values()
+    elif isinstance(value, (list, tuple)):
+        parts = value
+    elif hasattr(value, "__dict__"):
+        parts = vars(value).values()
+    else:
+        return {"rows": 0, "bytes": 0}
+
+    total = {"rows": 0, "bytes": 0}
+    for part in parts:
+        size = measure(part, depth + 1)
+        total["rows"] += size["rows"]
+        total["bytes"] += size["bytes"]
+    return total
+
+
+def _rss_mb():
+    """
+    Current resident set size, where /proc is available
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / MB, 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _max_rss_mb(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (MB if sys.platform == "darwin" else 1024), 1)
+
+
+# ==================================================
+# RUN MONITOR
+# ==================================================
+class RunMonitor:
+    """
+    Collects wall time, CPU time, memory and value sizes per stage.
+    With `trace_memory`, tracemalloc gives each stage's own peak of
+    Python/NumPy allocations (slower); otherwise only process RSS is
+    recorded. Stages in `profile` are run under cProfile and dumped
+    to `profile_dir/<stage>.prof`.
+    """
+
+    def __init__(self, trace_memory: bool = False, profile=(), profile_dir: Path = None):
+        self.trace_memory = trace_memory
+        self.profile = set(profile or ())
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.stages = []
+        self.meta = {}
+        self._started = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str, kind: str = "compute", inputs=None):
+        """
+        Measure the enclosed block; yields the record so the caller can
+        attach the output with `record["output"] = value`
+        """
+        record = {"stage": name, "kind": kind}
+        if inputs is not None:
+            size = measure(inputs)
+            record["rows_in"], record["bytes_in"] = size["rows"], size["bytes"]
+
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+
+        record["rss_before_mb"] = _rss_mb()
+        profiler = cProfile.Profile() if name in self.profile and kind == "compute" else None
+        times = os.times()
+        wall, cpu = time.perf_counter(), time.process_time()
+
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+
+            after = os.times()
+            record["wall_s"] = round(time.perf_counter() - wall, 4)
+            record["cpu_s"] = round(time.process_time() - cpu, 4)
+            record["child_cpu_s"] = round(
+                (after.children_user + after.children_system)
+                - (times.children_user + times.children_system), 4
+            )
+            record["rss_mb"] = _rss_mb()
+            record["max_rss_mb"] = _max_rss_mb(resource.RUSAGE_SELF) if resource else None
+
+            if self.trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                record["traced_peak_mb"] = round((peak - traced_before) / MB, 2)
+                record["traced_delta_mb"] = round((current - traced_before) / MB, 2)
+
+            output = record.pop("output", None)
+            if output is not None:
+                size = measure(output)
+                record["rows_out"], record["bytes_out"] = size["rows"], size["bytes"]
+
+            if profiler:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                path = self.profile_dir / f"{name}.prof"
+                profiler.dump_stats(path)
+                record["profile"] = str(path)
+
+            self.stages.append(record)
+
+    def unprofiled(self) -> list:
+        """
+        Requested `profile` stages that were never computed (e.g.
+        served from cache), so no profile was written for them
+        """
+        return sorted(self.profile - {r["stage"] for r in self.stages if "profile" in r})
+
+    def report(self) -> dict:
+        return {
+            "started": self._started.isoformat(timespec="seconds"),
+            "wall_s": round(time.perf_counter() - self._t0, 4),
+            "max_rss_mb": _max_rss_mb(resource.RUSAGE_SELF) if resource else None,
+            "children_max_rss_mb": _max_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+            "trace_memory": self.trace_memory,
+            "environment": {
+                "python": platform.python_version(),
+                "pandas": pd.__version__,
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "argv": sys.argv,
+            },
+            **self.meta,
+            "stages": self.stages,
+        }
+
+    def write(self, results_dir: Path) -> Path:
+        """
+        Write `run_report.json` and append it to `run_reports.jsonl`
+        so runs can be compared over time
+        """
+        results_dir = Path(results_dir)
+        results_dir.mkdir(parents=True, exist_ok=True)
+        report = self.report()
+
+        path = results_dir / "run_report.json"
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        with open(results_dir / "run_reports.jsonl", "a") as f:
+            f.write(json.dumps(report, default=str) + "\n")
+
+        return path
@@ -0,0 +1,29 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    """
+    Module whose code runs on its first attribute access. Lets a
+    caller name everything it may need up front while paying only for
+    the modules (and their dependencies) it actually uses.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    # As a regular import does, bind it on its parent package
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,590 @@
+import math
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data_loader import (
+    DATA_PROCESSED,
+    DATE_FORMAT,
+    RAW_FILES,
+    iter_raw_chunks,
+    load_raw_typed,
+    raw_schema
+)
+from src.geography import GEO_COLUMNS, Geography
+from src.granular import join_totals, reduce_source, unpack_keys
+from src.hierarchy import LEVELS
+from src.incremental import (
+    AGE_COLUMNS,
+    empty_state,
+    enrolment_accumulators,
+    merge_partitions,
+    pressure_accumulators,
+    refresh_level,
+    save_partition
+)
+from src.surge import ALERT_COLUMNS, SurgeDetector, stream_surges
+
+# Base project path
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SHARD_ROOT = BASE_DIR / "data" / "shards"
+
+# Working memory of a map task per byte of raw CSV it reads
+# (typed frame, encoded copy, sort order and accumulators)
+WORKING_SET_FACTOR = 6
+
+MIN_CHUNK_ROWS = 10_000
+
+
+# ==================================================
+# PLANNING
+# ==================================================
+def _row_bytes(path: Path) -> float:
+    """
+    Average CSV line length from the head of a file
+    """
+    with open(path, "rb") as f:
+        head = f.read(1 << 20)
+    lines = max(head.count(b"\n") - 1, 1)
+    return max(len(head) / lines, 1.0)
+
+
+def plan_shards(paths: dict, memory_mb: int, workers: int = 0) -> dict:
+    """
+    Shard count and streaming chunk size so that each concurrent map
+    task stays within its share of `memory_mb`
+    """
+    budget = memory_mb * 2 ** 20 / max(workers, 1)
+    total = sum(Path(p).stat().st_size for p in paths.values())
+    row_bytes = max(_row_bytes(p) for p in paths.values())
+
+    return {
+        "shards": max(1, math.ceil(total * WORKING_SET_FACTOR / budget)),
+        "chunksize": max(MIN_CHUNK_ROWS, int(budget / (WORKING_SET_FACTOR * row_bytes))),
+        # The reduce runs in this process alone, with the whole budget
+        "partitions": max(1, math.ceil(total * WORKING_SET_FACTOR / (memory_mb * 2 ** 20))),
+    }
+
+
+def scan_raw(paths: dict, chunksize: int):
+    """
+    One streaming pass over the raw files: the geography dimension and
+    row counts per (raw state label, date)
+    """
+    geo_parts, counts = [], []
+
+    for source, path in paths.items():
+        for chunk in iter_raw_chunks(source, chunksize, path=path):
+            geo_parts.append(chunk[GEO_COLUMNS].astype({"state": str, "district": str}).drop_duplicates())
+            if len(geo_parts) > 16:
+                geo_parts = [pd.concat(geo_parts, ignore_index=True).drop_duplicates()]
+
+            counts.append(chunk[["state", "date"]].astype({"state": str}).value_counts())
+            if len(counts) > 16:
+                counts = [pd.concat(counts).groupby(level=[0, 1]).sum()]
+
+    geo = Geography.from_frames(pd.concat(geo_parts, ignore_index=True))
+    rows = pd.concat(counts).groupby(level=[0, 1], sort=True).sum()
+    return geo, rows.astype(np.int64)
+
+
+def _date_edges(date_rows: pd.Series, pieces: int) -> np.ndarray:
+    """
+    Dates starting each of `pieces` contiguous ranges holding about
+    equal rows (a date is never split)
+    """
+    cumulative = date_rows.cumsum().to_numpy()
+    cuts = np.searchsorted(
+        cumulative, cumulative[-1] * np.arange(1, pieces) / pieces, side="left"
+    )
+    return np.unique(date_rows.index.to_numpy()[np.minimum(cuts + 1, len(cumulative) - 1)])
+
+
+def _rows_by_state(geo, rows: pd.Series) -> pd.Series:
+    """
+    Row counts per (state_id, date) from counts per raw state label
+    """
+    state_id = geo.encode(pd.DataFrame({"state": rows.index.get_level_values("state")}))["state_id"]
+    return pd.Series(rows.to_numpy(), index=pd.MultiIndex.from_arrays(
+        [state_id.to_numpy(), rows.index.get_level_values("date")], names=["state_id", "date"]
+    )).groupby(level=[0, 1]).sum()
+
+
+def assign_partitions(geo, rows: pd.Series, n_parts: int) -> np.ndarray:
+    """
+    Reduce partition of every state id: contiguous id ranges of at most
+    1 / `n_parts` of the rows, so concatenating partitions in order
+    keeps the id order of a single reduce. A state is never split,
+    since every district and PIN series lies within one state; a state
+    larger than the share is a partition of its own.
+    """
+    state_rows = np.zeros(len(geo.state_names), dtype=np.int64)
+    counts = _rows_by_state(geo, rows).groupby(level=0).sum()
+    counts = counts[counts.index >= 0]
+    state_rows[counts.index.to_numpy()] = counts.to_numpy()
+
+    share = state_rows.sum() / max(n_parts, 1)
+    part = np.zeros(len(state_rows), dtype=np.int64)
+    current, load = 0, 0
+    for sid, count in enumerate(state_rows):
+        if load and load + count > share:
+            current, load = current + 1, 0
+        part[sid] = current
+        load += count
+    return part
+
+
+def assign_shards(geo, rows: pd.Series, n_shards: int, shard_by: str):
+    """
+    Shard lookup for each row.
+
+    "state": whole states balanced by row count (largest first onto the
+    lightest shard). A state holding more than a shard's share of rows
+    is split into contiguous date ranges of its own, so no shard
+    outgrows the budget; these sub-state shards are reduced in date
+    order like date shards.
+    "date": contiguous date ranges holding about equal rows.
+    """
+    date_rows = rows.groupby(level="date").sum().sort_index()
+    if shard_by == "date":
+        edges = _date_edges(date_rows, n_shards)
+        return {"by": "date", "edges": edges, "shards": len(edges) + 1}
+
+    by_state = _rows_by_state(geo, rows)
+
+    state_rows = by_state.groupby(level=0).sum().sort_values(ascending=False, kind="mergesort")
+    share = state_rows.sum() / max(n_shards, 1)
+    pieces = np.ceil(state_rows / share).astype(np.int64)
+
+    whole = state_rows[pieces <= 1]
+    load = np.zeros(max(min(n_shards - int(pieces[pieces > 1].sum()), len(whole)), 1), dtype=np.int64)
+    shard_of = np.zeros(len(geo.state_names), dtype=np.int64)
+    for sid, count in whole.items():
+        target = int(np.argmin(load))
+        shard_of[sid] = target
+        load[target] += count
+
+    # Oversized states: consecutive shard numbers in date order
+    split, shards = {}, len(load)
+    for sid in state_rows.index[pieces > 1]:
+        edges = _date_edges(by_state.loc[sid].sort_index(), int(pieces.loc[sid]))
+        shard_of[sid] = shards
+        split[int(sid)] = edges
+        shards += len(edges) + 1
+
+    return {"by": "state", "shard_of": shard_of, "split": split, "shards": shards}
+
+
+def shard_of_rows(assignment: dict, state_id: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    if assignment["by"] == "date":
+        return np.searchsorted(assignment["edges"], dates, side="right")
+
+    shard = assignment["shard_of"][state_id]
+    for sid, edges in assignment["split"].items():
+        rows = state_id == sid
+        shard[rows] += np.searchsorted(edges, dates[rows], side="right")
+    return shard
+
+
+def partition_raw(paths: dict, geo, assignment: dict, chunksize: int, out_dir: Path) -> list:
+    """
+    Second streaming pass: spill every row into its shard's copy of the
+    raw file, keeping file order within a shard. Rows without a date
+    never reach any output and are dropped here.
+    """
+    shard_dirs = [out_dir / f"shard-{i:04d}" for i in range(assignment["shards"])]
+
+    for source, path in paths.items():
+        # Shard files carry the typed columns in raw file order
+        wanted = set(raw_schema(source)) | {"date"}
+        header = [c for c in pd.read_csv(path, nrows=0).columns if c in wanted]
+        for d in shard_dirs:
+            d.mkdir(parents=True, exist_ok=True)
+            pd.DataFrame(columns=header).to_csv(d / RAW_FILES[source], index=False)
+
+        for chunk in iter_raw_chunks(source, chunksize, path=path):
+            chunk = chunk[chunk["date"].notna()]
+            state_id = geo.encode(chunk[["state"]])["state_id"].to_numpy()
+            shard = shard_of_rows(assignment, state_id, chunk["date"].to_numpy())
+
+            for i in np.unique(shard):
+                chunk[shard == i].to_csv(
+                    shard_dirs[i] / RAW_FILES[source],
+                    columns=header,
+                    mode="a", header=False, index=False, date_format=DATE_FORMAT
+                )
+
+    return [
+        {source: d / RAW_FILES[source] for source in paths}
+        for d in shard_dirs
+    ]
+
+
+# ==================================================
+# MAP
+# ==================================================
+def _heads(enrol: pd.DataFrame, key: str) -> pd.DataFrame:
+    """
+    First enrolment row per key in stable (key, date) order
+    """
+    df = enrol[[key, "date"]].copy()
+    df["total"] = enrol[AGE_COLUMNS].sum(axis=1).astype(np.int64)
+    first = df.sort_values([key, "date"], kind="mergesort").groupby(key, sort=True).head(1)
+    return pd.DataFrame({
+        "first_total": first["total"].to_numpy(),
+        "first_date": first["date"].to_numpy(),
+    }, index=pd.Index(first[key].to_numpy(), name=key))
+
+
+def map_shard(files: dict, geo, levels, out: Path = None):
+    """
+    Partial aggregates of one shard: (pincode, date) totals per source
+    and, per level, the additive feature accumulators plus the first
+    and last enrolment row of every series. With `out`, the partial is
+    spilled there and its path returned instead.
+    """
+    valid = geo.valid_state_ids()
+    frames = {}
+    for source, path in files.items():
+        df = geo.encode(load_raw_typed(source, path=path))
+        frames[source] = df[df["state_id"].isin(valid)]
+
+    partial = {
+        "totals": {source: reduce_source(df, source)[0] for source, df in frames.items()},
+        "levels": {},
+    }
+
+    for level in levels:
+        key = LEVELS[level]
+        tails = empty_state([level])["levels"][level]["tails"]
+        enrol_acc, tails = enrolment_accumulators(frames["enrolment"], key, tails)
+
+        partial["levels"][level] = {
+            "enrol": enrol_acc,
+            "demo": pressure_accumulators(frames["demographic"], key, "demo"),
+            "bio": pressure_accumulators(frames["biometric"], key, "bio"),
+            "heads": _heads(frames["enrolment"], key),
+            "tails": tails,
+        }
+
+    if out is None:
+        return partial
+    with open(out, "wb") as f:
+        pickle.dump(partial, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return out
+
+
+def _load_partial(path: Path) -> dict:
+    with open(path, "rb") as f:
+        partial = pickle.load(f)
+    Path(path).unlink()
+    return partial
+
+
+# ==================================================
+# REDUCE
+# ==================================================
+def _sum_frames(frames, key: str) -> pd.DataFrame:
+    non_empty = [f for f in frames if len(f)]
+    if not non_empty:
+        return frames[0]
+    frames = non_empty
+    return (
+        pd.concat(frames, ignore_index=True)
+        .groupby([key, "date"], as_index=False, sort=True)
+        .sum()
+    )
+
+
+def carry_growth(part: dict, key: str, tails: pd.DataFrame):
+    """
+    One shard's enrolment accumulators with the first growth value of
+    each series continued from its last row in an earlier shard (only
+    possible for date ranges), and the tails updated with its last rows
+    """
+    acc, heads = part["enrol"], part["heads"]
+
+    prev = tails["last_total"].reindex(heads.index).to_numpy(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = heads["first_total"].to_numpy() / prev - 1
+    carried = ~np.isnan(growth)
+
+    if carried.any():
+        fix = pd.DataFrame({
+            key: heads.index.to_numpy()[carried],
+            "date": heads["first_date"].to_numpy()[carried],
+            "carried": growth[carried],
+        })
+        acc = acc.merge(fix, on=[key, "date"], how="left")
+        acc["growth_sum"] += acc["carried"].fillna(0)
+        acc["growth_n"] += acc["carried"].notna().astype(np.int64)
+        acc = acc.drop(columns="carried")
+
+    new_tails = part["tails"]
+    tails = pd.concat([tails[~tails.index.isin(new_tails.index)], new_tails]).sort_index()
+    return acc, tails
+
+
+def _state_of(ids: np.ndarray, key: str, geo) -> np.ndarray:
+    ids = np.asarray(ids, dtype=np.int64)
+    if key == "pincode_id":
+        ids = geo.pincode_district[ids]
+    if key in ("district_id", "pincode_id"):
+        ids = geo.district_state[ids]
+    return ids
+
+
+def _spill(partial: dict, geo, part_of_state: np.ndarray, spill_dir: Path):
+    """
+    Append the pieces of one (growth-carried) partial to the spill
+    file of every reduce partition it touches
+    """
+    pieces = {}
+
+    def piece(part):
+        return pieces.setdefault(int(part), {"totals": {}, "levels": {}})
+
+    for source, totals in partial["totals"].items():
+        pincode_id, _ = unpack_keys(totals.index.to_numpy())
+        part = part_of_state[_state_of(pincode_id, "pincode_id", geo)]
+        for p in np.unique(part):
+            piece(p)["totals"][source] = totals[part == p]
+
+    for level, frames in partial["levels"].items():
+        key = LEVELS[level]
+        for name, df in frames.items():
+            part = part_of_state[_state_of(df[key].to_numpy(), key, geo)]
+            for p in np.unique(part):
+                piece(p)["levels"].setdefault(level, {})[name] = df[part == p]
+
+    for p, content in pieces.items():
+        with open(spill_dir / f"part-{p:04d}.pkl", "ab") as f:
+            pickle.dump(content, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_pieces(path: Path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def reduce_partition(path: Path, levels) -> dict:
+    """
+    Reduced totals and accumulators of one spill partition, as the
+    `totals` and per-level `enrol` / `demo` / `bio` of a state
+    """
+    part = empty_state(levels)
+    del part["geo"], part["surge"]
+    totals = {source: [] for source in RAW_FILES}
+    frames = {level: {"enrol": [], "demo": [], "bio": []} for level in levels}
+
+    for piece in _load_pieces(path):
+        for source, series in piece["totals"].items():
+            totals[source].append(series)
+        for level, named in piece["levels"].items():
+            for name, df in named.items():
+                frames[level][name].append(df)
+
+    for source, parts in totals.items():
+        part["totals"][source] = (
+            pd.concat(parts).groupby(level=0, sort=True).sum()
+            if parts else pd.Series(dtype=np.int64, index=pd.Index([], dtype=np.int64))
+        )
+    for level, named in frames.items():
+        key = LEVELS[level]
+        ls = part["levels"][level]
+        part["levels"][level] = {
+            name: _sum_frames([ls[name]] + named[name], key) for name in named
+        }
+    return part
+
+
+def reduce_partials(partials, geo, levels, part_of_state, spill_dir: Path, state_dir: Path,
+                    on_partition=None) -> dict:
+    """
+    Incremental state (see `src.incremental`) from shard partials in
+    shard order, with forecasts and genomes for every series.
+
+    `partials` may be any iterable (e.g. loading spilled partials one
+    at a time). Each is growth-carried, split by reduce partition
+    (`part_of_state`, contiguous state id ranges) into spill files
+    under `spill_dir`, and dropped. The partitions are then reduced one
+    at a time: their series are refreshed, their granular rows are
+    streamed through the surge detector and passed to
+    `on_partition(granular, geo)`, and their totals and accumulators
+    are saved in `state_dir` as the state's partitions (see
+    `src.incremental.merge_partitions`). Only one partial or one
+    partition is held at a time, next to per-series tables (tails,
+    forecasts, genomes, surge statistics) and the state level
+    aggregates.
+    """
+    levels = list(levels)
+    state = empty_state(levels)
+    state["geo"] = geo
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+
+    for partial in partials:
+        for level, ls in state["levels"].items():
+            part = partial["levels"][level]
+            part["enrol"], ls["tails"] = carry_growth(part, LEVELS[level], ls["tails"])
+            del part["heads"], part["tails"]
+        _spill(partial, geo, part_of_state, spill_dir)
+        del partial
+
+    detector = SurgeDetector(geo.pincode_district, geo.district_state)
+    alerts, files = [], []
+    state_level = state["levels"]["state"]
+
+    for path in sorted(Path(spill_dir).glob("part-*.pkl")):
+        part = reduce_partition(path, levels)
+        path.unlink()
+
+        for level, ls in part["levels"].items():
+            refreshed = {**state["levels"][level], **ls}
+            # The partition's series are spliced into the stored tables
+            refresh_level(refreshed, LEVELS[level])
+            for name in ["forecast", "genome"]:
+                state["levels"][level][name] = refreshed[name]
+        # State level aggregates are small and feed the feature_dataset
+        for name in ["enrol", "demo", "bio"]:
+            state_level[name] = _sum_frames(
+                [state_level[name], part["levels"]["state"][name]], "state_id"
+            )
+
+        granular, _ = join_totals(
+            part["totals"]["enrolment"], part["totals"]["demographic"],
+            part["totals"]["biometric"], geo
+        )
+        # Pincodes of different partitions share no statistics or top-k
+        # group, so each partition streams its own history
+        last, detector.last_date = detector.last_date, None
+        alerts.append(stream_surges(detector, granular))
+        if last is not None and (detector.last_date is None or last > detector.last_date):
+            detector.last_date = last
+        if on_partition is not None:
+            on_partition(granular, geo)
+
+        files.append(save_partition(part, state_dir / path.name))
+        del part, granular
+
+    state["partitions"] = {"dir": state_dir.name, "files": files}
+    state["surge"] = {
+        "detector": detector,
+        "alerts": pd.concat(alerts, ignore_index=True) if alerts else pd.DataFrame(
+            {col: [] for col in ALERT_COLUMNS}
+        ),
+    }
+    return state
+
+
+def _in_shard_order(pool, workers: int, func, shards: list, *args):
+    """
+    Submit `func(shard, *args, out)` for every shard, at most two tasks
+    per worker at a time, and yield the loaded
+    partials in shard order as they complete. Results that finish early
+    wait on disk, not in memory.
+    """
+    futures, done, ready = {}, {}, 0
+    pending = iter(enumerate(shards))
+
+    def submit():
+        for i, files in pending:
+            out = Path(files["enrolment"]).parent / "partial.pkl"
+            futures[pool.submit(func, files, *args, out)] = i
+            return
+
+    for _ in range(2 * workers):
+        submit()
+
+    while futures:
+        finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in finished:
+            done[futures.pop(future)] = future.result()
+            submit()
+        while ready in done:
+            yield _load_partial(done.pop(ready))
+            ready += 1
+
+
+# ==================================================
+# DRIVER
+# ==================================================
+def run_out_of_core(
+    memory_mb: int,
+    shard_by: str = "state",
+    workers: int = 0,
+    levels=("state", "district", "pincode"),
+    paths: dict = None,
+    shard_root: Path = None,
+    state_dir: Path = None,
+    on_partition=None
+) -> dict:
+    """
+    Map-reduce build of the incremental state from raw files larger
+    than memory. Raw rows are streamed twice (scan, then spill into
+    shards by state or date range; a state larger than a shard is
+    split into date ranges). Each shard is aggregated by a worker and
+    its partial spilled to disk; partials are split into reduce
+    partitions of whole states sized to the budget and reduced one
+    partition at a time (see `reduce_partials`). Only one chunk or one
+    shard per worker, one partial or one partition, and per-series
+    tables are in memory at a time.
+
+    With `state_dir`, the key-date totals and accumulators stay there
+    as the returned state's partitions; otherwise they are merged into
+    the returned state.
+    """
+    paths = paths or {
+        source: DATA_PROCESSED / name for source, name in RAW_FILES.items()
+    }
+    plan = plan_shards(paths, memory_mb, workers)
+
+    geo, rows = scan_raw(paths, plan["chunksize"])
+    assignment = assign_shards(geo, rows, plan["shards"], shard_by)
+    split = len(assignment.get("split", {}))
+    print(
+        f"   {assignment['shards']} {shard_by} shards"
+        + (f" ({split} state(s) split into date ranges)" if split else "")
+        + f", {plan['chunksize']} rows per chunk, {max(workers, 1)} worker(s)"
+    )
+
+    part_of_state = assign_partitions(geo, rows, plan["partitions"])
+    print(f"   {int(part_of_state.max()) + 1} reduce partition(s)")
+
+    root = Path(shard_root or SHARD_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    out_dir = Path(tempfile.mkdtemp(dir=root))
+    spill_dir = out_dir / "reduce"
+    spill_dir.mkdir()
+    keep = state_dir is not None
+    state_dir = Path(state_dir or out_dir / "state")
+
+    try:
+        shards = partition_raw(paths, geo, assignment, plan["chunksize"], out_dir)
+
+        def reduce(partials):
+            return reduce_partials(
+                partials, geo, levels, part_of_state, spill_dir, state_dir, on_partition
+            )
+
+        if workers:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                state = reduce(_in_shard_order(pool, workers, map_shard, shards, geo, list(levels)))
+        else:
+            state = reduce(map_shard(files, geo, levels) for files in shards)
+
+        if not keep:
+            merge_partitions(state, state_dir)
+        return state
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
@@ -0,0 +1,206 @@
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Base project path
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SPILL_ROOT = BASE_DIR / "data" / "shards"
+
+
+# ==================================================
+# MEMORY-MAPPED FRAMES
+# ==================================================
+def _save(directory: Path, values: np.ndarray) -> str:
+    name = f"{uuid.uuid4().hex}.npy"
+    np.save(directory / name, values, allow_pickle=False)
+    return name
+
+
+def _load(directory: Path, name: str, rows: int) -> np.ndarray:
+    # Copy-on-write mapping: pages are shared until written. Empty
+    # arrays cannot be mapped.
+    return np.load(directory / name, mmap_mode="c" if rows else None, allow_pickle=False)
+
+
+def dump_frame(df: pd.DataFrame, directory: Path) -> dict:
+    """
+    Write a frame column by column as .npy files. Returns the small
+    picklable spec that `load_frame` maps back. Categorical and text
+    columns are stored as codes plus their categories.
+    """
+    directory = Path(directory)
+    index = None
+    if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+        index = list(df.index.names)
+        df = df.set_axis(
+            df.index.set_names([f"__index_{i}__" for i in range(len(index))]), axis=0
+        ).reset_index()
+
+    columns = []
+    for name in df.columns:
+        col = df[name]
+        dtype = col.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            columns.append((name, "category", _save(directory, col.cat.codes.to_numpy()),
+                            (col.cat.categories, col.cat.ordered)))
+        elif dtype == object or pd.api.types.is_string_dtype(dtype):
+            cat = pd.Categorical(col)
+            columns.append((name, "text", _save(directory, cat.codes), (cat.categories, dtype)))
+        elif isinstance(dtype, np.dtype) and dtype.kind in "biufmM":
+            columns.append((name, "array", _save(directory, col.to_numpy()), None))
+        else:
+            columns.append((name, "pickle", None, col))
+
+    return {"dir": str(directory), "rows": len(df), "columns": columns, "index": index}
+
+
+def load_frame(spec: dict) -> pd.DataFrame:
+    """
+    Frame from a `dump_frame` spec, with memory-mapped columns
+    """
+    directory, rows = Path(spec["dir"]), spec["rows"]
+    data = {}
+    for name, kind, file, extra in spec["columns"]:
+        if kind == "array":
+            data[name] = _load(directory, file, rows)
+        elif kind == "category":
+            categories, ordered = extra
+            data[name] = pd.Categorical.from_codes(
+                _load(directory, file, rows), categories, ordered=ordered
+            )
+        elif kind == "text":
+            categories, dtype = extra
+            data[name] = pd.Series(
+                pd.Categorical.from_codes(_load(directory, file, rows), categories)
+            ).astype(dtype)
+        else:
+            data[name] = extra.to_numpy()
+
+    df = pd.DataFrame(data, columns=[c[0] for c in spec["columns"]])
+    if spec["index"] is not None:
+        levels = [f"__index_{i}__" for i in range(len(spec["index"]))]
+        df = df.set_index(levels)
+        df.index = df.index.set_names(spec["index"])
+    return df
+
+
+def dump_value(value, directory: Path):
+    """
+    Replace the frames and series inside a (nested) dict, list or
+    tuple with their specs; anything else travels as is
+    """
+    if isinstance(value, pd.DataFrame):
+        return {"__frame__": dump_frame(value, directory)}
+    if isinstance(value, pd.Series):
+        return {"__series__": dump_frame(value.to_frame(), directory)}
+    if isinstance(value, dict):
+        return {k: dump_value(v, directory) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(dump_value(v, directory) for v in value)
+    return value
+
+
+def load_value(value):
+    if isinstance(value, dict):
+        if "__frame__" in value:
+            return load_frame(value["__frame__"])
+        if "__series__" in value:
+            return load_frame(value["__series__"]).iloc[:, 0]
+        return {k: load_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(load_value(v) for v in value)
+    return value
+
+
+@contextmanager
+def spill_dir(root: Path = None):
+    """
+    Scratch directory for memory-mapped transfers. Mapped arrays stay
+    valid after it is removed (POSIX keeps unlinked files alive while
+    mapped).
+    """
+    root = Path(root or SPILL_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    directory = Path(tempfile.mkdtemp(dir=root, prefix="spill-"))
+    try:
+        yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+# ==================================================
+# TASKS
+# ==================================================
+def _run_task(func, inputs, kwargs, out_dir):
+    result = func(**load_value(inputs), **kwargs)
+    task_dir = Path(tempfile.mkdtemp(dir=out_dir, prefix="out-"))
+    return dump_value(result, task_dir)
+
+
+def map_tasks(func, calls: list, workers: int, shared=None, **kwargs) -> list:
+    """
+    Run func(**shared, **call, **kwargs) for every call dict in a pool
+    of `workers` processes. Frames in `shared` and in the calls are
+    spilled to memory-mapped files once, and results come back the
+    same way; only specs are pickled. Results are in call order.
+    """
+    with spill_dir() as directory:
+        shared = dump_value(dict(shared or {}), directory)
+        calls = [{**shared, **dump_value(call, directory)} for call in calls]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            specs = list(pool.map(
+                _run_task,
+                [func] * len(calls), calls, [kwargs] * len(calls), [directory] * len(calls)
+            ))
+        return [load_value(spec) for spec in specs]
+
+
+# ==================================================
+# SHARDING BY KEY
+# ==================================================
+def shard_keys(frames, key: str, shards: int) -> list:
+    """
+    Key values split into at most `shards` groups with about equal row
+    counts: largest key first onto the lightest group, ties by key
+    """
+    counts = pd.concat([f[key].value_counts() for f in frames]).groupby(level=0).sum()
+    counts = counts.sort_index().sort_values(ascending=False, kind="mergesort")
+
+    load = np.zeros(min(shards, len(counts)), dtype=np.int64)
+    groups = [[] for _ in load]
+    for value, rows in counts.items():
+        target = int(np.argmin(load))
+        groups[target].append(value)
+        load[target] += rows
+    return [np.sort(np.asarray(g)) for g in groups]
+
+
+def _shard_task(func, shard_by, keys, kwargs, **frames):
+    frames = {
+        name: df[df[shard_by].isin(keys)].reset_index(drop=True)
+        for name, df in frames.items()
+    }
+    return func(**frames, **kwargs)
+
+
+def map_shards(func, frames: dict, shard_by: str, workers: int, **kwargs) -> list:
+    """
+    Run func(**frames_of_shard, **kwargs) per group of `shard_by` values
+    (see `shard_keys`) across a process pool. Each worker maps the
+    full frames and keeps the rows of its keys, in their original
+    order. Results come back in shard order; callers merge them
+    deterministically.
+    """
+    groups = shard_keys(frames.values(), shard_by, workers)
+    calls = [
+        {"func": func, "shard_by": shard_by, "keys": keys, "kwargs": kwargs}
+        for keys in groups
+    ]
+    return map_tasks(_shard_task, calls, workers, shared=frames)
@@ -0,0 +1,345 @@
+import functools
+import hashlib
+import inspect
+import json
+import pickle
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+# Base project path
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+CACHE_DIR = BASE_DIR / "data" / "cache"
+
+# Cached outputs kept per stage (older ones are pruned)
+KEEP_PER_STAGE = 3
+
+
+@dataclass
+class Stage:
+    """
+    One node of the pipeline graph.
+
+    `func` receives the values of `deps` positionally, then `params`
+    as keywords. `params` are part of the cache key; `options` are
+    passed too but do not change the result (e.g. worker counts).
+    `sink` publishes the value (artifacts) as sink(value, pipeline);
+    `sink_deps` names the values it reads through `pipeline.value`, so
+    a releasing run keeps them until the sink has run.
+    """
+    name: str
+    func: Callable
+    deps: list = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    options: dict = field(default_factory=dict)
+    files: Callable = None
+    sink: Callable = None
+    sink_deps: list = field(default_factory=list)
+    cache: bool = True
+
+
+def _hash(*parts) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(json.dumps(part, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def code_fingerprint() -> str:
+    """
+    Hash of the pipeline source; any code change invalidates the cache
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for path in sorted((BASE_DIR / "src").glob("*.py")):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _file_digest(path: str) -> str:
+    return hashlib.blake2b(Path(path).read_bytes(), digest_size=16).hexdigest()
+
+
+def func_fingerprint(func) -> str:
+    """
+    Hash of the file defining a stage function (e.g. run_aidsp.py),
+    which `code_fingerprint` does not cover
+    """
+    while isinstance(func, functools.partial):
+        func = func.func
+    try:
+        path = inspect.getsourcefile(func)
+    except TypeError:
+        path = None
+    return _file_digest(path) if path else ""
+
+
+class Pipeline:
+    """
+    Runs a declared stage graph with a content-hashed output cache.
+    A stage's key hashes its name, params, input file contents, the
+    code fingerprint, the source file of its function and the keys of its dependencies, so a stage is
+    recomputed only when something upstream of it changed.
+    An optional `monitor` (see `src.instrumentation.RunMonitor`)
+    measures every compute, cache load and publish step. With
+    `release`, a value is dropped from memory as soon as every stage
+    of the run that needs it has been evaluated. Sinks publish through
+    `writer` (see `src.artifact_store.SnapshotWriter`) when one is given;
+    their stamps are then recorded only by `mark_published`, once the
+    writer has committed. The writer carries over only the artifacts
+    of sinks that are up to date, or not part of this run, and drops
+    the rest of its current snapshot.
+    """
+
+    def __init__(
+        self,
+        stages,
+        cache_dir: Path = None,
+        use_cache: bool = True,
+        context: dict = None,
+        monitor=None,
+        release: bool = False,
+        writer=None
+    ):
+        self.stages = {s.name: s for s in stages}
+        self.cache_dir = Path(cache_dir or CACHE_DIR)
+        self.use_cache = use_cache
+        self.context = context or {}
+        self.monitor = monitor
+        self.release = release
+        self.writer = writer
+
+        self.status = {}
+        self._keys = {}
+        self._values = {}
+        self._consumers = {}
+        self._code = code_fingerprint()
+        self._fingerprints = self._load_json("fingerprints.json")
+        self._published = self._load_json("published.json")
+        self._staged = {}
+
+    # ==================================================
+    # CACHE BOOKKEEPING
+    # ==================================================
+    def _load_json(self, name: str) -> dict:
+        path = self.cache_dir / name
+        if path.exists():
+            with open(path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_json(self, name: str, data: dict):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_dir / name, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def file_fingerprint(self, path: Path) -> str:
+        """
+        Content hash of an input file, memoized on (size, mtime)
+        """
+        path = Path(path)
+        stat = path.stat()
+        seen = self._fingerprints.get(str(path))
+        if seen and seen["size"] == stat.st_size and seen["mtime"] == stat.st_mtime_ns:
+            return seen["hash"]
+
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+
+        self._fingerprints[str(path)] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "hash": h.hexdigest()
+        }
+        return h.hexdigest()
+
+    def _cache_path(self, name: str) -> Path:
+        return self.cache_dir / name / f"{self.key(name)}.pkl"
+
+    def _store(self, name: str, value):
+        path = self._cache_path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+        old = sorted(
+            path.parent.glob("*.pkl"),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True
+        )
+        for stale in old[KEEP_PER_STAGE:]:
+            stale.unlink()
+
+    def _measure(self, name: str, kind: str, inputs=None):
+        if self.monitor is None:
+            return nullcontext({})
+        return self.monitor.stage(name, kind=kind, inputs=inputs)
+
+    # ==================================================
+    # GRAPH EVALUATION
+    # ==================================================
+    def key(self, name: str) -> str:
+        if name not in self._keys:
+            stage = self.stages[name]
+            files = stage.files() if stage.files else []
+            self._keys[name] = _hash(
+                name,
+                self._code,
+                func_fingerprint(stage.func),
+                stage.params,
+                [self.file_fingerprint(p) for p in files],
+                [self.key(d) for d in stage.deps]
+            )
+        return self._keys[name]
+
+    def value(self, name: str):
+        """
+        Value of a stage: from memory, from cache, or computed
+        """
+        if name in self._values:
+            return self._values[name]
+
+        stage = self.stages[name]
+        path = self._cache_path(name)
+
+        if self.use_cache and stage.cache and path.exists():
+            with self._measure(name, "load") as record:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+                record["output"] = value
+            self.status[name] = "cached"
+        else:
+            args = [self.value(d) for d in stage.deps]
+            with self._measure(name, "compute", inputs=args) as record:
+                value = stage.func(*args, **stage.params, **stage.options)
+                record["output"] = value
+            self.status[name] = "computed"
+            if stage.cache:
+                with self._measure(name, "store"):
+                    self._store(name, value)
+
+        for d in stage.deps:
+            self._consumed(d)
+
+        self._values[name] = value
+        return value
+
+    def _consumed(self, name: str):
+        """
+        One consumer of `name` is done; release it after the last one
+        """
+        if name not in self._consumers:
+            return
+        self._consumers[name] -= 1
+        if self.release and self._consumers[name] <= 0:
+            self._values.pop(name, None)
+
+    def upstream(self, targets) -> list:
+        """
+        Targets plus everything they depend on, in dependency order
+        """
+        order = []
+
+        def visit(name):
+            if name in order:
+                return
+            for d in self.stages[name].deps:
+                visit(d)
+            order.append(name)
+
+        for t in targets:
+            visit(t)
+        return order
+
+    def _is_published(self, name: str, stamp: str) -> bool:
+        """
+        Whether `name` was published with this stamp and its artifacts
+        are still in the writer's current snapshot
+        """
+        entry = self._published.get(name)
+        if not isinstance(entry, dict) or entry.get("stamp") != stamp:
+            return False
+        if not self._cache_path(name).exists():
+            return False
+        return self.writer is None or all(
+            self.writer.is_published(artifact) for artifact in entry["artifacts"]
+        )
+
+    def mark_published(self):
+        """
+        Record the sinks of the last run as published. With a writer,
+        call this after its commit succeeded.
+        """
+        self._published.update(self._staged)
+        self._staged = {}
+        self._save_json("published.json", self._published)
+
+    def run(self, targets=None) -> dict:
+        """
+        Evaluate the target stages (default: every stage with a sink)
+        and publish their sinks. Dependencies are only loaded or
+        computed when a target has to be recomputed. A sink is skipped
+        when the same stage key was already published with the same
+        context and its artifacts are still there.
+        """
+        if targets is None:
+            targets = [n for n, s in self.stages.items() if s.sink is not None]
+
+        def sink_deps(name):
+            stage = self.stages[name]
+            return stage.sink_deps if stage.sink is not None else []
+
+        # Consumers per value in this run (a target also "consumes"
+        # itself when published, and its sink what it reads)
+        self._consumers = {}
+        for name in self.upstream(list(targets) + [d for t in targets for d in sink_deps(t)]):
+            for d in self.stages[name].deps:
+                self._consumers[d] = self._consumers.get(d, 0) + 1
+        for name in targets:
+            for d in [name] + sink_deps(name):
+                self._consumers[d] = self._consumers.get(d, 0) + 1
+
+        for name in targets:
+            stage = self.stages[name]
+
+            stamp = _hash(self.key(name), self.context)
+            if stage.sink is not None and self.use_cache and self._is_published(name, stamp):
+                self.status[name] = "up to date"
+                if self.writer is not None:
+                    self.writer.carry(self._published[name]["artifacts"])
+                for d in [name] + sink_deps(name):
+                    self._consumed(d)
+                continue
+
+            value = self.value(name)
+
+            if stage.sink is not None:
+                written = len(self.writer.written) if self.writer is not None else 0
+                with self._measure(name, "publish"):
+                    stage.sink(value, self)
+                self._staged[name] = {
+                    "stamp": stamp,
+                    "artifacts": self.writer.written[written:] if self.writer is not None else [],
+                }
+            for d in [name] + sink_deps(name):
+                self._consumed(d)
+
+        # Sinks left out of a partial run keep what they last published
+        if self.writer is not None:
+            for name, stage in self.stages.items():
+                entry = self._published.get(name)
+                if stage.sink is not None and name not in targets and isinstance(entry, dict):
+                    self.writer.carry(entry["artifacts"])
+
+        self._save_json("fingerprints.json", self._fingerprints)
+        if self.writer is None:
+            self.mark_published()
+
+        return self.status
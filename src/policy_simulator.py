@@ -1,5 +1,10 @@
+from dataclasses import dataclass
+
+import numpy as np
 import pandas as pd
 
+SCENARIO_COLUMNS = ["intensity", "budget", "rollout"]
+
 
 def apply_policy_scenarios(
     forecast_df: pd.DataFrame,
@@ -19,3 +24,138 @@ def apply_policy_scenarios(
     df['high_intervention'] = df['predicted_risk_score'] * high_factor
 
     return df
+
+
+# ==================================================
+# SCENARIO GRID
+# ==================================================
+def scenario_grid(
+    intensities=(0.1, 0.2, 0.3, 0.4, 0.5),
+    budgets=(np.inf,),
+    rollouts=(1.0,)
+) -> pd.DataFrame:
+    """
+    Every combination of intervention intensity (fraction of risk
+    removed), budget cap (intervention units, see `evaluate_scenarios`)
+    and rollout (fraction of the effect realised so far)
+    """
+    mesh = np.meshgrid(
+        np.asarray(intensities, dtype=np.float64),
+        np.asarray(budgets, dtype=np.float64),
+        np.asarray(rollouts, dtype=np.float64),
+        indexing="ij"
+    )
+    scenarios = pd.DataFrame({
+        col: values.ravel() for col, values in zip(SCENARIO_COLUMNS, mesh)
+    })
+    scenarios.index.name = "scenario"
+    return scenarios
+
+
+@dataclass
+class ScenarioCube:
+    """
+    Simulated risk for every scenario (rows) and key (columns), with
+    per-scenario totals in `scenarios`
+    """
+    scenarios: pd.DataFrame
+    keys: np.ndarray
+    baseline: np.ndarray
+    risk: np.ndarray
+    key: str = "state"
+
+    def top(self, n: int = 10, by: str = "risk_reduction") -> pd.DataFrame:
+        """
+        The n scenarios with the largest `by`, best first
+        """
+        values = self.scenarios[by].to_numpy()
+        n = min(n, len(values))
+        if n == 0:
+            return self.scenarios.iloc[:0]
+
+        # Partitioning picks arbitrarily among ties with the n-th value;
+        # take them all so that ties keep scenario order
+        cutoff = values[np.argpartition(-values, n - 1)[n - 1]]
+        best = np.flatnonzero(values >= cutoff)
+        best = best[np.lexsort((best, -values[best]))][:n]
+        return self.scenarios.iloc[best]
+
+    def frame(self, scenarios=None) -> pd.DataFrame:
+        """
+        Long (scenario, key) table of simulated risk for the given
+        scenario ids (default: all)
+        """
+        rows = (
+            np.arange(len(self.scenarios)) if scenarios is None
+            else self.scenarios.index.get_indexer(scenarios)
+        )
+        return pd.DataFrame({
+            "scenario": np.repeat(self.scenarios.index.to_numpy()[rows], len(self.keys)),
+            self.key: np.tile(self.keys, len(rows)),
+            "predicted_risk_score": np.tile(self.baseline, len(rows)),
+            "simulated_risk_score": self.risk[rows].ravel(),
+        })
+
+
+# ==================================================
+# BATCHED EVALUATION
+# ==================================================
+def evaluate_scenarios(
+    forecast_df: pd.DataFrame,
+    scenarios: pd.DataFrame,
+    key: str = "state",
+    weights=None,
+    cost=None
+) -> ScenarioCube:
+    """
+    Evaluate all scenarios against the forecast in one broadcast.
+
+    A key's intensity is the scenario intensity times its weight
+    (a Series by key, or a scenarios x keys array), clipped to [0, 1].
+    Treating a key costs `cost` (default 1) times that intensity; keys
+    are treated in descending forecast risk while the running cost fits
+    the scenario budget. Treated risk becomes
+    risk * (1 - intensity * rollout).
+    """
+    keys = forecast_df[key].to_numpy()
+    risk = forecast_df["predicted_risk_score"].to_numpy(np.float64)
+
+    # Highest forecast risk is funded first
+    order = np.argsort(-risk, kind="mergesort")
+    keys, risk = keys[order], risk[order]
+
+    intensity = scenarios["intensity"].to_numpy(np.float64)[:, None]
+    if weights is not None:
+        if isinstance(weights, pd.Series):
+            weights = weights.reindex(keys).fillna(1.0).to_numpy(np.float64)
+        else:
+            weights = np.asarray(weights, dtype=np.float64)[..., order]
+        intensity = intensity * weights
+    intensity = np.clip(np.broadcast_to(intensity, (len(scenarios), len(keys))), 0, 1)
+
+    unit_cost = (
+        np.ones(len(keys)) if cost is None
+        else pd.Series(cost).reindex(keys).fillna(1.0).to_numpy(np.float64)
+    )
+    spend = np.cumsum(intensity * unit_cost, axis=1)
+    budget = scenarios["budget"].to_numpy(np.float64)[:, None]
+    treated = spend <= budget + 1e-9
+
+    effect = intensity * scenarios["rollout"].to_numpy(np.float64)[:, None]
+    simulated = risk * (1 - np.where(treated, effect, 0))
+
+    reduction = risk.sum() - simulated.sum(axis=1)
+    summary = scenarios.copy()
+    summary["treated"] = treated.sum(axis=1)
+    summary["spend"] = np.where(treated, intensity * unit_cost, 0).sum(axis=1)
+    summary["total_risk"] = simulated.sum(axis=1)
+    summary["risk_reduction"] = reduction
+    summary["reduction_pct"] = reduction / risk.sum() * 100 if risk.sum() else 0.0
+
+    return ScenarioCube(
+        scenarios=summary,
+        keys=keys,
+        baseline=risk,
+        risk=simulated.astype(np.float32),
+        key=key
+    )
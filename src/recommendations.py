@@ -0,0 +1,43 @@
+import math
+
+
+def generate_recommendation(row):
+    """
+    (risk level, intervention, rationale) for a row with a
+    `predicted_risk_score`
+    """
+    risk = row["predicted_risk_score"]
+    if risk < 0.4:
+        return "Low Operational Risk", "Low Intervention", "Normal operational patterns observed"
+    elif risk < 0.7:
+        return "Moderate Operational Risk", "Medium Intervention", "Sustained increase in updates"
+    else:
+        return "High Operational Risk", "High Intervention", "Sharp activity surge detected"
+
+
+def model_confidence(rows):
+    """
+    Confidence label from the number of activity records behind a score
+    """
+    if rows > 5000:
+        return "High Confidence"
+    elif rows > 1000:
+        return "Medium Confidence"
+    else:
+        return "Low Confidence"
+
+
+def recommendation_fields(row, records=None) -> dict:
+    """
+    Recommendation and confidence as named fields; empty (None) when
+    the score or the record count is missing
+    """
+    risk = row.get("predicted_risk_score")
+    scored = risk is not None and not math.isnan(risk)
+    level, action, reason = generate_recommendation(row) if scored else (None, None, None)
+    return {
+        "risk_level": level,
+        "intervention": action,
+        "rationale": reason,
+        "confidence": model_confidence(records) if records is not None else None,
+    }
@@ -0,0 +1,422 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from src.artifact_store import (
+    artifact_dir,
+    artifact_exists,
+    current_snapshot,
+    read_artifact,
+    MANIFEST_FILE,
+)
+from src.recommendations import recommendation_fields
+
+# Base project path
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+RESULTS_DIR = BASE_DIR / "results"
+
+# Pipeline output per level and the keys that identify a row
+LEVEL_OUTPUTS = {
+    "state": "final_policy_output",
+    "district": "final_policy_output_district",
+    "pincode": "final_policy_output_pincode",
+}
+LEVEL_KEYS = {
+    "state": ["state"],
+    "district": ["state", "district"],
+    "pincode": ["state", "district", "pincode"],
+}
+
+CACHE_SIZE = 4096
+MAX_BATCH = 1000
+
+
+class QueryError(ValueError):
+    pass
+
+
+# ==================================================
+# SNAPSHOT
+# ==================================================
+def _output_path(name: str, root: Path = None, results_dir: Path = None) -> Path:
+    if artifact_exists(name, root):
+        return artifact_dir(name, root) / MANIFEST_FILE
+    return Path(results_dir or RESULTS_DIR) / f"{name}.csv"
+
+
+def _read_output(name: str, root: Path = None, results_dir: Path = None):
+    """
+    A pipeline output from the artifact store, else its CSV export
+    """
+    if artifact_exists(name, root):
+        return read_artifact(name, root=root)
+    path = Path(results_dir or RESULTS_DIR) / f"{name}.csv"
+    return pd.read_csv(path) if path.exists() else None
+
+
+def snapshot_signature(root: Path = None, results_dir: Path = None) -> str:
+    """
+    The published artifact snapshot's version; for outputs written
+    before snapshots, a short hash of the modification times of every
+    output a snapshot reads. Changes whenever the pipeline publishes.
+    """
+    current = current_snapshot(root)
+    if current is not None:
+        return current.name
+
+    names = list(LEVEL_OUTPUTS.values()) + [f"rollup_{level}" for level in LEVEL_KEYS]
+    h = hashlib.blake2b(digest_size=6)
+    for name in names:
+        path = _output_path(name, root, results_dir)
+        stamp = path.stat().st_mtime_ns if path.exists() else 0
+        h.update(f"{name}:{stamp};".encode())
+    return h.hexdigest()
+
+
+def _key(level: str, values) -> tuple:
+    # Names match case-insensitively; pincodes as integers
+    return tuple(
+        int(v) if col == "pincode" else str(v).strip().casefold()
+        for col, v in zip(LEVEL_KEYS[level], values)
+    )
+
+
+def _json_records(df: pd.DataFrame) -> list:
+    # Plain Python values, NaN as None
+    return json.loads(df.to_json(orient="records", date_format="iso", double_precision=15))
+
+
+class Snapshot:
+    """
+    One immutable load of the pipeline's policy outputs: every row as a
+    ready JSON-able record in a dictionary per level, plus a pincode
+    index for lookups without state and district. Never modified after
+    construction, so requests can share it without locks.
+    """
+
+    def __init__(self, outputs: dict, records: dict, version: str):
+        self.version = version
+        self.loaded = time.time()
+        self.index = {}
+        self.pincodes = {}
+
+        for level, df in outputs.items():
+            keys = LEVEL_KEYS[level]
+            counts = records.get(level)
+            table = {}
+            for row in _json_records(df):
+                key = _key(level, [row[c] for c in keys])
+                n = counts.get(key) if counts is not None else None
+                table[key] = {
+                    "level": level,
+                    **row,
+                    **recommendation_fields(row, n),
+                    "records": n,
+                }
+                if level == "pincode":
+                    self.pincodes.setdefault(key[-1], []).append(key)
+            self.index[level] = table
+
+    @classmethod
+    def load(cls, root: Path = None, results_dir: Path = None) -> "Snapshot":
+        # Every output from the same published snapshot
+        pinned = current_snapshot(root)
+        version = pinned.name if pinned is not None else snapshot_signature(root, results_dir)
+        root = pinned or root
+
+        outputs, records = {}, {}
+        for level, name in LEVEL_OUTPUTS.items():
+            df = _read_output(name, root, results_dir)
+            if df is None:
+                continue
+            outputs[level] = df
+
+            rollup = _read_output(f"rollup_{level}", root, results_dir)
+            if rollup is not None:
+                keys = LEVEL_KEYS[level]
+                totals = rollup.groupby(keys, sort=False, observed=True)["records"].sum()
+                records[level] = {
+                    _key(level, k if isinstance(k, tuple) else (k,)): int(n)
+                    for k, n in totals.items()
+                }
+
+        if "state" not in outputs:
+            raise FileNotFoundError("No policy output found. Run the pipeline first.")
+        return cls(outputs, records, version)
+
+    def keys(self, level: str) -> list:
+        if level not in LEVEL_KEYS:
+            raise QueryError(f"unknown level {level!r}")
+        cols = LEVEL_KEYS[level]
+        return [
+            {c: record[c] for c in cols}
+            for record in self.index.get(level, {}).values()
+        ]
+
+    def lookup(self, query: dict) -> list:
+        """
+        Records matching a query of state / district / pincode. The
+        deepest key given picks the level; a pincode matches every
+        state and district that has it, narrowed by whichever of the
+        two are given.
+        """
+        unknown = set(query) - {"state", "district", "pincode"}
+        if unknown:
+            raise QueryError(f"unknown fields {sorted(unknown)}")
+
+        state, district, pincode = (query.get(c) for c in ["state", "district", "pincode"])
+        if pincode is not None:
+            try:
+                pincode = int(pincode)
+            except (TypeError, ValueError):
+                raise QueryError(f"bad pincode {pincode!r}") from None
+
+            table = self.index.get("pincode", {})
+            found = self.pincodes.get(pincode, [])
+            if state is not None:
+                found = [k for k in found if k[0] == _key("state", [state])[0]]
+            if district is not None:
+                found = [k for k in found if k[1] == _key("district", ["", district])[1]]
+        elif district is not None:
+            if state is None:
+                raise QueryError("district lookups need a state")
+            table = self.index.get("district", {})
+            found = [_key("district", [state, district])]
+        elif state is not None:
+            table = self.index["state"]
+            found = [_key("state", [state])]
+        else:
+            raise QueryError("query needs a state, district or pincode")
+
+        return [table[k] for k in found if k in table]
+
+
+# ==================================================
+# RESPONSE CACHE
+# ==================================================
+class LRUCache:
+    """
+    Bounded least-recently-used map of encoded responses
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses,
+            }
+
+
+# ==================================================
+# SERVICE
+# ==================================================
+class RiskService:
+    """
+    Serves lookups from the current `Snapshot`. A reload builds the new
+    snapshot (and a fresh cache) off to the side and swaps one
+    reference, so requests in flight finish on the snapshot they
+    started with and none wait for the load.
+    """
+
+    def __init__(self, root: Path = None, results_dir: Path = None, cache_size: int = CACHE_SIZE):
+        self.root = root
+        self.results_dir = results_dir
+        self.cache_size = cache_size
+        self._reload_lock = threading.Lock()
+        self._current = (Snapshot.load(root, results_dir), LRUCache(cache_size))
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._current[0]
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Swap in a new snapshot if the outputs changed. Returns whether
+        it did.
+        """
+        with self._reload_lock:
+            if not force and snapshot_signature(self.root, self.results_dir) == self.snapshot.version:
+                return False
+            self._current = (Snapshot.load(self.root, self.results_dir), LRUCache(self.cache_size))
+            return True
+
+    def watch(self, interval: float) -> threading.Thread:
+        """
+        Background thread reloading whenever the outputs change
+        """
+        def poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.reload():
+                        print(f" Risk service: loaded snapshot {self.snapshot.version}")
+                except Exception as exc:  # keep serving the old snapshot
+                    print(f" Risk service: reload failed ({exc})")
+
+        thread = threading.Thread(target=poll, name="snapshot-watch", daemon=True)
+        thread.start()
+        return thread
+
+    def _answer(self, snapshot, cache, query: dict):
+        if not isinstance(query, dict):
+            raise QueryError(f"a lookup must be an object, not {query!r}")
+        key = tuple(sorted((k, str(v)) for k, v in query.items() if v is not None))
+        answer = cache.get(key)
+        if answer is None:
+            matches = snapshot.lookup(query)
+            answer = (bool(matches), json.dumps({"query": query, "matches": matches}).encode())
+            cache.put(key, answer)
+        return answer
+
+    def query(self, query: dict):
+        """
+        (found, encoded response) for one lookup
+        """
+        snapshot, cache = self._current
+        return self._answer(snapshot, cache, query)
+
+    def batch(self, queries: list) -> bytes:
+        """
+        One response for many lookups, all from the same snapshot
+        """
+        if not isinstance(queries, list) or len(queries) > MAX_BATCH:
+            raise QueryError(f"queries must be a list of at most {MAX_BATCH} lookups")
+        snapshot, cache = self._current
+        parts = [self._answer(snapshot, cache, q)[1] for q in queries]
+        return (
+            f'{{"version": "{snapshot.version}", "results": ['.encode()
+            + b", ".join(parts) + b"]}"
+        )
+
+    def health(self) -> dict:
+        snapshot, cache = self._current
+        return {
+            "version": snapshot.version,
+            "loaded": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(snapshot.loaded)),
+            "rows": {level: len(table) for level, table in snapshot.index.items()},
+            "cache": cache.stats(),
+        }
+
+
+# ==================================================
+# HTTP
+# ==================================================
+class RiskHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health
+    GET  /risk?state=..&district=..&pincode=..
+    GET  /keys?level=state|district|pincode
+    POST /risk/batch   {"queries": [{"state": ..}, ..]}
+    POST /reload
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes on keep-alive
+    # connections; without TCP_NODELAY each response waits on the
+    # client's delayed ACK
+    disable_nagle_algorithm = True
+    service: RiskService = None
+    verbose = False
+
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, value):
+        self._send(status, json.dumps(value).encode())
+
+    def _handle(self, route):
+        try:
+            status, body = route()
+        except QueryError as exc:
+            status, body = 400, json.dumps({"error": str(exc)}).encode()
+        self._send(status, body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if url.path == "/health":
+            self._send_json(200, self.service.health())
+        elif url.path == "/risk":
+            def route():
+                found, body = self.service.query(params)
+                return (200 if found else 404), body
+            self._handle(route)
+        elif url.path == "/keys":
+            self._handle(lambda: (
+                200, json.dumps(self.service.snapshot.keys(params.get("level", "state"))).encode()
+            ))
+        else:
+            self._send_json(404, {"error": f"no route {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        if url.path == "/risk/batch":
+            def route():
+                try:
+                    payload = json.loads(raw or b"{}")
+                except json.JSONDecodeError as exc:
+                    raise QueryError(f"invalid JSON: {exc}") from None
+                if not isinstance(payload, dict):
+                    raise QueryError('expected {"queries": [...]}')
+                return 200, self.service.batch(payload.get("queries"))
+            self._handle(route)
+        elif url.path == "/reload":
+            swapped = self.service.reload(force=True)
+            self._send_json(200, {"reloaded": swapped, **self.service.health()})
+        else:
+            self._send_json(404, {"error": f"no route {url.path}"})
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(service: RiskService, host: str = "127.0.0.1", port: int = 8765,
+                verbose: bool = False) -> ThreadingHTTPServer:
+    """
+    Threaded HTTP server bound to `service` (port 0 picks a free port)
+    """
+    handler = type("Handler", (RiskHandler,), {"service": service, "verbose": verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+MEASURES = ["enrolment", "biometric", "demographic"]
+
+# Rollup level -> geography keys (encoded)
+ROLLUP_KEYS = {
+    "state": ["state_id"],
+    "district": ["state_id", "district_id"],
+    "pincode": ["state_id", "district_id", "pincode_id"],
+}
+
+
+def build_rollups(granular: pd.DataFrame) -> dict:
+    """
+    Monthly activity sums and record counts per state, district and
+    pincode from the encoded granular table
+    """
+    df = granular[ROLLUP_KEYS["pincode"] + MEASURES].copy()
+    df["month"] = granular["date"].to_numpy().astype("datetime64[M]").astype("datetime64[ns]")
+
+    rollups = {}
+    for level, keys in ROLLUP_KEYS.items():
+        grouped = df.groupby(keys + ["month"], sort=True, observed=True)
+        rollup = grouped[MEASURES].sum()
+        rollup["records"] = grouped.size()
+        rollups[level] = rollup.reset_index()
+
+    return rollups
+
+
+class _Level:
+    """
+    One rollup level sorted by (keys, month) with per-key row ranges
+    and running sums, so any month-range total is two lookups.
+    """
+
+    def __init__(self, df: pd.DataFrame, keys: list):
+        df = df.sort_values(keys + ["month"], kind="mergesort").reset_index(drop=True)
+        self.frame = df
+        self.keys = keys
+        self.months = df["month"].to_numpy()
+
+        values = df[MEASURES + ["records"]].to_numpy(np.int64)
+        self.cumsum = np.vstack([np.zeros((1, values.shape[1]), np.int64), values.cumsum(axis=0)])
+
+        key_values = list(zip(*[df[k].to_numpy() for k in keys]))
+
+        # Row ranges of each key (frame is sorted by keys)
+        change = np.zeros(max(len(df) - 1, 0), dtype=bool)
+        for k in keys:
+            col = df[k].to_numpy()
+            change |= col[1:] != col[:-1]
+        starts = np.flatnonzero(np.r_[len(df) > 0, change])
+        ends = np.r_[starts[1:], len(df)]
+
+        self.ranges = {
+            key_values[lo]: (lo, hi) for lo, hi in zip(starts, ends)
+        }
+
+    def window(self, key, start, end):
+        """
+        Row range of `key` whose months fall in [start, end]
+        """
+        lo, hi = self.ranges.get(key, (0, 0))
+        months = self.months[lo:hi]
+        a = lo + np.searchsorted(months, np.datetime64(start), side="left")
+        b = lo + np.searchsorted(months, np.datetime64(end), side="right")
+        return a, b
+
+    def totals(self, key, start, end) -> dict:
+        a, b = self.window(key, start, end)
+        sums = self.cumsum[b] - self.cumsum[a]
+        return dict(zip(MEASURES + ["records"], sums.tolist()))
+
+
+class RollupIndex:
+    """
+    In-memory lookup over decoded monthly rollups
+    (columns: state[, district[, pincode]], month, measures, records)
+    """
+
+    def __init__(self, rollups: dict):
+        self.state = _Level(rollups["state"], ["state"])
+        self.district = _Level(rollups["district"], ["state", "district"])
+        self.pincode = _Level(rollups["pincode"], ["state", "district", "pincode"])
+
+        self._districts_of = {}
+        for state, district in self.district.ranges:
+            self._districts_of.setdefault(state, []).append(district)
+
+        # Pincode rows are sorted by (state, district), so each district
+        # is one contiguous block
+        self._pincode_blocks = {}
+        for (state, district, _), (lo, hi) in self.pincode.ranges.items():
+            block = self._pincode_blocks.get((state, district))
+            self._pincode_blocks[(state, district)] = (block[0] if block else lo, hi)
+
+    def states(self) -> list:
+        return sorted(s for (s,) in self.state.ranges)
+
+    def date_bounds(self):
+        months = self.state.months
+        return pd.Timestamp(months.min()), pd.Timestamp(months.max())
+
+    def state_totals(self, state, start, end) -> dict:
+        return self.state.totals((state,), start, end)
+
+    def districts(self, state, start, end) -> list:
+        """
+        Districts of `state` with any activity record in the period
+        """
+        found = []
+        for district in self._districts_of.get(state, []):
+            a, b = self.district.window((state, district), start, end)
+            if b > a:
+                found.append(district)
+        return sorted(found)
+
+    def district_totals(self, state, district, start, end) -> dict:
+        return self.district.totals((state, district), start, end)
+
+    def pincode_table(self, state, district, start, end) -> pd.DataFrame:
+        """
+        Per-pincode activity of one district in the period
+        """
+        lo, hi = self._pincode_blocks.get((state, district), (0, 0))
+        block = self.pincode.frame.iloc[lo:hi]
+        block = block[(block["month"] >= start) & (block["month"] <= end)]
+
+        # Sum in int64 whatever the stored width (see `src.compact`)
+        pin = (
+            block.astype({col: np.int64 for col in MEASURES})
+            .groupby("pincode", sort=True)[MEASURES].sum()
+            .reset_index()
+        )
+        pin["total_activity"] = pin[MEASURES].sum(axis=1)
+        return pin
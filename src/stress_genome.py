@@ -1,54 +1,80 @@
 import pandas as pd
 import numpy as np
 
-
-def compute_stress_genome(features_df: pd.DataFrame) -> pd.DataFrame:
+GENOME_COLUMNS = [
+    "growth_volatility",
+    "update_burden",
+    "age_pressure",
+    "recovery_speed",
+]
+
+
+def compute_stress_genome(
+    features_df: pd.DataFrame,
+    key: str = "state",
+    normalize: bool = True
+) -> pd.DataFrame:
     """
-    Compute Aadhaar Stress Genome for each state
+    Compute Aadhaar Stress Genome for each state.
+    `key` is the state grouping column (name or encoded `state_id`),
+    or any finer geography id such as `district_id`.
     """
 
-    df = features_df.copy()
-
-    genome_rows = []
-
-    for state, sdf in df.groupby("state"):
-        # Sort by time
-        sdf = sdf.sort_values("date")
+    # Sort by time within each series
+    df = features_df.sort_values([key, "date"])
+
+    risk_diff = (
+        df.groupby(key, sort=False, observed=True)["risk_score"]
+        .diff()
+        .abs()
+    )
+
+    stats = (
+        df[[key, "monthly_growth", "demo_update_pressure",
+            "biometric_update_pressure", "youth_ratio"]]
+        .assign(risk_diff=risk_diff)
+        .groupby(key, sort=True, observed=True)
+        .agg(
+            growth_std=("monthly_growth", "std"),
+            demo_mean=("demo_update_pressure", "mean"),
+            bio_mean=("biometric_update_pressure", "mean"),
+            youth_mean=("youth_ratio", "mean"),
+            risk_diff_mean=("risk_diff", "mean")
+        )
+    )
 
+    genome_df = pd.DataFrame({
+        key: stats.index.to_numpy(),
         # 1. Growth Volatility (std of growth)
-        growth_volatility = sdf["monthly_growth"].std()
-
+        "growth_volatility": stats["growth_std"].to_numpy(),
         # 2. Update Burden (mean pressure)
-        update_burden = (
-            sdf["demo_update_pressure"].mean() +
-            sdf["biometric_update_pressure"].mean()
-        )
-
+        "update_burden": (stats["demo_mean"] + stats["bio_mean"]).to_numpy(),
         # 3. Age Pressure (youth dominance)
-        age_pressure = sdf["youth_ratio"].mean()
-
+        "age_pressure": stats["youth_mean"].to_numpy(),
         # 4. Recovery Speed (how fast risk drops)
-        risk_diff = sdf["risk_score"].diff().abs()
-        recovery_speed = 1 / (risk_diff.mean() + 1e-6)
-
-        genome_rows.append({
-            "state": state,
-            "growth_volatility": growth_volatility,
-            "update_burden": update_burden,
-            "age_pressure": age_pressure,
-            "recovery_speed": recovery_speed
-        })
-
-    genome_df = pd.DataFrame(genome_rows)
-
-    # Normalize all genome dimensions (0–1)
-    for col in genome_df.columns:
-        if col != "state":
-            min_v = genome_df[col].min()
-            max_v = genome_df[col].max()
-            genome_df[col] = (genome_df[col] - min_v) / (max_v - min_v + 1e-6)
+        "recovery_speed": 1 / (stats["risk_diff_mean"].to_numpy() + 1e-6)
+    })
+
+    if normalize:
+        genome_df = normalize_genome(genome_df)
 
     return genome_df
+
+
+def normalize_genome(genome_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Min-max normalize all genome dimensions (0–1)
+    """
+    df = genome_df.copy()
+
+    values = df[GENOME_COLUMNS]
+    min_v = values.min()
+    max_v = values.max()
+    df[GENOME_COLUMNS] = (values - min_v) / (max_v - min_v + 1e-6)
+
+    return df
+
+
 def assign_archetypes(genome_df: pd.DataFrame) -> pd.DataFrame:
     """
     Assign behavioral archetypes to states based on stress genome
@@ -56,16 +82,23 @@ def assign_archetypes(genome_df: pd.DataFrame) -> pd.DataFrame:
 
     df = genome_df.copy()
 
-    def classify(row):
-        if row["growth_volatility"] > 0.6 and row["recovery_speed"] < 0.4:
-            return "Volatile Grower"
-        elif row["update_burden"] > 0.6 and row["recovery_speed"] < 0.4:
-            return "Structurally Burdened"
-        elif row["update_burden"] > 0.6 and row["recovery_speed"] >= 0.6:
-            return "Resilient High-Load"
-        else:
-            return "Stable Low-Risk"
-
-    df["archetype"] = df.apply(classify, axis=1)
+    volatility = df["growth_volatility"].to_numpy()
+    burden = df["update_burden"].to_numpy()
+    recovery = df["recovery_speed"].to_numpy()
+
+    # Rules are checked in order; the first match wins
+    df["archetype"] = np.select(
+        [
+            (volatility > 0.6) & (recovery < 0.4),
+            (burden > 0.6) & (recovery < 0.4),
+            (burden > 0.6) & (recovery >= 0.6),
+        ],
+        [
+            "Volatile Grower",
+            "Structurally Burdened",
+            "Resilient High-Load",
+        ],
+        default="Stable Low-Risk"
+    )
 
     return df
@@ -0,0 +1,294 @@
+import numpy as np
+import pandas as pd
+
+from src.rollups import MEASURES
+
+# EWMA span (days of observations) of the per-pincode baseline
+EWMA_SPAN = 14
+
+# A day is a surge when, after at least MIN_HISTORY observations, its
+# activity is Z_THRESHOLD deviations above the baseline and at least
+# MIN_ACTIVITY in absolute terms
+MIN_HISTORY = 7
+Z_THRESHOLD = 4.0
+MIN_ACTIVITY = 20
+
+TOP_K = 10
+
+TOPK_KINDS = ["concentration", "anomaly"]
+
+
+# ==================================================
+# BOUNDED TOP-K
+# ==================================================
+class TopK:
+    """
+    The k highest-scoring ids of every group, best first, as (groups, k)
+    arrays. An id keeps its best score. Batches are merged only for
+    candidates above the group's current k-th score, so after warm-up
+    most rows are rejected by one comparison and reading a group's
+    top-k never sorts its members.
+    """
+
+    def __init__(self, groups: int, k: int = TOP_K):
+        self.k = k
+        self.ids = np.full((groups, k), -1, dtype=np.int64)
+        self.scores = np.full((groups, k), -np.inf)
+
+    def push(self, group: np.ndarray, ids: np.ndarray, scores: np.ndarray):
+        # Strictly better than the k-th entry (ties keep the holder)
+        keep = scores > self.scores[group, -1]
+        if not keep.any():
+            return
+        group, ids, scores = group[keep], ids[keep], scores[keep]
+
+        touched = np.unique(group)
+        g = np.concatenate([np.repeat(touched, self.k), group])
+        i = np.concatenate([self.ids[touched].ravel(), ids])
+        s = np.concatenate([self.scores[touched].ravel(), scores])
+        held = i >= 0
+        g, i, s = g[held], i[held], s[held]
+
+        # Best score per (group, id)
+        order = np.lexsort((-s, i, g))
+        g, i, s = g[order], i[order], s[order]
+        first = np.r_[True, (g[1:] != g[:-1]) | (i[1:] != i[:-1])]
+        g, i, s = g[first], i[first], s[first]
+
+        # Rank within group: score descending, id ascending
+        order = np.lexsort((i, -s, g))
+        g, i, s = g[order], i[order], s[order]
+        starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+        rank = np.arange(len(g)) - np.repeat(starts, np.diff(np.r_[starts, len(g)]))
+        top = rank < self.k
+
+        self.ids[touched] = -1
+        self.scores[touched] = -np.inf
+        self.ids[g[top], rank[top]] = i[top]
+        self.scores[g[top], rank[top]] = s[top]
+
+    def extend(self, groups: int, group_map: np.ndarray, id_map: np.ndarray):
+        """
+        Move onto extended group and id ranges, given monotonic
+        old -> new maps (so ties keep their order)
+        """
+        ids = np.full((groups, self.k), -1, dtype=np.int64)
+        scores = np.full((groups, self.k), -np.inf)
+        held = self.ids >= 0
+        ids[group_map] = np.where(held, id_map[np.where(held, self.ids, 0)], -1)
+        scores[group_map] = self.scores
+        self.ids, self.scores = ids, scores
+
+    def group(self, group: int):
+        """
+        (ids, scores) of one group, best first
+        """
+        held = self.ids[group] >= 0
+        return self.ids[group][held], self.scores[group][held]
+
+    def frame(self, group_col: str, id_col: str) -> pd.DataFrame:
+        groups, rank = np.nonzero(self.ids >= 0)
+        return pd.DataFrame({
+            group_col: groups,
+            "rank": rank + 1,
+            id_col: self.ids[groups, rank],
+            "score": self.scores[groups, rank],
+        })
+
+
+# ==================================================
+# ONLINE PINCODE STATISTICS
+# ==================================================
+class SurgeDetector:
+    """
+    Per-pincode streaming state fed one day of activity at a time:
+    observation count, running total and an exponentially weighted
+    mean / variance as the surge baseline.
+    Every update is O(1) per row; the top-k tables keep the most
+    concentrated (cumulative activity) and most anomalous (peak z)
+    pincodes per district and state. `last_date` is the latest day
+    folded in, so a stored detector can continue with later days.
+    """
+
+    def __init__(self, pincode_district, district_state, span: int = EWMA_SPAN, k: int = TOP_K):
+        self.pincode_district = np.asarray(pincode_district)
+        self.district_state = np.asarray(district_state)
+        self.alpha = 2.0 / (span + 1)
+        self.last_date = None
+
+        n = len(self.pincode_district)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.total = np.zeros(n, dtype=np.int64)
+        self.ewma = np.zeros(n)
+        self.ewvar = np.zeros(n)
+        self.peak_z = np.full(n, -np.inf)
+
+        groups = {"district": len(self.district_state), "state": int(self.district_state.max()) + 1}
+        self.topk = {
+            (level, kind): TopK(size, k)
+            for level, size in groups.items() for kind in TOPK_KINDS
+        }
+
+    def update(self, pincode_id: np.ndarray, activity: np.ndarray) -> dict:
+        """
+        Fold in one day (each pincode at most once). Returns the day's
+        surge rows: pincode ids, activity, baseline and z-score.
+        """
+        pin = np.asarray(pincode_id, dtype=np.int64)
+        x = np.asarray(activity, dtype=np.float64)
+
+        # Score against the baseline before this observation
+        n_prev, ewma, ewvar = self.count[pin], self.ewma[pin], self.ewvar[pin]
+        scale = np.sqrt(np.maximum(np.maximum(ewvar, ewma), 1.0))
+        z = np.where(n_prev >= MIN_HISTORY, (x - ewma) / scale, 0.0)
+        surge = (n_prev >= MIN_HISTORY) & (z >= Z_THRESHOLD) & (x >= MIN_ACTIVITY)
+
+        self.count[pin] = n_prev + 1
+        self.total[pin] += np.asarray(activity, dtype=np.int64)
+
+        # EWMA, seeded by the first observation
+        diff = x - ewma
+        incr = self.alpha * diff
+        first = n_prev == 0
+        self.ewma[pin] = np.where(first, x, ewma + incr)
+        self.ewvar[pin] = np.where(first, 0.0, (1 - self.alpha) * (ewvar + diff * incr))
+        self.peak_z[pin] = np.maximum(self.peak_z[pin], z)
+
+        district = self.pincode_district[pin]
+        state = self.district_state[district]
+        for level, group in [("district", district), ("state", state)]:
+            self.topk[(level, "concentration")].push(group, pin, self.total[pin].astype(np.float64))
+            self.topk[(level, "anomaly")].push(group, pin, self.peak_z[pin])
+
+        return {
+            "pincode_id": pin[surge],
+            "activity": x[surge],
+            "expected": ewma[surge],
+            "z_score": z[surge],
+        }
+
+    def extend(self, pincode_district, district_state, remap: dict):
+        """
+        Move the statistics onto an extended geography, given the
+        monotonic old -> new id maps of `Geography.extend`
+        """
+        pin = remap["pincode_id"]
+        n = len(pincode_district)
+        for name, fill in [("count", 0), ("total", 0), ("ewma", 0.0), ("ewvar", 0.0),
+                           ("peak_z", -np.inf)]:
+            old = getattr(self, name)
+            new = np.full(n, fill, dtype=old.dtype)
+            new[pin] = old
+            setattr(self, name, new)
+
+        self.pincode_district = np.asarray(pincode_district)
+        self.district_state = np.asarray(district_state)
+        groups = {
+            "district": (len(self.district_state), remap["district_id"]),
+            "state": (int(self.district_state.max()) + 1, remap["state_id"]),
+        }
+        for (level, _), topk in self.topk.items():
+            size, group_map = groups[level]
+            topk.extend(size, group_map[:len(topk.ids)], pin)
+
+    def topk_frame(self) -> pd.DataFrame:
+        """
+        Long table of every top-k list: level, kind, rank, pincode_id,
+        score and the pincode's share of its group's activity
+        """
+        district_total = np.bincount(
+            self.pincode_district, weights=self.total, minlength=len(self.district_state)
+        )
+        state_total = np.bincount(self.district_state, weights=district_total)
+
+        parts = []
+        for (level, kind), topk in self.topk.items():
+            df = topk.frame("group", "pincode_id")
+            group_total = district_total if level == "district" else state_total
+            df["share"] = self.total[df["pincode_id"]] / np.maximum(group_total[df["group"]], 1)
+            parts.append(df.drop(columns="group").assign(level=level, kind=kind))
+
+        out = pd.concat(parts, ignore_index=True)
+        district = self.pincode_district[out["pincode_id"]]
+        out.insert(0, "state_id", self.district_state[district].astype(np.int16))
+        out.insert(1, "district_id", district.astype(np.int32))
+        out["pincode_id"] = out["pincode_id"].astype(np.int32)
+        return out[[
+            "level", "kind", "rank", "state_id", "district_id", "pincode_id", "score", "share"
+        ]]
+
+
+# ==================================================
+# STAGE
+# ==================================================
+ALERT_COLUMNS = ["pincode_id", "date", "activity", "expected", "z_score"]
+
+
+def stream_surges(detector: SurgeDetector, granular: pd.DataFrame) -> pd.DataFrame:
+    """
+    Feed granular rows to `detector` one day at a time in date order.
+    Every day must come after `detector.last_date`. Returns the raw
+    alert rows found (pincode_id, date, activity, expected, z_score).
+    """
+    dates = granular["date"].to_numpy()
+    order = np.argsort(dates, kind="mergesort")
+    dates = dates[order]
+    pin = granular["pincode_id"].to_numpy()[order]
+    activity = granular[MEASURES].to_numpy(np.int64).sum(axis=1)[order]
+
+    if len(dates) and detector.last_date is not None and dates[0] <= detector.last_date:
+        raise ValueError("surge detector can only fold in days after its last one")
+
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]]) if len(dates) else []
+    bounds = np.r_[starts, len(dates)]
+
+    found = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        day = detector.update(pin[lo:hi], activity[lo:hi])
+        day["date"] = np.repeat(dates[lo:lo + 1], len(day["pincode_id"]))
+        found.append(day)
+    if len(dates):
+        detector.last_date = dates[-1]
+
+    if not found:
+        return pd.DataFrame({col: [] for col in ALERT_COLUMNS}).astype({
+            "pincode_id": np.int64, "date": dates.dtype, "activity": np.float64
+        })
+    return pd.DataFrame({col: np.concatenate([day[col] for day in found]) for col in ALERT_COLUMNS})
+
+
+def surge_tables(alerts: pd.DataFrame, detector: SurgeDetector, geo, valid_states=None) -> dict:
+    """
+    Output tables from raw alert rows and a detector: the surge alerts
+    (one row per pincode-day) and the top-k tables, optionally only
+    for `valid_states`. Pincodes never share a top-k group across
+    states, so filtering here equals streaming only those states.
+    """
+    alerts = alerts.copy()
+    district = geo.pincode_district[alerts["pincode_id"].to_numpy(np.int64)]
+    alerts.insert(0, "state_id", geo.district_state[district].astype(np.int16))
+    alerts.insert(1, "district_id", district.astype(np.int32))
+    alerts["pincode_id"] = alerts["pincode_id"].astype(np.int32)
+    alerts["activity"] = alerts["activity"].astype(np.int64)
+    alerts["surge_ratio"] = alerts["activity"] / np.maximum(alerts["expected"], 1.0)
+
+    topk = detector.topk_frame()
+    if valid_states is not None:
+        alerts = alerts[alerts["state_id"].isin(valid_states)]
+        topk = topk[topk["state_id"].isin(valid_states)].reset_index(drop=True)
+
+    return {
+        "alerts": alerts.sort_values(["date", "z_score"], ascending=[True, False], kind="mergesort")
+        .reset_index(drop=True),
+        "topk": topk,
+    }
+
+
+def detect_surges(granular: pd.DataFrame, geo, span: int = EWMA_SPAN, k: int = TOP_K) -> dict:
+    """
+    Stream the granular table through a `SurgeDetector` in date order.
+    Returns the surge alerts (one row per pincode-day) and the top-k
+    tables.
+    """
+    detector = SurgeDetector(geo.pincode_district, geo.district_state, span=span, k=k)
+    return surge_tables(stream_surges(detector, granular), detector, geo)
@@ -0,0 +1,256 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data_loader import COUNT_COLUMNS, DATE_FORMAT, RAW_FILES
+
+STATE_NAMES = [
+    "Andaman and Nicobar Islands", "Andhra Pradesh", "Arunachal Pradesh",
+    "Assam", "Bihar", "Chandigarh", "Chhattisgarh",
+    "Dadra and Nagar Haveli and Daman and Diu", "Delhi", "Goa", "Gujarat",
+    "Haryana", "Himachal Pradesh", "Jammu and Kashmir", "Jharkhand",
+    "Karnataka", "Kerala", "Ladakh", "Lakshadweep", "Madhya Pradesh",
+    "Maharashtra", "Manipur", "Meghalaya", "Mizoram", "Nagaland", "Odisha",
+    "Puducherry", "Punjab", "Rajasthan", "Sikkim", "Tamil Nadu", "Telangana",
+    "Tripura", "Uttar Pradesh", "Uttarakhand", "West Bengal",
+]
+
+# Share of all raw rows per source (update feeds outnumber enrolments)
+SOURCE_SHARE = {"enrolment": 0.20, "demographic": 0.42, "biometric": 0.38}
+
+# Mean count per row at unit PIN intensity, per count column
+COUNT_MEANS = {
+    "enrolment": [3.0, 1.5, 0.3],
+    "demographic": [2.0, 12.0],
+    "biometric": [5.0, 8.0],
+}
+
+# Bumped whenever the same spec would give different files, so cached
+# sets are regenerated
+GENERATOR_VERSION = 2
+
+# Labels the pipeline's cleaning rules must drop
+JUNK_STATES = ["100000", "0", "NA"]
+
+
+def _allocate(total: int, weights, minimum: int = 0) -> np.ndarray:
+    """
+    Split `total` into integer parts proportional to `weights`
+    (largest remainder), each at least `minimum`
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    spare = total - minimum * len(weights)
+    if spare < 0:
+        raise ValueError(f"cannot give {len(weights)} parts at least {minimum} of {total}")
+
+    share = spare * weights / weights.sum()
+    parts = np.floor(share).astype(np.int64)
+    rest = np.argsort(-(share - parts), kind="mergesort")[: spare - parts.sum()]
+    parts[rest] += 1
+    return parts + minimum
+
+
+# ==================================================
+# GEOGRAPHY
+# ==================================================
+def synthetic_geography(
+    states: int = 36,
+    districts: int = 700,
+    pincodes: int = 19_000,
+    seed: int = 0
+) -> pd.DataFrame:
+    """
+    State / district / pincode table with a skewed activity intensity
+    per pincode. District and PIN counts per state are uneven, and PINs
+    are six-digit codes contiguous within a state, as in the postal
+    circles.
+    """
+    if not 1 <= states <= len(STATE_NAMES):
+        raise ValueError(f"states must be between 1 and {len(STATE_NAMES)}")
+    rng = np.random.default_rng([seed, 0])
+
+    state_names = STATE_NAMES[:states]
+    state_size = rng.lognormal(0.0, 1.0, states)
+    district_counts = _allocate(districts, state_size, minimum=1)
+
+    district_size = rng.lognormal(0.0, 0.5, districts) * np.repeat(state_size, district_counts)
+    pincode_counts = _allocate(pincodes, district_size, minimum=1)
+
+    state_of_district = np.repeat(np.arange(states), district_counts)
+    district_names = np.array([
+        f"{state_names[s]} District {j + 1:03d}"
+        for s, n in zip(range(states), district_counts) for j in range(n)
+    ])
+
+    district_of_pin = np.repeat(np.arange(districts), pincode_counts)
+    codes = np.sort(rng.choice(np.arange(110_000, 856_000), pincodes, replace=False))
+
+    # Rows are drawn in proportion to intensity; scale so that the
+    # average drawn row has intensity 1
+    intensity = rng.lognormal(0.0, 0.8, pincodes) * np.sqrt(district_size[district_of_pin])
+    intensity *= intensity.sum() / (intensity ** 2).sum()
+
+    return pd.DataFrame({
+        "state": np.array(state_names)[state_of_district[district_of_pin]],
+        "district": district_names[district_of_pin],
+        "pincode": codes.astype(np.int32),
+        "intensity": intensity,
+    })
+
+
+def _surges(geo: pd.DataFrame, days: int, n: int, seed: int) -> pd.DataFrame:
+    """
+    Short activity bursts: (pincode row, first day, last day, factor)
+    """
+    rng = np.random.default_rng([seed, 1])
+    p = geo["intensity"].to_numpy() / geo["intensity"].sum()
+    start = rng.integers(0, days, n)
+    return pd.DataFrame({
+        "pin": rng.choice(len(geo), n, p=p),
+        "first": start,
+        "last": np.minimum(start + rng.integers(3, 15, n), days - 1),
+        "factor": rng.uniform(3.0, 8.0, n),
+    })
+
+
+def _day_weights(days: int) -> np.ndarray:
+    """
+    Relative activity per day: quieter Sundays and a gentle upward trend
+    """
+    d = np.arange(days)
+    return np.where(d % 7 == 6, 0.6, 1.0) * (1 + 0.3 * d / max(days - 1, 1))
+
+
+# ==================================================
+# RAW FILES
+# ==================================================
+def _day_rows(source, day, n, geo, cumulative, surges, spec, labels):
+    """
+    Column arrays (label codes and counts) for one day of one source.
+    Each day has its own random stream, so the files do not depend on
+    how days are batched into chunks.
+    """
+    rng = np.random.default_rng([spec["seed"], list(RAW_FILES).index(source) + 2, day])
+
+    pin = np.minimum(np.searchsorted(cumulative, rng.random(n) * cumulative[-1]), len(geo) - 1)
+    scale = geo["intensity"].to_numpy()[pin]
+    active = surges[(surges["first"] <= day) & (surges["last"] >= day)]
+    for row in active.itertuples():
+        scale = np.where(pin == row.pin, scale * row.factor, scale)
+
+    state = labels["state_code"][pin]
+    district = labels["district_code"][pin]
+    pincode = geo["pincode"].to_numpy()[pin]
+
+    noisy = rng.random(n) < spec["noise"]
+    if noisy.any():
+        # Spelling variants the geography layer folds back together,
+        # plus junk labels the cleaning rules drop
+        junk = noisy & (rng.random(n) < 0.25)
+        state = np.where(noisy & ~junk, state + labels["variant_offset"], state)
+        state = np.where(junk, labels["junk_code"], state)
+        district = np.where(junk, labels["junk_district"], district)
+
+    columns = {
+        "date": np.full(n, day, dtype=np.int64),
+        "state": state,
+        "district": district,
+        "pincode": pincode,
+    }
+    means = np.asarray(COUNT_MEANS[source])
+    counts = rng.poisson(means[:, None] * scale).astype(np.int32)
+
+    # The cleaned feeds hold no all-zero rows: such a row gets a single
+    # count in one column, drawn in proportion to the column means
+    empty = np.flatnonzero(counts.sum(axis=0) == 0)
+    if len(empty):
+        pick = rng.choice(len(means), len(empty), p=means / means.sum())
+        counts[pick, empty] = 1
+
+    for col, values in zip(COUNT_COLUMNS[source], counts):
+        columns[col] = values
+    return columns
+
+
+def _write_batch(batch: list, labels: dict, path: Path, header: bool):
+    columns = {col: np.concatenate([day[col] for day in batch]) for col in batch[0]}
+    for col, categories in [("date", "dates"), ("state", "states"), ("district", "districts")]:
+        columns[col] = pd.Categorical.from_codes(columns[col], labels[categories])
+    pd.DataFrame(columns).to_csv(path, mode="w" if header else "a", header=header, index=False)
+
+
+def generate_raw(
+    out_dir: Path,
+    rows: int = 1_000_000,
+    days: int = 300,
+    start: str = "2025-03-01",
+    states: int = 36,
+    districts: int = 700,
+    pincodes: int = 19_000,
+    seed: int = 0,
+    noise: float = 0.0005,
+    surges: int = 25,
+    chunk_rows: int = 1_000_000,
+    overwrite: bool = False
+) -> dict:
+    """
+    Write deterministic enrolment, demographic and biometric raw files
+    with `rows` rows in total, in date order. The same arguments always
+    give byte-identical files; an existing set with the same spec
+    (see `manifest.json`) is reused unless `overwrite`.
+    """
+    out_dir = Path(out_dir)
+    spec = {
+        "rows": int(rows), "days": int(days), "start": start, "states": states,
+        "districts": districts, "pincodes": pincodes, "seed": seed,
+        "noise": noise, "surges": surges, "version": GENERATOR_VERSION,
+    }
+    paths = {source: out_dir / name for source, name in RAW_FILES.items()}
+
+    manifest = out_dir / "manifest.json"
+    if not overwrite and manifest.exists() and all(p.exists() for p in paths.values()):
+        with open(manifest) as f:
+            if json.load(f)["spec"] == spec:
+                return paths
+
+    geo = synthetic_geography(states, districts, pincodes, seed)
+    cumulative = np.cumsum(geo["intensity"].to_numpy())
+    bursts = _surges(geo, days, surges, seed)
+
+    state_cat = pd.Categorical(geo["state"])
+    district_cat = pd.Categorical(geo["district"])
+    state_labels = list(state_cat.categories)
+    variants = [s.replace(" and ", " & ") if " and " in s else s.upper() for s in state_labels]
+    labels = {
+        "states": state_labels + variants + JUNK_STATES[:1],
+        "districts": list(district_cat.categories) + JUNK_STATES[:1],
+        "state_code": state_cat.codes.astype(np.int64),
+        "district_code": district_cat.codes.astype(np.int64),
+        "variant_offset": len(state_labels),
+        "junk_code": 2 * len(state_labels),
+        "junk_district": len(district_cat.categories),
+        "dates": pd.date_range(start, periods=days, freq="D").strftime(DATE_FORMAT).tolist(),
+    }
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    for source, path in paths.items():
+        per_day = _allocate(round(rows * SOURCE_SHARE[source]), _day_weights(days))
+        counts[source] = int(per_day.sum())
+
+        header = True
+        batch, batch_rows = [], 0
+        for day, n in enumerate(per_day):
+            batch.append(_day_rows(source, day, int(n), geo, cumulative, bursts, spec, labels))
+            batch_rows += n
+            if batch_rows >= chunk_rows or day == days - 1:
+                _write_batch(batch, labels, path, header)
+                header = False
+                batch, batch_rows = [], 0
+
+    with open(manifest, "w") as f:
+        json.dump({"spec": spec, "rows": counts}, f, indent=2)
+
+    return paths
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.archetypes import (
+    assign_clusters,
+    cluster_archetypes,
+    load_centroids,
+    minibatch_kmeans,
+    save_centroids,
+)
+from src.stress_genome import GENOME_COLUMNS
+
+CENTERS = np.array([
+    [0.1, 0.1, 0.1, 0.9],
+    [0.9, 0.1, 0.5, 0.1],
+    [0.1, 0.9, 0.9, 0.5],
+    [0.8, 0.8, 0.2, 0.8],
+])
+
+
+def blobs(per_center=2_000, spread=0.03, seed=0):
+    rng = np.random.default_rng(seed)
+    truth = np.repeat(np.arange(len(CENTERS)), per_center)
+    x = CENTERS[truth] + rng.normal(0, spread, (len(truth), CENTERS.shape[1]))
+    order = rng.permutation(len(truth))
+    return x[order], truth[order]
+
+
+def lloyd(x, init, iterations=100):
+    """
+    Full-batch k-means: assign every row, move every centroid to its
+    rows' mean, until nothing moves
+    """
+    centroids = init.copy()
+    for _ in range(iterations):
+        labels = ((x[:, None, :] - centroids[None]) ** 2).sum(axis=2).argmin(axis=1)
+        updated = np.array([x[labels == j].mean(axis=0) for j in range(len(centroids))])
+        if np.allclose(updated, centroids):
+            break
+        centroids = updated
+    return centroids, labels
+
+
+def same_partition(a, b):
+    # Equal up to renaming the clusters
+    pairs = pd.crosstab(a, b)
+    return ((pairs > 0).sum(axis=1) == 1).all() and ((pairs > 0).sum(axis=0) == 1).all()
+
+
+def test_assignment_matches_brute_force():
+    x, _ = blobs(per_center=500)
+    centroids = np.random.default_rng(1).uniform(0, 1, (6, 4))
+    labels, dist = assign_clusters(x, centroids, chunk=333)
+
+    full = ((x[:, None, :] - centroids[None]) ** 2).sum(axis=2)
+    np.testing.assert_array_equal(labels, full.argmin(axis=1))
+    np.testing.assert_allclose(dist, full.min(axis=1), atol=1e-12)
+
+
+def test_minibatch_recovers_blobs_like_lloyd():
+    x, truth = blobs()
+    fit = minibatch_kmeans(x, 4, batch_size=256, seed=0)
+    reference, reference_labels = lloyd(x, CENTERS + 0.1)
+
+    assert same_partition(fit["labels"], truth)
+    assert same_partition(fit["labels"], reference_labels)
+    # Match each centroid to its reference counterpart through the labels
+    matched = pd.crosstab(fit["labels"], reference_labels).to_numpy().argmax(axis=1)
+    np.testing.assert_allclose(fit["centroids"], reference[matched], atol=0.01)
+
+
+def test_fixed_seed_is_deterministic():
+    x, _ = blobs(per_center=500)
+    first = minibatch_kmeans(x, 4, batch_size=128, seed=7)
+    second = minibatch_kmeans(x, 4, batch_size=128, seed=7)
+
+    np.testing.assert_array_equal(first["labels"], second["labels"])
+    np.testing.assert_array_equal(first["centroids"], second["centroids"])
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_warm_start_keeps_converged_clusters(seed):
+    x, _ = blobs()
+    cold = minibatch_kmeans(x, 4, batch_size=256, seed=0)
+    # New batches of the same population under another seed
+    warm = minibatch_kmeans(x, 4, init=cold["centroids"], batch_size=256, seed=seed)
+
+    np.testing.assert_array_equal(warm["labels"], cold["labels"])
+    np.testing.assert_allclose(warm["centroids"], cold["centroids"], atol=0.01)
+
+
+def genome_frame(per_center=50, seed=0):
+    x, _ = blobs(per_center=per_center, seed=seed)
+    genome = pd.DataFrame(x, columns=GENOME_COLUMNS)
+    genome.insert(0, "district", [f"D{i:04d}" for i in range(len(genome))])
+    return genome
+
+
+def test_saved_centroids_warm_start_the_next_run(tmp_path):
+    genome = genome_frame()
+    first = cluster_archetypes(genome, "district", 4)
+    save_centroids("district", first["centroids"], tmp_path)
+
+    init = load_centroids("district", 4, tmp_path)
+    assert load_centroids("district", 5, tmp_path) is None
+    second = cluster_archetypes(genome, "district", 4, init=init, seed=1)
+
+    assert second["stats"]["warm_start"]
+    for col in ["district", "cluster", "archetype"]:
+        assert second["units"][col].tolist() == first["units"][col].tolist()
+    np.testing.assert_allclose(second["units"]["distance"], first["units"]["distance"], atol=0.01)
+    # The blobs tie two dimensions' deviations, so only the wording's order may move
+    assert (
+        second["units"]["profile"].str.split(", ").map(set)
+        == first["units"]["profile"].str.split(", ").map(set)
+    ).all()
+
+
+def test_small_level_falls_back_to_rules():
+    genome = genome_frame(per_center=2)
+    result = cluster_archetypes(genome, "district", 4)
+
+    assert result["stats"]["fallback"] and result["centroids"] is None
+    assert (result["units"]["cluster"] == -1).all()
@@ -0,0 +1,95 @@
+import pandas as pd
+import pytest
+
+import run_aidsp
+import src.archetypes
+import src.artifact_store
+import src.data_loader
+from src.artifact_store import (
+    CURRENT_FILE,
+    SNAPSHOT_DIR,
+    SnapshotWriter,
+    artifact_exists,
+    current_snapshot,
+    read_artifact,
+)
+from src.synthetic import generate_raw
+
+
+def frame(value):
+    return pd.DataFrame({"state": ["Assam", "Bihar"], "value": [value, value + 1]})
+
+
+def publish(root, written, carried=(), keep=3):
+    with SnapshotWriter(root, keep=keep) as writer:
+        for name, value in written.items():
+            writer.write(frame(value), name)
+        writer.carry(carried)
+    return writer.published
+
+
+def test_only_claimed_artifacts_are_carried_over(tmp_path):
+    publish(tmp_path, {"a": 1, "b": 2, "c": 3})
+    snapshot = publish(tmp_path, {"a": 10}, carried=["b"])
+
+    assert current_snapshot(tmp_path) == snapshot
+    assert read_artifact("a", root=tmp_path)["value"].tolist() == [10, 11]
+    assert read_artifact("b", root=tmp_path)["value"].tolist() == [2, 3]
+    assert not artifact_exists("c", tmp_path)
+
+
+def test_dropping_an_artifact_publishes_a_new_snapshot(tmp_path):
+    first = publish(tmp_path, {"a": 1, "b": 2})
+    assert publish(tmp_path, {}, carried=["a", "b"]) == first
+
+    second = publish(tmp_path, {}, carried=["a"])
+    assert second != first
+    assert artifact_exists("a", tmp_path)
+    assert not artifact_exists("b", tmp_path)
+
+
+def test_failed_run_leaves_current_snapshot(tmp_path):
+    first = publish(tmp_path, {"a": 1})
+    with pytest.raises(RuntimeError):
+        with SnapshotWriter(tmp_path) as writer:
+            writer.write(frame(5), "a")
+            raise RuntimeError("stage failed")
+
+    assert current_snapshot(tmp_path) == first
+    assert read_artifact("a", root=tmp_path)["value"].tolist() == [1, 2]
+    assert [p.name for p in (tmp_path / SNAPSHOT_DIR).iterdir()] == [first.name]
+
+
+def test_pruning_keeps_current(tmp_path):
+    snapshots = [publish(tmp_path, {"a": i}, keep=2) for i in range(4)]
+
+    kept = sorted(p.name for p in (tmp_path / SNAPSHOT_DIR).iterdir())
+    assert kept == sorted(p.name for p in snapshots[-2:])
+
+    # An older snapshot named by CURRENT survives retention
+    (tmp_path / CURRENT_FILE).write_text(snapshots[-2].name)
+    src.artifact_store.prune_snapshots(tmp_path, keep=1)
+    assert current_snapshot(tmp_path) == snapshots[-2]
+    assert read_artifact("a", root=tmp_path)["value"].tolist() == [2, 3]
+
+
+def test_pipeline_drops_outputs_it_no_longer_writes(tmp_path, monkeypatch):
+    raw = generate_raw(tmp_path / "raw", rows=4_000, days=40, states=3, districts=9, pincodes=40)
+    root = tmp_path / "artifacts"
+    monkeypatch.setattr(run_aidsp, "BASE_DIR", tmp_path)
+    monkeypatch.setattr(src.data_loader, "DATA_PROCESSED", next(iter(raw.values())).parent)
+    monkeypatch.setattr(src.artifact_store, "ARTIFACT_ROOT", root)
+    monkeypatch.setattr(src.archetypes, "CENTROID_DIR", tmp_path / "archetypes")
+
+    run_aidsp.main(clusters=2)
+    assert artifact_exists("genome_clusters_pincode", root)
+    assert artifact_exists("final_policy_output_pincode", root)
+
+    run_aidsp.main(levels=["district"])
+    assert not artifact_exists("genome_clusters_pincode", root)
+    assert not artifact_exists("archetype_centroids_pincode", root)
+    assert not artifact_exists("final_policy_output_pincode", root)
+    # Up-to-date stages keep their outputs, and the manifest goes along
+    for name in ["granular_uidai", "rollup_state", "final_policy_output_district"]:
+        assert artifact_exists(name, root)
+    assert (current_snapshot(root) / "dashboard_manifest.json").exists()
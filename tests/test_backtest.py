@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backtest import rolling_origin_errors, run_backtest
+from src.forecasting import MIN_HISTORY, forecast_state_risk
+
+HORIZONS = (1, 3, 10)
+
+
+def risk_frame(n_series=6, days=40, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "state": np.repeat([f"S{i:02d}" for i in range(n_series)], days),
+        "date": np.tile(pd.date_range("2025-01-01", periods=days), n_series),
+        "risk_score": rng.gamma(2.0, 0.5, n_series * days),
+    })
+    # Uneven histories: one shorter than a horizon, one too short to score
+    df = df[~((df["state"] == "S01") & (df["date"] >= "2025-01-12"))]
+    df = df[~((df["state"] == "S02") & (df["date"] >= "2025-01-03"))]
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def reference_errors(df):
+    """
+    Refit a least-squares trend on each origin's history, one origin
+    and horizon at a time
+    """
+    rows = []
+    for state, series in df.sort_values("date").groupby("state"):
+        y = series["risk_score"].to_numpy()
+        for pos in range(MIN_HISTORY - 1, len(y)):
+            slope, intercept = np.polyfit(np.arange(pos + 1), y[:pos + 1], 1)
+            for h in HORIZONS:
+                if pos + h < len(y):
+                    rows.append({
+                        "state": state,
+                        "origin": series["date"].iloc[pos],
+                        "horizon": h,
+                        "actual": y[pos + h],
+                        "trend_error": intercept + slope * (pos + h) - y[pos + h],
+                        "naive_error": y[pos] - y[pos + h],
+                    })
+    return pd.DataFrame(rows)
+
+
+def test_errors_match_refit_at_every_origin():
+    df = risk_frame()
+    errors = rolling_origin_errors(df, horizons=HORIZONS)
+    expected = reference_errors(df)
+
+    order = ["state", "origin", "horizon"]
+    errors = errors.sort_values(order).reset_index(drop=True)
+    expected = expected.sort_values(order).reset_index(drop=True)
+    assert "S02" not in set(errors["state"])
+    pd.testing.assert_frame_equal(
+        errors, expected[errors.columns], check_dtype=False, check_exact=False, rtol=1e-9
+    )
+
+
+def test_one_step_trend_matches_forecaster():
+    df = risk_frame()
+    errors = rolling_origin_errors(df, horizons=(1,))
+    errors = errors.set_index(["state", "origin"])
+
+    checked = 0
+    for origin in pd.date_range("2025-01-05", "2025-01-20", freq="5D"):
+        history = df[df["date"] <= origin]
+        forecast = forecast_state_risk(history, key="state").set_index("state")
+        for state, predicted in forecast["predicted_risk_score"].items():
+            if (state, origin) in errors.index:
+                scored = errors.loc[(state, origin)]
+                assert scored["trend_error"] + scored["actual"] == pytest.approx(predicted)
+                checked += 1
+    assert checked > 0
+
+
+def test_summary_metrics_aggregate_the_errors():
+    result = run_backtest(risk_frame(), horizons=HORIZONS)
+    errors = result["errors"]
+
+    for h, summary in result["summary"].set_index("horizon").iterrows():
+        e = errors[errors["horizon"] == h]
+        assert summary["origins"] == len(e)
+        for method in ["trend", "naive"]:
+            assert summary[f"{method}_mae"] == pytest.approx(e[f"{method}_error"].abs().mean())
+            assert summary[f"{method}_rmse"] == pytest.approx(
+                np.sqrt((e[f"{method}_error"] ** 2).mean())
+            )
+        assert summary["trend_skill"] == pytest.approx(
+            1 - summary["trend_mae"] / summary["naive_mae"]
+        )
+    assert result["series"]["origins"].sum() == len(errors)
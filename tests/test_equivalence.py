@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import run_aidsp
+import src.archetypes
+import src.artifact_store
+import src.data_loader
+import src.incremental
+import src.out_of_core
+import src.parallel
+from src.data_loader import RAW_FILES
+from src.synthetic import generate_raw
+
+# Small enough to run in seconds, large enough for every series to
+# have forecast history
+SYNTHETIC = {"rows": 20_000, "days": 60, "states": 6, "districts": 30, "pincodes": 200}
+# First day of the slice absorbed by --update
+SLICE_START = "2025-04-20"
+# Non-default output options, which every mode must honour
+OPTIONS = {
+    "export_csv": True,
+    "policy_factors": (0.8, 0.6, 0.4),
+    "scenario_grid": {"intensities": [0.2, 0.5], "budgets": [2, float("inf")], "rollouts": [1.0]},
+    "scenario_top": 3,
+    "horizons": [5, 10],
+}
+
+
+@pytest.fixture(scope="module")
+def raw(tmp_path_factory):
+    return generate_raw(tmp_path_factory.mktemp("raw"), **SYNTHETIC)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """
+    Run the pipeline in its own tree: `project(name, raw_dir)` points
+    every data, cache and output location under tmp_path / name and
+    returns that directory
+    """
+    def use(name, raw_dir):
+        root = tmp_path / name
+        root.mkdir()
+        monkeypatch.setattr(run_aidsp, "BASE_DIR", root)
+        monkeypatch.setattr(src.data_loader, "DATA_PROCESSED", raw_dir)
+        monkeypatch.setattr(src.out_of_core, "DATA_PROCESSED", raw_dir)
+        monkeypatch.setattr(src.out_of_core, "SHARD_ROOT", root / "shards")
+        monkeypatch.setattr(src.parallel, "SPILL_ROOT", root / "shards")
+        monkeypatch.setattr(src.artifact_store, "ARTIFACT_ROOT", root / "artifacts")
+        monkeypatch.setattr(src.archetypes, "CENTROID_DIR", root / "archetypes")
+        return root
+
+    return use
+
+
+def copy_raw(paths: dict, out_dir, start=None, end=None):
+    """
+    Raw files holding the rows with start <= date < end, in file order
+    """
+    out_dir.mkdir()
+    for source, path in paths.items():
+        df = pd.read_csv(path)
+        keep = pd.Series(True, index=df.index)
+        if start:
+            keep &= df["date"] >= start
+        if end:
+            keep &= df["date"] < end
+        df[keep].to_csv(out_dir / RAW_FILES[source], index=False)
+    return out_dir
+
+
+def assert_same_outputs(a, b):
+    """
+    Every exported CSV of run `b` exists in run `a` with equal values
+    """
+    exported = sorted(p.relative_to(b) for p in b.rglob("*.csv") if "artifacts" not in p.parts)
+    assert exported
+    for name in exported:
+        pd.testing.assert_frame_equal(
+            pd.read_csv(a / name), pd.read_csv(b / name),
+            check_exact=False, rtol=1e-9, atol=1e-12, check_dtype=False, obj=str(name)
+        )
+
+
+def test_update_matches_full_run(raw, tmp_path, project):
+    full = project("full", copy_raw(raw, tmp_path / "raw-full"))
+    run_aidsp.main(**OPTIONS)
+
+    history = copy_raw(raw, tmp_path / "raw-history", end=SLICE_START)
+    updated = project("updated", history)
+    run_aidsp.update_main(copy_raw(raw, tmp_path / "slice", start=SLICE_START), **OPTIONS)
+
+    assert_same_outputs(updated, full)
+    # --policy-factors reach every level
+    low, medium, high = OPTIONS["policy_factors"]
+    for suffix in ["", "_district", "_pincode"]:
+        policy = pd.read_csv(full / "results" / f"final_policy_output{suffix}.csv")
+        for column, factor in [("low", low), ("medium", medium), ("high", high)]:
+            np.testing.assert_allclose(
+                policy[f"{column}_intervention"], policy["predicted_risk_score"] * factor
+            )
+    # The slice was appended to the raw history
+    for name in RAW_FILES.values():
+        pd.testing.assert_frame_equal(
+            pd.read_csv(history / name), pd.read_csv(tmp_path / "raw-full" / name)
+        )
+
+
+@pytest.mark.parametrize("shard_by", ["state", "date"])
+def test_out_of_core_matches_full_run(raw, project, shard_by):
+    raw_dir = next(iter(raw.values())).parent
+    full = project("full", raw_dir)
+    run_aidsp.main(**OPTIONS)
+
+    # A budget this small splits the busiest states into date ranges
+    sharded = project("sharded", raw_dir)
+    run_aidsp.out_of_core_main(1, shard_by=shard_by, **OPTIONS)
+
+    assert_same_outputs(sharded, full)
+
+
+def test_update_after_out_of_core_matches_full_run(raw, tmp_path, project, monkeypatch):
+    full = project("full", next(iter(raw.values())).parent)
+    run_aidsp.main(**OPTIONS)
+
+    # The out-of-core state is saved as partitions the update merges
+    updated = project("updated", copy_raw(raw, tmp_path / "raw-history", end=SLICE_START))
+    run_aidsp.out_of_core_main(1, **OPTIONS)
+    # Continuing the stored state, never rebuilding it
+    monkeypatch.setattr(src.incremental, "build_state", None)
+    run_aidsp.update_main(copy_raw(raw, tmp_path / "slice", start=SLICE_START), **OPTIONS)
+
+    assert_same_outputs(updated, full)
+
+
+def test_workers_match_serial(raw, project):
+    raw_dir = next(iter(raw.values())).parent
+    serial = project("serial", raw_dir)
+    run_aidsp.main(export_csv=True, use_cache=False)
+
+    pooled = project("pooled", raw_dir)
+    run_aidsp.main(export_csv=True, use_cache=False, workers=2)
+
+    assert_same_outputs(pooled, serial)
+
+
+def test_bad_slice_header_changes_nothing(raw, tmp_path, project):
+    history = copy_raw(raw, tmp_path / "raw-history", end=SLICE_START)
+    root = project("updated", history)
+    run_aidsp.update_main(copy_raw(raw, tmp_path / "slice", start=SLICE_START, end="2025-04-25"))
+
+    bad = copy_raw(raw, tmp_path / "bad-slice", start="2025-04-25")
+    path = bad / RAW_FILES["biometric"]
+    path.write_text(path.read_text().replace("state", "State", 1))
+
+    state_file = root / "data" / "incremental" / "state.pkl"
+    before = {p: p.read_bytes() for p in [state_file, *history.iterdir()]}
+    with pytest.raises(ValueError, match="header"):
+        run_aidsp.update_main(bad)
+    assert {p: p.read_bytes() for p in [state_file, *history.iterdir()]} == before
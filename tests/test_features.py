@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features import ROLLING_WINDOWS, rolling_window_features
+
+
+def series_frame(n_series=300, days=60, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2025-01-01", periods=days)
+    df = pd.DataFrame({
+        "state": np.repeat([f"S{i:04d}" for i in range(n_series)], days),
+        "date": np.tile(dates, n_series),
+        "total_enrolment": rng.poisson(50, n_series * days).astype(float),
+        "risk_score": rng.gamma(2.0, 0.5, n_series * days),
+    })
+    # Shuffled, as the function sorts by key and date itself
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def reference(df, col, w):
+    ordered = df.sort_values(["state", "date"]).reset_index(drop=True)
+    # Windows holding NaN or inf are undefined
+    values = ordered[col].replace([np.inf, -np.inf], np.nan)
+    rolling = values.groupby(ordered["state"]).rolling(w).agg
+    mean = rolling("mean").reset_index(level=0, drop=True).sort_index()
+    vol = rolling("std").reset_index(level=0, drop=True).sort_index()
+    return mean.to_numpy(), vol.to_numpy()
+
+
+@pytest.mark.parametrize("w", ROLLING_WINDOWS)
+def test_matches_groupby_rolling(w):
+    df = series_frame()
+    out = rolling_window_features(df, key="state")
+
+    for col in ["total_enrolment", "risk_score"]:
+        mean, vol = reference(df, col, w)
+        np.testing.assert_allclose(out[f"{col}_mean_{w}"], mean, rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(out[f"{col}_vol_{w}"], vol, rtol=1e-7, atol=1e-9)
+
+
+def test_non_finite_values_stay_in_their_window():
+    df = series_frame()
+    ordered = df.sort_values(["state", "date"]).reset_index(drop=True)
+    nan_row = ordered.index[(ordered["state"] == "S0003")][10]
+    inf_row = ordered.index[(ordered["state"] == "S0007")][20]
+    df.loc[(df["state"] == "S0003") & (df["date"] == ordered.loc[nan_row, "date"]), "total_enrolment"] = np.nan
+    df.loc[(df["state"] == "S0007") & (df["date"] == ordered.loc[inf_row, "date"]), "total_enrolment"] = np.inf
+
+    out = rolling_window_features(df, key="state")
+    for w in ROLLING_WINDOWS:
+        mean, vol = reference(df, "total_enrolment", w)
+        np.testing.assert_allclose(out[f"total_enrolment_mean_{w}"], mean, rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(out[f"total_enrolment_vol_{w}"], vol, rtol=1e-7, atol=1e-9)
+
+        untouched = ~out["state"].isin(["S0003", "S0007"])
+        full = out.groupby("state").cumcount() >= w - 1
+        assert out.loc[untouched & full, f"total_enrolment_vol_{w}"].notna().all()
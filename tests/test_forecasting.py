@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.forecasting import (
+    MIN_HISTORY,
+    QUANTILES,
+    bootstrap_intervals,
+    forecast_horizons,
+    forecast_state_risk,
+)
+
+
+def risk_frame(n_series=20, days=30, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "state": np.repeat([f"S{i:02d}" for i in range(n_series)], days),
+        "date": np.tile(pd.date_range("2025-01-01", periods=days), n_series),
+        "risk_score": rng.gamma(2.0, 0.5, n_series * days),
+    })
+
+
+def test_trend_forecast_matches_per_series_fits():
+    df = risk_frame(n_series=12, days=25, seed=1)
+    # Uneven histories, one too short to forecast
+    df = df[~((df["state"] == "S03") & (df["date"] >= "2025-01-05"))]
+    df = df[~((df["state"] == "S07") & (df["date"] < "2025-01-15"))]
+    forecast = forecast_state_risk(df.sample(frac=1, random_state=0), key="state")
+
+    # One least-squares fit per series, predicting the next step
+    expected = {}
+    for state, series in df.sort_values("date").groupby("state"):
+        if len(series) >= MIN_HISTORY:
+            slope, intercept = np.polyfit(np.arange(len(series)), series["risk_score"], 1)
+            expected[state] = intercept + slope * len(series)
+
+    assert sorted(forecast["state"]) == sorted(expected)
+    for state, predicted in zip(forecast["state"], forecast["predicted_risk_score"]):
+        assert predicted == pytest.approx(expected[state])
+    assert forecast["predicted_risk_score"].is_monotonic_decreasing
+
+
+def test_no_resamples_give_nan_intervals():
+    intervals = bootstrap_intervals(risk_frame(), n_boot=0)
+    assert len(intervals) == 20
+    columns = [f"risk_p{round(q * 100)}" for q in QUANTILES]
+    assert list(intervals.columns) == ["state"] + columns
+    assert intervals[columns].isna().all().all()
+
+
+def test_negative_resamples_are_rejected():
+    with pytest.raises(ValueError, match="n_boot"):
+        bootstrap_intervals(risk_frame(), n_boot=-1)
+
+
+def test_intervals_are_ordered():
+    intervals = bootstrap_intervals(risk_frame(), n_boot=200)
+    assert (intervals["risk_p10"] <= intervals["risk_p50"]).all()
+    assert (intervals["risk_p50"] <= intervals["risk_p90"]).all()
+
+
+def test_horizon_context_is_the_last_rolling_window():
+    df = risk_frame(days=40)
+    # Gaps, and one series shorter than the longest window
+    df = df[(df.index % 7 != 3) & ~((df["state"] == "S00") & (df["date"] < "2025-01-25"))]
+    table = forecast_horizons(df, key="state", horizons=[5, 10, 30])
+
+    for (state, h), row in table.set_index(["state", "horizon"]).iterrows():
+        risk = df[df["state"] == state].sort_values("date")["risk_score"]
+        window = risk.iloc[-h:]
+        if len(risk) < h:
+            assert np.isnan(row["recent_mean"]) and np.isnan(row["surge_ratio"])
+            continue
+        assert row["recent_mean"] == pytest.approx(window.mean())
+        assert row["recent_volatility"] == pytest.approx(window.std())
+        assert row["surge_ratio"] == pytest.approx(risk.iloc[-1] / window.mean())
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from src.geography import Geography
+
+
+def geography():
+    return Geography.from_frames(pd.DataFrame({
+        "state": ["Assam", "Assam", "Bihar"],
+        "district": ["Kamrup", "Jorhat", "Patna"],
+        "pincode": [781001, 785001, 800001],
+    }))
+
+
+def test_round_trip():
+    geo = geography()
+    raw = pd.DataFrame({"state": ["Bihar", "Assam"], "district": ["Patna", "Jorhat"],
+                        "pincode": [800001, 785001]})
+    decoded = geo.decode(geo.encode(raw))
+    pd.testing.assert_frame_equal(decoded[raw.columns], raw, check_dtype=False)
+
+
+def test_unknown_ids_decode_to_missing():
+    geo = geography()
+    encoded = geo.encode(pd.DataFrame({
+        "state": ["Bihar", "Atlantis"], "district": ["Patna", "Nowhere"], "pincode": [800001, 1]
+    }))
+    assert (encoded[["state_id", "district_id", "pincode_id"]].iloc[1] == -1).all()
+
+    decoded = geo.decode(encoded)
+    assert decoded.loc[0, "state"] == "Bihar"
+    assert decoded.loc[1, ["state", "district", "pincode"]].isna().all()
+
+
+def test_unknown_pincode_id_has_no_parents():
+    decoded = geography().decode(pd.DataFrame({"pincode_id": np.array([0, -1], dtype=np.int32)}))
+    # Ids follow name order: Assam / Jorhat first
+    assert decoded.loc[0, ["state", "district", "pincode"]].tolist() == ["Assam", "Jorhat", 785001]
+    assert decoded.loc[1, ["state", "district", "pincode"]].isna().all()
@@ -0,0 +1,95 @@
+import json
+import re
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+import run_aidsp
+import src.archetypes
+import src.artifact_store
+import src.data_loader
+import src.out_of_core
+from src.data_loader import RAW_FILES
+from src.synthetic import STATE_NAMES, generate_raw
+
+BASE_STATES = 2
+
+
+def variant(name):
+    # The generator's second spelling of a state
+    return name.replace(" and ", " & ") if " and " in name else name.upper()
+
+
+@pytest.fixture(scope="module")
+def base(tmp_path_factory):
+    paths = generate_raw(
+        tmp_path_factory.mktemp("raw"), rows=8_000, days=30, states=BASE_STATES,
+        districts=8, pincodes=100
+    )
+    return {source: pd.read_csv(path) for source, path in paths.items()}
+
+
+def replicate(base, copies, out_dir):
+    """
+    Raw files holding `copies` copies of the base rows, each under
+    states of its own, in date order
+    """
+    out_dir.mkdir()
+    for source, df in base.items():
+        parts = []
+        for k in range(copies):
+            names = {}
+            for i in range(BASE_STATES):
+                target = STATE_NAMES[k * BASE_STATES + i]
+                names[STATE_NAMES[i]] = target
+                names[variant(STATE_NAMES[i])] = variant(target)
+            pattern = re.compile("|".join(map(re.escape, names)))
+
+            part = df.copy()
+            for col in ["state", "district"]:
+                part[col] = part[col].str.replace(pattern, lambda m: names[m.group(0)], regex=True)
+            parts.append(part)
+        merged = pd.concat(parts).sort_values("date", kind="mergesort")
+        merged.to_csv(out_dir / RAW_FILES[source], index=False)
+    return out_dir
+
+
+def map_reduce_peak(raw_dir, root, monkeypatch) -> float:
+    """
+    Traced peak (MB) of the map-reduce stage of an out-of-core build
+    with a 1 MB budget
+    """
+    monkeypatch.setattr(run_aidsp, "BASE_DIR", root)
+    monkeypatch.setattr(src.data_loader, "DATA_PROCESSED", raw_dir)
+    monkeypatch.setattr(src.out_of_core, "DATA_PROCESSED", raw_dir)
+    monkeypatch.setattr(src.out_of_core, "SHARD_ROOT", root / "shards")
+    monkeypatch.setattr(src.artifact_store, "ARTIFACT_ROOT", root / "artifacts")
+    monkeypatch.setattr(src.archetypes, "CENTROID_DIR", root / "archetypes")
+    # Chunks at the budget's size for both inputs, not the floor's
+    monkeypatch.setattr(src.out_of_core, "MIN_CHUNK_ROWS", 500)
+
+    try:
+        run_aidsp.out_of_core_main(1, n_boot=0, export_csv=True, trace_memory=True)
+    finally:
+        tracemalloc.stop()
+    with open(root / "results" / "run_report.json") as f:
+        stages = {s["stage"]: s for s in json.load(f)["stages"]}
+    return stages["map_reduce"]["traced_peak_mb"]
+
+
+def test_map_reduce_peak_memory_does_not_follow_the_input(base, tmp_path, monkeypatch):
+    # A first run takes the one-time imports and caches out of both
+    warm = generate_raw(tmp_path / "raw-warm", rows=1_000, days=10, states=BASE_STATES)
+    map_reduce_peak(next(iter(warm.values())).parent, tmp_path / "warm", monkeypatch)
+
+    peaks = {
+        copies: map_reduce_peak(
+            replicate(base, copies, tmp_path / f"raw-{copies}"), tmp_path / f"run-{copies}",
+            monkeypatch
+        )
+        for copies in [1, 4]
+    }
+    # Four times the input, in reduce partitions of one base state
+    # each; only the per-series tables grow
+    assert peaks[4] < 1.3 * peaks[1]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.policy_simulator import apply_policy_scenarios, evaluate_scenarios, scenario_grid
+
+
+def forecast_frame(n_keys=30, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "state": [f"S{i:02d}" for i in range(n_keys)],
+        # Rounded so that some keys tie on risk
+        "predicted_risk_score": rng.gamma(2.0, 1.0, n_keys).round(1),
+    })
+
+
+def reference_scenario(forecast, intensity, budget, rollout, weights, cost):
+    """
+    One scenario at a time: fund keys in descending risk (ties in input
+    order) until the next one no longer fits the budget
+    """
+    ranked = forecast.sort_values("predicted_risk_score", ascending=False, kind="mergesort")
+    simulated, spend, treated = {}, 0.0, 0
+    funding = True
+    for key, risk in zip(ranked["state"], ranked["predicted_risk_score"]):
+        key_intensity = min(max(intensity * weights.get(key, 1.0), 0.0), 1.0)
+        key_cost = key_intensity * cost.get(key, 1.0)
+        if funding and spend + key_cost <= budget + 1e-9:
+            spend += key_cost
+            treated += 1
+            simulated[key] = risk * (1 - key_intensity * rollout)
+        else:
+            funding = False
+            simulated[key] = risk
+    return simulated, spend, treated
+
+
+def test_cube_matches_per_scenario_loop():
+    forecast = forecast_frame()
+    rng = np.random.default_rng(1)
+    weights = pd.Series(rng.uniform(0.5, 2.5, 20), index=forecast["state"][:20])
+    cost = pd.Series(rng.uniform(0.5, 3.0, 25), index=forecast["state"][5:])
+    scenarios = scenario_grid(
+        intensities=(0.1, 0.3, 0.6), budgets=(0.0, 2.0, 7.5, np.inf), rollouts=(0.5, 1.0)
+    )
+
+    cube = evaluate_scenarios(forecast, scenarios, weights=weights, cost=cost)
+    frame = cube.frame().set_index(["scenario", "state"])["simulated_risk_score"]
+
+    total = forecast["predicted_risk_score"].sum()
+    for scenario, row in scenarios.iterrows():
+        simulated, spend, treated = reference_scenario(
+            forecast, row["intensity"], row["budget"], row["rollout"],
+            weights.to_dict(), cost.to_dict()
+        )
+        summary = cube.scenarios.loc[scenario]
+        assert summary["treated"] == treated
+        assert summary["spend"] == pytest.approx(spend)
+        assert summary["total_risk"] == pytest.approx(sum(simulated.values()))
+        assert summary["risk_reduction"] == pytest.approx(total - sum(simulated.values()), abs=1e-9)
+        for key, risk in simulated.items():
+            assert frame[(scenario, key)] == pytest.approx(risk, rel=1e-6)
+
+
+def test_top_ranks_by_reduction_with_ties_in_scenario_order():
+    # Budgets past the total spend tie with the unlimited one
+    scenarios = scenario_grid(
+        intensities=(0.1, 0.2, 0.3, 0.4), budgets=(1.0, 100.0, np.inf), rollouts=(0.5, 1.0)
+    )
+    cube = evaluate_scenarios(forecast_frame(), scenarios)
+
+    expected = cube.scenarios.sort_values("risk_reduction", ascending=False, kind="mergesort")
+    assert cube.scenarios["risk_reduction"].duplicated().any()
+    for n in [1, 5, len(scenarios), len(scenarios) + 3]:
+        assert cube.top(n).index.tolist() == expected.index[:n].tolist()
+
+
+def test_unlimited_full_rollout_matches_flat_factors():
+    forecast = forecast_frame()
+    cube = evaluate_scenarios(forecast, scenario_grid(intensities=(0.1, 0.3, 0.5)))
+    flat = apply_policy_scenarios(forecast).set_index("state")
+
+    frame = cube.frame().pivot(index="state", columns="scenario", values="simulated_risk_score")
+    for scenario, col in enumerate(["low_intervention", "medium_intervention", "high_intervention"]):
+        np.testing.assert_allclose(frame[scenario], flat.loc[frame.index, col], rtol=1e-6)
@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+from src.risk_service import QueryError, Snapshot
+
+
+def snapshot():
+    pincode = pd.DataFrame({
+        "state": ["Assam", "Assam", "Bihar"],
+        "district": ["Kamrup", "Jorhat", "Patna"],
+        "pincode": [781001, 781001, 800001],
+        "predicted_risk_score": [1.0, 2.0, 3.0],
+    })
+    return Snapshot({
+        "state": pincode.groupby("state", as_index=False)["predicted_risk_score"].sum(),
+        "pincode": pincode,
+    }, {}, "test")
+
+
+@pytest.mark.parametrize("query, districts", [
+    ({"pincode": 781001}, ["Kamrup", "Jorhat"]),
+    ({"pincode": "781001", "state": "assam"}, ["Kamrup", "Jorhat"]),
+    ({"pincode": 781001, "district": "JORHAT"}, ["Jorhat"]),
+    ({"pincode": 781001, "state": "Assam", "district": "Kamrup"}, ["Kamrup"]),
+    ({"pincode": 781001, "state": "Bihar", "district": "Kamrup"}, []),
+])
+def test_pincode_lookup(query, districts):
+    assert [r["district"] for r in snapshot().lookup(query)] == districts
+
+
+def test_district_lookup_needs_a_state():
+    with pytest.raises(QueryError):
+        snapshot().lookup({"district": "Kamrup"})